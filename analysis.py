@@ -0,0 +1,143 @@
+# ==========================================
+# Gemini 관상 분석
+# ==========================================
+# Streamlit 스크립트 밖(작업 스레드)에서도 호출할 수 있도록 분리했습니다.
+# 실패하면 None 대신 예외를 던지고, 재시도 여부는 analysis_service 가 판단합니다.
+# 실제 모델 호출은 model_backends (gemini / 부하 테스트용 fake) 가 맡습니다.
+
+import os
+
+from google.api_core import exceptions as api_exceptions
+
+import image_prep
+import telemetry
+from analysis_cache import make_key
+from json_stream import StreamingObjectParser
+from model_backends import get_backend
+from prompts import build_prompt
+from repair import parse_json_loose, repair_tags
+
+# 응답을 조각으로 받아 summary 를 글자 단위로 먼저 보여줄지 여부
+STREAMING = os.environ.get("DOG_MATCH_STREAMING", "1") != "0"
+
+# JSON 응답 스키마를 지정해서 받을지 여부 (matched_tags 는 태그 목록 안에서만)
+STRUCTURED = os.environ.get("DOG_MATCH_STRUCTURED", "1") != "0"
+
+# 잠깐 기다렸다 다시 보내면 성공할 수 있는 오류들
+TRANSIENT_ERRORS = (
+    api_exceptions.ResourceExhausted,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.InternalServerError,
+    ConnectionError,
+    TimeoutError,
+)
+
+# 할당량 초과 (429) - analysis_service 가 각자 재시도하지 않고 할당량 제한기를 잠깐 멈춤
+QUOTA_ERRORS = (api_exceptions.TooManyRequests,)
+
+
+class AnalysisError(Exception):
+    pass
+
+
+def current_prompt(all_dog_tags):
+    return build_prompt(tuple(all_dog_tags), STRUCTURED)
+
+
+def analysis_key(image_bytes, all_dog_tags):
+    # 결과 캐시 키 겸 중복 요청 합치기(coalescing) 키
+    mode = "structured" if STRUCTURED else "text"
+    model_name = get_backend().model_name
+    return make_key(image_bytes, current_prompt(all_dog_tags).text, f"{model_name}|{mode}|{image_prep.signature()}")
+
+
+def _stream_response(chunks, all_dog_tags, on_progress):
+    # 조각이 올 때마다 summary 진행 상황과 완성된 태그를 알려줌 → (응답 전체, 마지막 토큰 사용량)
+    def on_complete(key, value):
+        if key == "summary" and isinstance(value, str):
+            on_progress(summary=value)
+        elif key == "matched_tags":
+            on_progress(matched_tags=repair_tags(value, all_dog_tags))
+
+    parser = StreamingObjectParser(
+        on_partial=lambda key, value: on_progress(summary=value) if key == "summary" else None,
+        on_complete=on_complete,
+    )
+    texts = []
+    usage = None
+    for chunk in chunks:
+        usage = chunk.usage or usage
+        if chunk.text:
+            texts.append(chunk.text)
+            parser.feed(chunk.text)
+    return "".join(texts), usage
+
+
+def _record_usage(usage, on_usage=None):
+    # 응답 하나의 토큰 사용량 집계, 요청마다 한 번만 (on_usage: 할당량 정산용 입력+출력 토큰)
+    # 스트리밍 조각마다 실린 usage_metadata 는 누적값이라 마지막 것만 씀
+    if not usage:
+        return
+    for kind, tokens in usage.items():
+        telemetry.incr("gemini_tokens", tokens, kind=kind)
+    if on_usage is not None:
+        on_usage((usage.get("prompt") or 0) + (usage.get("output") or 0))
+
+
+def analyze_image_with_gemini(image_bytes, mime_type, all_dog_tags, cache=None, timeout=None, on_progress=None,
+                              on_usage=None):
+    with telemetry.span("gemini_analysis"):
+        return _analyze(image_bytes, mime_type, all_dog_tags, cache, timeout, on_progress, on_usage)
+
+
+def _analyze(image_bytes, mime_type, all_dog_tags, cache, timeout, on_progress, on_usage):
+    prompt = current_prompt(all_dog_tags)
+
+    # 같은 사진을 이미 분석했다면 저장된 결과 사용 (동시에 같은 사진이 오면 한 번만 요청)
+    if cache is not None:
+        return cache.get_or_compute(
+            analysis_key(image_bytes, all_dog_tags),
+            lambda: _request(image_bytes, mime_type, all_dog_tags, prompt, timeout, on_progress, on_usage),
+        )
+    return _request(image_bytes, mime_type, all_dog_tags, prompt, timeout, on_progress, on_usage)
+
+
+def _request(image_bytes, mime_type, all_dog_tags, prompt, timeout, on_progress, on_usage):
+    # 전송 전 축소/재인코딩 (업로드 용량, 토큰 비용 절감)
+    with telemetry.span("image_prep"):
+        prepared = image_prep.prepare_image(image_bytes, mime_type)
+    telemetry.incr("gemini_image_bytes", prepared.original_size, kind="original")
+    telemetry.incr("gemini_image_bytes", prepared.prepared_size, kind="sent")
+
+    backend = get_backend()
+    image = {"mime_type": prepared.mime_type, "data": prepared.data}
+    stream = STREAMING and on_progress is not None
+    telemetry.incr("gemini_requests", backend=backend.name)
+    with telemetry.span("gemini_request", backend=backend.name, stream=str(stream).lower()):
+        chunks = backend.generate(image, prompt, all_dog_tags, structured=STRUCTURED, stream=stream, timeout=timeout)
+        if stream:
+            response_text, usage = _stream_response(chunks, all_dog_tags, on_progress)
+        else:
+            response_text, usage = "", None
+            for chunk in chunks:
+                usage = chunk.usage or usage
+                response_text += chunk.text
+    _record_usage(usage, on_usage)
+    telemetry.incr("gemini_response_bytes", len(response_text.encode("utf-8")))
+
+    # JSON 파싱 (깨진 응답은 로컬에서 복구, 이미지 재전송 없음)
+    try:
+        parsed_result = parse_json_loose(response_text)
+    except ValueError as e:
+        raise AnalysisError(f"JSON 파싱 오류: {e}") from e
+
+    # 결과 검증 (태그 목록과 살짝 다른 태그는 가까운 태그로 보정)
+    matched_tags = repair_tags(parsed_result.get("matched_tags"), all_dog_tags)
+    if not parsed_result.get("summary") or not matched_tags:
+        raise AnalysisError("분석 결과가 올바르지 않습니다")
+
+    return {
+        "summary": parsed_result["summary"],
+        "matched_tags": matched_tags,
+    }
@@ -0,0 +1,153 @@
+# ==========================================
+# Gemini 관상 분석 결과 캐시 (SQLite)
+# ==========================================
+# 같은 사진 + 같은 프롬프트 + 같은 모델이면 저장된 결과를 돌려줍니다.
+# 오래된 항목(TTL)과 용량 초과분(LRU)은 자동으로 정리합니다.
+# 공유 캐시(cache_layer.py)를 주면 다른 서버가 분석한 결과도 쓰고, 같은 사진을 동시에 두 번 분석하지 않습니다.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import telemetry
+from cache_layer import Cache, JsonCodec
+
+DEFAULT_TTL = 30 * 24 * 60 * 60        # 30일
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024   # 50MB
+
+
+def make_key(image_bytes, prompt, model_name):
+    # 이미지 내용 해시 + 프롬프트 + 모델 버전
+    h = hashlib.sha256()
+    for part in (model_name.encode("utf-8"), prompt.encode("utf-8"), hashlib.sha256(image_bytes).digest()):
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 shared=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.shared = Cache("analysis", 0, shared, ttl, JsonCodec)  # 공유 저장소 단계 (shared=None 이면 동시 분석 막기만)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_accessed ON analysis(accessed_at)")
+        self.evict()
+
+    def get(self, key):
+        result = self._get(key)
+        telemetry.incr("cache_requests", cache="analysis", result="miss" if result is None else "hit")
+        if result is None and self.shared.shared is not None:
+            # 다른 서버가 분석한 결과면 로컬에도 저장
+            result = self.shared.get(key)
+            if result is not None:
+                self._put(key, result)
+        return result
+
+    def get_or_compute(self, key, compute):
+        # 없으면 compute() 결과를 저장 (같은 키를 동시에 요청하면 한 번만 계산, 나머지는 결과를 기다림)
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        def fill():
+            result = compute()
+            self.put(key, result)
+            return result
+
+        return self.shared.guard.run(f"analysis:{key}", lambda: self._get(key) or self.shared.peek(key), fill)
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM analysis WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            result, created_at = row
+            if now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM analysis WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE analysis SET accessed_at = ? WHERE key = ?", (now, key))
+        try:
+            return json.loads(result)
+        except json.JSONDecodeError:
+            return None
+
+    def put(self, key, result):
+        self._put(key, result)
+        if self.shared.shared is not None:
+            self.shared.set(key, result)
+
+    def _put(self, key, result):
+        payload = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis (key, result, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload.encode("utf-8")), now, now),
+            )
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            # 1. 만료된 항목 삭제
+            self._conn.execute("DELETE FROM analysis WHERE created_at < ?", (time.time() - self.ttl,))
+
+            # 2. 개수 / 용량 초과 시 가장 오래 안 쓴 것부터 삭제
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis").fetchone()
+            if count <= self.max_entries and total <= self.max_bytes:
+                return
+            rows = self._conn.execute("SELECT key, size FROM analysis ORDER BY accessed_at").fetchall()
+            stale = []
+            for key, size in rows:
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                count -= 1
+                total -= size
+            self._conn.executemany("DELETE FROM analysis WHERE key = ?", stale)
+
+    def recent_tag_sets(self, limit=20):
+        # 최근에 쓰인 분석 결과의 태그 묶음 (중복 제거, 랭킹 미리 계산용)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM analysis WHERE created_at >= ? ORDER BY accessed_at DESC LIMIT ?",
+                (time.time() - self.ttl, limit * 4),
+            ).fetchall()
+        tag_sets = []
+        for (payload,) in rows:
+            try:
+                tags = frozenset(json.loads(payload).get("matched_tags") or ())
+            except (json.JSONDecodeError, AttributeError):
+                continue
+            if tags and tags not in tag_sets:
+                tag_sets.append(tags)
+            if len(tag_sets) >= limit:
+                break
+        return tag_sets
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM analysis")
@@ -0,0 +1,179 @@
+# ==========================================
+# 관상 분석 작업 서비스 (공유 작업 스레드 풀)
+# ==========================================
+# - Streamlit 스크립트 스레드는 작업을 맡기고 바로 돌아갑니다 (화면은 폴링으로 갱신)
+# - 동시에 실행되는 Gemini 호출 수와 대기열 길이에 상한을 둡니다
+# - 같은 키의 요청이 이미 진행 중이면 새로 보내지 않고 같은 작업을 공유합니다
+# - 일시적인 오류는 지터(jitter)를 준 지수 백오프로 재시도합니다
+# - 할당량 제한기(rate_limit)가 있으면 접수 때 대기표를 받고 모델 호출 전에 차례를 기다립니다
+#   할당량이 포화 상태면 접수하지 않고 QuotaSaturated (화면은 성향 테스트만으로 매칭)
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import telemetry
+from rate_limit import QuotaExceeded
+
+MAX_WORKERS = int(os.environ.get("DOG_MATCH_ANALYSIS_WORKERS", "4"))
+MAX_PENDING = int(os.environ.get("DOG_MATCH_ANALYSIS_QUEUE", "32"))
+TIMEOUT = float(os.environ.get("DOG_MATCH_ANALYSIS_TIMEOUT", "60"))
+RETRIES = int(os.environ.get("DOG_MATCH_ANALYSIS_RETRIES", "2"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 8.0
+RESULT_TTL = 300  # 끝난 작업 결과를 보관하는 시간(초)
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+class QuotaSaturated(ServiceBusy):
+    pass
+
+
+class AnalysisJob:
+    def __init__(self, key):
+        self.key = key
+        self.created_at = time.time()
+        self.finished_at = None
+        self.attempts = 0
+        self.future = None
+        self.ticket = None  # 할당량 대기표 (모델 호출 차례가 오면 대기열에서 빠짐)
+        self.partial = {}  # 스트리밍 중간 결과 (summary, matched_tags)
+
+    def report(self, **fields):
+        self.partial = {**self.partial, **fields}
+
+    @property
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    @property
+    def error(self):
+        return self.future.exception() if self.done else None
+
+    @property
+    def result(self):
+        return self.future.result() if self.done and self.error is None else None
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    # full jitter: 0 ~ min(cap, base * 2^attempt)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AnalysisService:
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=MAX_PENDING, timeout=TIMEOUT,
+                 retries=RETRIES, retry_on=(Exception,), limiter=None, quota_errors=()):
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_on = retry_on
+        self.limiter = limiter            # rate_limit.QuotaLimiter (없으면 제한 없음)
+        self.quota_errors = quota_errors  # 할당량 초과 응답 (429)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _pending_count(self):
+        return sum(1 for job in self._jobs.values() if not job.done)
+
+    def _prune(self):
+        now = time.time()
+        for key in [k for k, job in self._jobs.items()
+                    if job.done and job.finished_at and now - job.finished_at > RESULT_TTL]:
+            del self._jobs[key]
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def queue_position(self, job):
+        # (대기 순서, 예상 대기 초) - 이미 모델을 부르고 있거나 제한이 없으면 None
+        if self.limiter is None or job.ticket is None:
+            return None
+        position = self.limiter.position(job.ticket)
+        if position is None:
+            return None
+        return position, self.limiter.eta(job.ticket)
+
+    def saturated(self):
+        return self.limiter is not None and self.limiter.saturated()
+
+    def submit(self, key, fn, *args, **kwargs):
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(key)
+            # 진행 중인 같은 요청이 있으면 합치기 (실패한 작업은 새로 시작)
+            if job is not None and (not job.done or job.error is None):
+                telemetry.incr("analysis_jobs", result="coalesced")
+                return job
+            if self._pending_count() >= self.max_pending:
+                telemetry.incr("analysis_jobs", result="busy")
+                raise ServiceBusy("분석 요청이 많아 잠시 후 다시 시도해주세요")
+            if self.saturated():
+                telemetry.incr("analysis_jobs", result="saturated")
+                raise QuotaSaturated("지금은 관상 분석 요청이 많아요")
+            job = AnalysisJob(key)
+            if self.limiter is not None:
+                job.ticket = self.limiter.enqueue()
+            self._jobs[key] = job
+            telemetry.incr("analysis_jobs", result="submitted")
+            job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+            return job
+
+    def _admit(self, job, attempt, deadline):
+        # 할당량 차례 기다리기 (재시도는 맨 앞에서, 한 번에 최대 대기 상한의 2배까지)
+        if self.limiter is None:
+            return
+        if attempt:
+            job.ticket = self.limiter.enqueue(front=True)
+        timeout = min(deadline - time.time(), self.limiter.max_wait * 2)
+        try:
+            self.limiter.acquire(job.ticket, max(0.0, timeout))
+        except QuotaExceeded as e:
+            raise QuotaSaturated(str(e)) from e
+
+    def _run(self, job, fn, args, kwargs):
+        deadline = job.created_at + self.timeout * (self.retries + 1)
+        telemetry.observe("analysis_queue_wait", time.time() - job.created_at)
+        try:
+            for attempt in range(self.retries + 1):
+                job.attempts = attempt + 1
+                job.partial = {}
+                self._admit(job, attempt, deadline)
+                try:
+                    return fn(*args, timeout=self.timeout, on_progress=job.report,
+                              on_usage=self._settle(job), **kwargs)
+                except self.retry_on as e:
+                    quota = isinstance(e, self.quota_errors)
+                    if quota and self.limiter is not None:
+                        # 할당량 초과: 모두 함께 쉬었다가 대기열 순서대로 (각자 백오프하지 않음)
+                        self.limiter.penalize()
+                        delay = 0.0
+                    else:
+                        delay = backoff_delay(attempt)
+                    if attempt >= self.retries or time.time() + delay > deadline:
+                        if quota:
+                            raise QuotaSaturated(str(e)) from e
+                        raise
+                    telemetry.incr("analysis_retries", error=type(e).__name__)
+                    print(f"분석 재시도 {attempt + 1}/{self.retries} ({delay:.1f}초 후): {e}")
+                    time.sleep(delay)
+        except Exception as e:
+            telemetry.incr("analysis_failures", error=type(e).__name__)
+            raise
+        finally:
+            job.finished_at = time.time()
+            if self.limiter is not None and job.ticket is not None:
+                self.limiter.cancel(job.ticket)
+
+    def _settle(self, job):
+        # 응답의 실제 토큰 수로 할당량 정산
+        if self.limiter is None:
+            return None
+        ticket = job.ticket
+        return lambda tokens: self.limiter.settle(ticket, tokens)
@@ -1,49 +1,237 @@
 import streamlit as st
-import google.generativeai as genai
-import json
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import time
 import os
+import threading
+import zlib
+import startup
+import telemetry
+from analysis_cache import AnalysisCache
+from image_assets import ImageVariantCache, pick_width
+from model_backends import get_backend
+from sessions import SessionProfile, SessionStore
+# 카탈로그/매칭(numpy), 관상 분석(Gemini SDK, OpenCV) 모듈은 필요한 단계에서 불러오고
+# 첫 화면을 그린 뒤 백그라운드에서 미리 준비합니다 (Step 1 은 이것들 없이 바로 표시)
 
 # ==========================================
 # 1. 기본 설정 및 데이터 로드
 # ==========================================
 
-# 모델명 설정
-MODEL_NAME = 'models/gemini-2.5-flash'
+# 이번 실행(rerun) 전체 시간 측정 시작 (하단 푸터에서 단계별로 기록)
+run_started = time.perf_counter()
+startup.mark("imports")
 
-try:
-    api_key = st.secrets["GEMINI_API_KEY"]
-except Exception as e:
-    # Secrets에 없으면 환경변수에서 시도
-    api_key = os.environ.get("GEMINI_API_KEY", "")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("DOG_MATCH_CACHE_DIR") or os.path.join(BASE_DIR, ".cache")
 
-if not api_key:
-    st.error("⚠️ API 키가 설정되지 않았습니다. .streamlit/secrets.toml 파일을 확인해주세요.")
-    st.stop()
+# 카탈로그가 이보다 크면 DB 인덱스로 후보를 먼저 추린 뒤 점수 계산
+CANDIDATE_QUERY_MIN = 5000
+# 결과 화면 카드의 사진 칸 너비 (1순위 / 2~4순위, px)
+BEST_CARD_WIDTH = 320
+CARD_WIDTH = 220
 
-genai.configure(api_key=api_key)
+def require_model_backend():
+    # 관상 분석 모델 (DOG_MATCH_MODEL_BACKEND=fake 이면 API 키 없이 로컬 가짜 응답)
+    # API 키는 분석 단계(Step 2)에 들어올 때 확인
+    model_backend = get_backend()
+    if model_backend.requires_api_key and not model_backend.configured:
+        try:
+            api_key = st.secrets["GEMINI_API_KEY"]
+        except Exception as e:
+            # Secrets에 없으면 환경변수에서 시도
+            api_key = os.environ.get("GEMINI_API_KEY", "")
+
+        if not api_key:
+            st.error("⚠️ API 키가 설정되지 않았습니다. .streamlit/secrets.toml 파일을 확인해주세요.")
+            st.stop()
+
+        model_backend.configure(api_key)
+    return model_backend
+
+@st.cache_resource
+def start_telemetry():
+    # 계측값을 주기적으로 .cache/metrics.prom (+ 지정 시 JSONL) 로 내보내기
+    telemetry.metrics.start_exporter(telemetry.default_prom_path(CACHE_DIR), telemetry.default_jsonl_path())
+    return telemetry.metrics
+
+start_telemetry()
+
+@st.cache_resource
+def get_shared_cache():
+    # 여러 서버(레플리카)가 함께 쓰는 캐시 저장소 (DOG_MATCH_SHARED_CACHE, 비우면 None - cache_layer.py)
+    from cache_layer import open_shared
+
+    return open_shared(cache_dir=CACHE_DIR)
+
+@st.cache_resource
+def get_catalog_watcher():
+    # 유기견 카탈로그 DB (비어 있으면 data/dogs.json 에서 가져옴)
+    # dogs.json 이 바뀌면 바뀐 강아지만 백그라운드에서 반영
+    from catalog import default_json_path, open_store
+    from catalog_watch import CatalogWatcher
+
+    store = open_store(BASE_DIR)
+    return CatalogWatcher(store, default_json_path(BASE_DIR), shared=get_shared_cache()).start()
+
+def get_catalog():
+    return get_catalog_watcher().store
 
-@st.cache_data
 def load_dogs():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    paths = [
-        os.path.join(base_dir, 'data', 'dogs.json'),
-        os.path.join(base_dir, 'dogs.json')
-    ]
-    for path in paths:
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except: pass
-    return []
-
-dogs_data = load_dogs()
-
-all_dog_tags = []
-for dog in dogs_data:
-    all_dog_tags.extend(dog.get("personality_tags", []))
-all_dog_tags = list(set(all_dog_tags))
+    return get_catalog_watcher().current.dogs
+
+def current_catalog():
+    # 이번 실행에서 쓸 카탈로그 스냅샷 (도중에 갱신돼도 이 실행은 같은 버전으로 끝까지)
+    # vocab: 정렬 + 중복 제거된 태그 사전 (프로세스가 바뀌어도 프롬프트/캐시 키가 같도록)
+    return get_catalog_watcher().current
+
+@st.cache_resource
+def get_analysis_cache():
+    # 분석 결과 캐시 (세션/프로세스가 바뀌어도 유지)
+    return AnalysisCache(os.path.join(CACHE_DIR, "analysis.sqlite3"), shared=get_shared_cache())
+
+@st.cache_resource
+def get_session_store():
+    # 세션별 큰 데이터 (업로드 파일, 리포트 문장, 사진 미리보기) - 프로세스 메모리 예산 안에서 보관
+    # 예산/오래 쉰 세션으로 비울 때 그 세션의 업로드 원본도 서버 메모리에서 지움
+    return SessionStore(on_evict=get_script_run_ctx().uploaded_file_mgr.remove_session_files)
+
+@st.cache_resource
+def get_analysis_service():
+    # 모든 세션이 함께 쓰는 분석 작업 풀 (동시 호출 수 제한)
+    # 분당 요청/토큰 할당량도 모든 세션이 함께 나눠 씀 (rate_limit.py, 원격 호출이 없는 로컬 백엔드는 제외)
+    from analysis import QUOTA_ERRORS, TRANSIENT_ERRORS
+    from analysis_service import AnalysisService
+    from rate_limit import QuotaLimiter
+
+    limiter = QuotaLimiter() if get_backend().uses_quota else None
+    return AnalysisService(retry_on=TRANSIENT_ERRORS, limiter=limiter, quota_errors=QUOTA_ERRORS)
+
+@st.cache_resource
+def get_image_variants():
+    # 강아지 사진 썸네일 캐시 (시작할 때 백그라운드로 미리 생성)
+    variants = ImageVariantCache(BASE_DIR, os.path.join(CACHE_DIR, "images"), shared=get_shared_cache())
+    threading.Thread(target=variants.build_all, args=(get_catalog().load_dogs(),), daemon=True).start()
+    return variants
+
+@st.cache_resource
+def get_ranking_tables():
+    # 성향 테스트 조합별 랭킹 표 (카탈로그 버전별, 최근 관상 분석 결과로 미리 계산)
+    # DOG_MATCH_SEMANTIC=1 이면 비슷한 뜻의 태그도 점수에 반영 (semantic.py)
+    import semantic
+    from rankings import RankingTables
+
+    return RankingTables(
+        k=4, warm_with=lambda: get_analysis_cache().recent_tag_sets(), semantic=semantic.ENABLED
+    )
+
+@st.cache_resource
+def get_reranker():
+    # 결과 재정렬 (동점 무작위 + 노출 균형 + 태그 다양성), 노출 수는 모든 세션 공용 - 끄면 None
+    import reranking
+
+    return reranking.Reranker() if reranking.ENABLED else None
+
+@st.cache_resource
+def get_prefetcher():
+    # 성향 테스트를 푸는 동안 결과 화면 미리 계산 (prefetch.py) - 끄면 None
+    import prefetch
+
+    return prefetch.Prefetcher() if prefetch.ENABLED else None
+
+def pick_matches(session_profile, match_engine, ranking_table, store, reranker, seed):
+    # 결과 화면의 (dog_id, 점수) 4개 - Streamlit 기능을 쓰지 않아서 미리 계산 스레드에서도 부름
+    # (행 번호는 카탈로그 버전마다 달라서 강아지 id 로 보관)
+    with telemetry.span("match_score"):
+        if session_profile.answers is not None:
+            # 성향 테스트 조합별로 미리 계산한 점수 + 관상 태그 몫만 더하기
+            dog_scores = ranking_table.rank(
+                session_profile.answers, session_profile.photo_tags, k=4, reranker=reranker, seed=seed
+            )
+        else:
+            profile = session_profile.match_profile()
+            candidates = None
+            if len(match_engine) >= CANDIDATE_QUERY_MIN:
+                candidates = match_engine.rows_for(
+                    store.candidate_ids(profile.tags, profile.size_pref, profile.care_ok)
+                )
+            ranker = match_engine if ranking_table.semantic is None else ranking_table.semantic
+            dog_scores = ranker.rank(profile, k=4, rows=candidates, reranker=reranker, seed=seed)
+    return tuple((r["dog"]["dog_id"], r["score"]) for r in dog_scores)
+
+def prefetch_task(session_profile, match_engine, ranking_tables, store, reranker, seed, variants):
+    # 점수 계산 + 결과 카드 썸네일 데우기
+    shown = pick_matches(session_profile, match_engine, ranking_tables.get(match_engine), store, reranker, seed)
+    for i, (dog_id, _) in enumerate(shown):
+        width = BEST_CARD_WIDTH if i == 0 else CARD_WIDTH
+        variants.get(match_engine.dogs[match_engine.row_of[dog_id]]["basic_info"]["image_path"], pick_width(width))
+    return shown
+
+def match_key(session_profile, version):
+    # 결과 화면을 정하는 조건 (미리 계산한 결과를 써도 되는지 비교)
+    return version, session_profile.answers, session_profile.photo
+
+def session_seed():
+    return zlib.crc32(session_id.encode("utf-8"))
+
+def prefetch_matches(answers=None):
+    # 지금 답(없으면 보기 기본값 = 첫 번째)으로 결과 보기를 누른다고 보고 백그라운드에서 미리 계산
+    from quiz import QUESTIONS, answer_indices, apply_answers
+
+    prefetcher = get_prefetcher()
+    if prefetcher is None:
+        return
+    if answers is None:
+        answers = [question.options[0].label for question in QUESTIONS]
+    catalog = current_catalog()
+    profile = SessionProfile(st.session_state.profile.photo_tags)
+    tags, size_pref, care_ok = apply_answers(answers)
+    profile.set_quiz(answer_indices(answers), tags, size_pref, care_ok)
+    prefetcher.submit(
+        session_id, match_key(profile, catalog.version), prefetch_task,
+        profile, catalog.engine, get_ranking_tables(), get_catalog(), get_reranker(), session_seed(),
+        get_image_variants(),
+    )
+
+def warm_up():
+    # 첫 화면 이후 백그라운드 준비 (사용자가 소개를 읽는 동안)
+    try:
+        with startup.phase("catalog"):
+            catalog = current_catalog()
+        with startup.phase("analysis_modules"):
+            get_analysis_service()
+        with startup.phase("model_sdk"):
+            get_backend().warm()
+        with startup.phase("ranking_table"):
+            get_ranking_tables().get(catalog.engine)
+        with startup.phase("image_variants"):
+            get_image_variants()
+    except Exception as e:
+        print(f"시작 준비 오류: {e}")
+    finally:
+        startup.finish()
+
+@st.cache_resource
+def start_warm_up():
+    # 프로세스당 한 번 (캐시 함수를 부를 수 있도록 스크립트 실행 컨텍스트를 넘겨줌)
+    thread = threading.Thread(target=warm_up, name="startup-warm", daemon=True)
+    add_script_run_ctx(thread, get_script_run_ctx())
+    thread.start()
+    return thread
+
+@st.cache_resource
+def get_banner_path():
+    # 배너 사진이 있는지는 프로세스당 한 번만 확인
+    banner_path = os.path.join(BASE_DIR, "banner.jpg")
+    return banner_path if os.path.exists(banner_path) else None
+
+def show_dog_image(dog, display_width, warn_missing=False):
+    # 카드 크기에 맞는 가장 작은 썸네일로 표시
+    data = get_image_variants().get(dog["basic_info"]["image_path"], pick_width(display_width))
+    if data is not None:
+        with telemetry.span("image_render", width=str(display_width)):
+            st.image(data, use_container_width=True)
+    elif warn_missing:
+        st.warning("이미지를 찾을 수 없습니다")
 
 # ==========================================
 # 2. 스타일링 (CSS) - 다크모드 완벽 대응
@@ -167,65 +355,126 @@ st.markdown("""
 # 3. 앱 로직 & 상태 관리
 # ==========================================
 if 'step' not in st.session_state: st.session_state.step = 1
-if 'user_tags' not in st.session_state: st.session_state.user_tags = []
-if 'analysis_summary' not in st.session_state: st.session_state.analysis_summary = ""
-if 'size_pref' not in st.session_state: st.session_state.size_pref = "medium"  # 추가
-if 'care_ok' not in st.session_state: st.session_state.care_ok = False  # 추가
+# 매칭 조건 (관상 태그/성향 테스트 결과/체급/케어) - 태그 번호로 작게 보관 (sessions.py)
+if 'profile' not in st.session_state: st.session_state.profile = SessionProfile()
+# 업로드 위젯 key 번호 (분석이 끝나면 바꿔서 업로드 원본을 놓아줌)
+if 'upload_round' not in st.session_state: st.session_state.upload_round = 0
+
+if 'analysis_job' not in st.session_state: st.session_state.analysis_job = None
+# 분석 할당량이 가득 차서 관상 분석 없이 성향 테스트만으로 매칭하는 중
+if 'quiz_only' not in st.session_state: st.session_state.quiz_only = False
+
+session_id = get_script_run_ctx().session_id
+get_session_store().touch(session_id)
+
+def release_upload():
+    # 분석이 끝나면 업로드 원본을 서버 메모리에서 지우고 새 업로드 위젯으로 (미리보기만 남김)
+    get_session_store().drop(session_id, "upload")
+    get_script_run_ctx().uploaded_file_mgr.remove_session_files(session_id)
+    st.session_state.upload_round += 1
+
+def finish_analysis(key, result):
+    st.session_state.profile.set_photo(result.get("matched_tags", []), key)
+    get_session_store().put(session_id, summary=result.get("summary", ""))
+    release_upload()
+    prefetch_matches()
+
+def fall_back_to_quiz(reason):
+    # 분석 할당량이 가득 차면 기다리게 하지 않고 성향 테스트만으로 매칭
+    telemetry.incr("quiz_only_fallbacks", reason=reason)
+    st.session_state.profile.clear_photo()
+    st.session_state.analysis_job = None
+    st.session_state.quiz_only = True
+    get_session_store().drop(session_id, "summary", "preview")
+    release_upload()
+    st.session_state.step = 3
+    prefetch_matches()
+
+def analysis_summary():
+    # 관상 리포트 문장 (메모리 예산 때문에 비워졌으면 분석 캐시에서 다시 읽음)
+    summary = get_session_store().get(session_id, "summary")
+    key = st.session_state.profile.analysis_key
+    if summary is None and key:
+        cached = get_analysis_cache().get(key)
+        summary = cached["summary"] if cached else ""
+        get_session_store().put(session_id, summary=summary)
+    return summary or ""
+
+def start_analysis(image_file):
+    from analysis import analysis_key, analyze_image_with_gemini
+    from analysis_service import QuotaSaturated, ServiceBusy
+    from image_prep import make_preview
 
-def analyze_image_with_gemini(image_file):
+    all_dog_tags = current_catalog().vocab
+    image_bytes = image_file.getvalue()
+    key = analysis_key(image_bytes, all_dog_tags)
+    get_session_store().put(session_id, preview=make_preview(image_bytes))
+    
+    # 같은 사진을 이미 분석했다면 바로 결과 표시
+    cached = get_analysis_cache().get(key)
+    if cached:
+        finish_analysis(key, cached)
+        return
+    
     try:
-        model = genai.GenerativeModel(MODEL_NAME)
-        prompt = f"""
-        당신은 따뜻한 마음을 가진 '댕댕이 운명 매칭사'입니다! 🐾
-        
-        이 사진 속 사람의 얼굴을 보고, 그 사람의 **분위기, 인상, 눈빛**을 읽어주세요.
-        
-        중요한 것은:
-        - 외모 평가가 아닌, 그 사람이 풍기는 **따뜻함, 에너지, 성향**을 파악하는 것!
-        - 마치 오래된 친구처럼 편안하고 공감하는 톤으로 이야기해주세요
-        - "이런 분이시네요!" 하고 긍정적으로 해석해주세요
-        
-        예시:
-        - "부드러운 미소를 가지셨네요. 차분하고 온화한 분위기가 느껴져요."
-        - "눈빛에 에너지가 넘치시네요! 활발하고 긍정적인 성격이실 것 같아요."
-        - "조용하지만 깊이 있는 눈빛이에요. 세심하고 따뜻한 마음을 가지신 것 같아요."
-        
-        그리고 이 사람과 **가장 찰떡궁합**인 강아지 성향 태그를 아래 목록에서 3~5개 골라주세요:
-        [태그 목록] {", ".join(all_dog_tags)}
-        
-        반드시 아래 JSON 형식으로만 답변해주세요 (다른 텍스트는 절대 포함하지 마세요):
-        {{
-            "summary": "2-3문장으로 따뜻하고 긍정적인 톤으로 분석",
-            "matched_tags": ["태그1", "태그2", "태그3"]
-        }}
-        """
-        
-        image_parts = [{"mime_type": image_file.type, "data": image_file.getvalue()}]
-        response = model.generate_content([prompt, image_parts[0]])
-        
-        # JSON 파싱
-        result_text = response.text.replace("```json", "").replace("```", "").strip()
-        parsed_result = json.loads(result_text)
-        
-        # 결과 검증
-        if not parsed_result.get("summary") or not parsed_result.get("matched_tags"):
-            raise ValueError("분석 결과가 올바르지 않습니다")
-        
-        return parsed_result
-        
-    except json.JSONDecodeError as e:
-        # JSON 파싱 실패
-        print(f"JSON 파싱 오류: {e}")
-        return None
-    except Exception as e:
-        # 기타 오류
-        print(f"분석 오류: {e}")
-        return None
+        get_analysis_service().submit(
+            key, analyze_image_with_gemini, image_bytes, image_file.type, all_dog_tags,
+            cache=get_analysis_cache(),
+        )
+        st.session_state.analysis_job = key
+    except QuotaSaturated:
+        fall_back_to_quiz("saturated")
+    except ServiceBusy as e:
+        st.session_state.analysis_job = None
+        st.warning(str(e))
+
+@st.fragment(run_every=0.5)
+def show_analysis_progress():
+    # 분석은 작업 스레드에서 진행, 이 영역만 0.5초마다 다시 그려서 결과 확인
+    from analysis_service import QuotaSaturated
+
+    service = get_analysis_service()
+    job = service.get(st.session_state.analysis_job)
+    if job is None:
+        st.session_state.analysis_job = None
+        st.rerun()
+    elif not job.done:
+        partial = job.partial
+        if partial.get("summary"):
+            # 스트리밍으로 받은 리포트를 먼저 보여주기
+            tags = partial.get("matched_tags")
+            st.markdown(f"""
+                <div style='background-color:#E3F2FD; padding:20px; border-radius:10px; margin:15px 0;'>
+                    <h4 style='color:#1565C0;'>🤖 AI 관상 리포트</h4>
+                    <p style='font-size:1.1em; color:#333;'>{partial["summary"]}</p>
+                    <p style='color:#555;'><b>추출된 키워드:</b> {', '.join(tags) if tags else '...'}</p>
+                </div>
+            """, unsafe_allow_html=True)
+        else:
+            queued = service.queue_position(job)
+            if queued is not None:
+                # 할당량 차례를 기다리는 중
+                position, eta = queued
+                st.info(f"⏳ 분석 요청이 많아 순서를 기다리고 있어요... {position}번째 (약 {max(1, round(eta))}초)")
+            else:
+                st.info(f"🎨 당신의 얼굴을 분석하고 있습니다... ({int(time.time() - job.created_at)}초)")
+    elif isinstance(job.error, QuotaSaturated):
+        fall_back_to_quiz("quota")
+        st.rerun()
+    elif job.error is not None:
+        print(f"분석 오류: {job.error}")
+        st.error("분석에 실패했어요. 잠시 후 다시 시도해주세요.")
+        if st.button("다시 시도하기 🔁"):
+            st.session_state.analysis_job = None
+            st.rerun()
+    else:
+        finish_analysis(job.key, job.result)
+        st.session_state.analysis_job = None
+        st.rerun()
 
 # [UI] 배너
-base_dir = os.path.dirname(os.path.abspath(__file__))
-banner_path = os.path.join(base_dir, "banner.jpg")
-if os.path.exists(banner_path):
+banner_path = get_banner_path()
+if banner_path:
     st.image(banner_path, use_container_width=True)
 
 st.markdown("<h1 class='main-title'>🎨 댕칼코마니</h1>", unsafe_allow_html=True)
@@ -309,6 +558,7 @@ if st.session_state.step == 1:
 # Step 2. 이미지 분석 (관상 분석 결과 확인)
 # =========================================================
 elif st.session_state.step == 2:
+    require_model_backend()
     st.markdown("<div style='text-align: center;'><div class='step-indicator'>Step 2 / 4</div></div>", unsafe_allow_html=True)
     
     st.markdown("<div class='content-box'>", unsafe_allow_html=True)
@@ -316,145 +566,94 @@ elif st.session_state.step == 2:
     
     st.info("본인 사진을 올려주세요. AI가 당신의 분위기를 읽어냅니다.")
     
-    uploaded_file = st.file_uploader("사진 업로드", type=["jpg", "png", "jpeg"])
+    profile = st.session_state.profile
     
-    # 파일이 업로드 되면 분석 버튼 활성화
-    if uploaded_file:
-        st.image(uploaded_file, caption="분석할 사진", width=300)
-        
-        # 아직 분석 안 했으면 분석 버튼 표시
-        if not st.session_state.analysis_summary:
-            if st.button("내 관상 분석하기 🔍"):
-                with st.spinner("🎨 당신의 얼굴을 분석하고 있습니다..."):
-                    result = analyze_image_with_gemini(uploaded_file)
-                    
-                    if result:
-                        st.session_state.analysis_summary = result.get("summary", "")
-                        st.session_state.user_tags = result.get("matched_tags", [])
-                        st.rerun()
+    # 아직 분석 안 했으면 업로드 → 분석 버튼 표시
+    if not profile.analyzed:
+        # 할당량이 가득 찼으면 미리 알리고 사진 없이 진행할 수 있게
+        if not st.session_state.analysis_job and get_analysis_service().saturated():
+            st.warning("⏳ 지금은 관상 분석 요청이 많아 오래 기다릴 수 있어요. 사진 없이 성향 테스트만으로도 찾아드릴게요.")
+            if st.button("사진 없이 성향 테스트로 👉"):
+                fall_back_to_quiz("skip")
+                st.rerun()
 
-        # 분석 결과가 있으면(분석 완료 시) 결과 화면 표시
-        else:
-            st.success("✨ 분석이 완료되었습니다!")
-            st.markdown(f"""
-                <div style='background-color:#E3F2FD; padding:20px; border-radius:10px; margin:15px 0;'>
-                    <h4 style='color:#1565C0;'>🤖 AI 관상 리포트</h4>
-                    <p style='font-size:1.1em; color:#333;'>{st.session_state.analysis_summary}</p>
-                    <p style='color:#555;'><b>추출된 키워드:</b> {', '.join(st.session_state.user_tags)}</p>
-                </div>
-            """, unsafe_allow_html=True)
-            
-            st.write("관상이 아주 좋으시네요! 이 결과를 바탕으로 성향 테스트를 진행합니다.")
+        uploaded_file = st.file_uploader("사진 업로드", type=["jpg", "png", "jpeg"], key=f"upload_{st.session_state.upload_round}")
+        
+        # 파일이 업로드 되면 분석 버튼 활성화
+        if uploaded_file:
+            get_session_store().put(session_id, upload=uploaded_file)  # 분석 전에 오래 쉬면 예산에 따라 비움
+            with telemetry.span("image_render", width="upload"):
+                st.image(uploaded_file, caption="분석할 사진", width=300)
             
-            col1, col2 = st.columns(2)
-            with col1:
-                if st.button("다음: 성향 테스트로 이동 👉"):
-                    st.session_state.step = 3
-                    st.rerun()
-            with col2:
-                if st.button("🔄 다른 사진으로 다시 분석"):
-                    st.session_state.analysis_summary = ""
-                    st.session_state.user_tags = []
+            if st.session_state.analysis_job:
+                show_analysis_progress()
+            elif st.button("내 관상 분석하기 🔍"):
+                start_analysis(uploaded_file)
+                if profile.analyzed or st.session_state.analysis_job or st.session_state.step != 2:
                     st.rerun()
 
+    # 분석 결과가 있으면(분석 완료 시) 결과 화면 표시 (업로드 원본 대신 미리보기)
+    else:
+        preview = get_session_store().get(session_id, "preview")
+        if preview is not None:
+            with telemetry.span("image_render", width="preview"):
+                st.image(preview, caption="분석한 사진", width=300)
+        st.success("✨ 분석이 완료되었습니다!")
+        st.markdown(f"""
+            <div style='background-color:#E3F2FD; padding:20px; border-radius:10px; margin:15px 0;'>
+                <h4 style='color:#1565C0;'>🤖 AI 관상 리포트</h4>
+                <p style='font-size:1.1em; color:#333;'>{analysis_summary()}</p>
+                <p style='color:#555;'><b>추출된 키워드:</b> {', '.join(profile.photo_tags)}</p>
+            </div>
+        """, unsafe_allow_html=True)
+        
+        st.write("관상이 아주 좋으시네요! 이 결과를 바탕으로 성향 테스트를 진행합니다.")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("다음: 성향 테스트로 이동 👉"):
+                st.session_state.step = 3
+                st.rerun()
+        with col2:
+            if st.button("🔄 다른 사진으로 다시 분석"):
+                profile.clear_photo()
+                get_session_store().drop(session_id, "summary", "preview")
+                st.session_state.analysis_job = None
+                st.rerun()
+
     st.markdown("</div>", unsafe_allow_html=True)
 
 # =========================================================
 # Step 3. 성향 테스트 (심리테스트 스타일)
 # =========================================================
 elif st.session_state.step == 3:
+    from quiz import QUESTIONS, answer_indices, apply_answers
+
+    catalog = current_catalog()
     st.markdown("<div style='text-align: center;'><div class='step-indicator'>Step 3 / 4</div></div>", unsafe_allow_html=True)
     st.markdown("<div class='content-box'>", unsafe_allow_html=True)
     st.header("🧠 나는 어떤 사람일까?")
+    if st.session_state.quiz_only:
+        st.info("📸 지금은 관상 분석 요청이 많아서, 이번에는 성향 테스트 결과만으로 댕칼코마니를 찾아드릴게요.")
+    get_ranking_tables().build_async(catalog.engine)  # 답하는 동안 결과 화면용 표 준비
     st.write("5가지 질문으로 나의 성향을 알아볼게요!")
     st.write("---")
     
-    # Q1. 주말 스타일
-    q1 = st.radio(
-        "Q1. 당신의 주말은?", 
-        ["집콕하며 넷플릭스 정주행 🛋️", "카페 투어하며 힐링 산책 ☕", "등산이나 러닝으로 땀 흘리기 🏃"],
-        key="q1"
-    )
-    st.write("")
-    
-    # Q2. 친구들이 보는 나
-    q2 = st.radio(
-        "Q2. 친구들이 말하는 나는?", 
-        ["차분하고 조용한 편 🤫", "활발하고 에너지 넘쳐 🎉", "중간? 때에 따라 달라 😌"],
-        key="q2"
-    )
-    st.write("")
-    
-    # Q3. 새로운 사람 만날 때
-    q3 = st.radio(
-        "Q3. 새로운 사람을 만나면?",
-        ["낯을 좀 가리는 편, 천천히 친해져요 🙈", "금방 친해지는 스타일! 😄", "상대에 따라 다르게 반응해요 🤔"],
-        key="q3"
-    )
-    st.write("")
-    
-    # Q4. 선호하는 공간
-    q4 = st.radio(
-        "Q4. 내가 좋아하는 분위기는?",
-        ["아늑하고 포근한 공간 🕯️", "적당히 아담한 공간 🏠", "넓고 여유로운 공간 🏡"],
-        key="q4"
-    )
-    st.write("")
-    
-    # Q5. 관계 스타일
-    q5 = st.radio(
-        "Q5. 누군가 나에게 의지한다면?",
-        ["천천히 기다려주며 함께 성장할게요 🌱", "서로 편안하게 있고 싶어요 🌙", "밝은 에너지로 함께 즐기고 싶어요 ☀️"],
-        key="q5"
-    )
+    # Q1~Q5 (질문과 답변별 태그 규칙은 quiz.py)
+    answers = []
+    for i, question in enumerate(QUESTIONS):
+        answers.append(st.radio(question.label, [o.label for o in question.options], key=question.key))
+        if i < len(QUESTIONS) - 1:
+            st.write("")
+    prefetch_matches(answers)  # 답을 바꿀 때마다 (같은 답이면 이미 맡긴 계산 그대로)
     
     if st.button("최종 댕칼코마니 결과 보기 💌"):
-        # Q1. 활동성
-        if "집콕" in q1:
-            st.session_state.user_tags.extend(["#실내정적", "#조용한_가족추천", "#분리불안없음"])
-        elif "카페" in q1:
-            st.session_state.user_tags.extend(["#산책잘함", "#순둥이"])
-        else:  # 등산
-            st.session_state.user_tags.extend(["#산책러버", "#산책마스터", "#실외배변_선호"])
-        
-        # Q2. 에너지
-        if "차분" in q2:
-            st.session_state.user_tags.extend(["#조용한_가족추천", "#순둥이", "#실내정적"])
-        elif "활발" in q2:
-            st.session_state.user_tags.extend(["#사람좋아", "#산책잘함"])
-        else:  # 중간
-            st.session_state.user_tags.extend(["#순둥이"])
-        
-        # Q3. 사교성 (→ 강아지 겁 많은지 여부)
-        if "낯을" in q3:
-            st.session_state.user_tags.extend(["#겁쟁이", "#소심함", "#인내심필요", "#사회성기르는중", "#겁이많음"])
-        elif "금방" in q3:
-            st.session_state.user_tags.extend(["#사람좋아", "#사람손길_좋아함", "#순둥이"])
-        else:  # 상대에 따라
-            st.session_state.user_tags.extend(["#순둥이", "#손길허용"])
-        
-        # Q4. 공간 (→ 크기 선호)
-        if "아늑" in q4:
-            st.session_state.size_pref = "small"
-            st.session_state.user_tags.append("#소형견")
-        elif "아담" in q4:
-            st.session_state.size_pref = "medium"
-        else:  # 넓고
-            st.session_state.size_pref = "large"
-            st.session_state.user_tags.append("#대형견")
-        
-        # Q5. 관계 스타일 (→ 케어 의지)
-        if "천천히" in q5:
-            st.session_state.user_tags.extend(["#인내심필요", "#기다림이_필요해요", "#적응기간_필요"])
-            st.session_state.care_ok = True  # 케어 의지 있음
-        elif "편안" in q5:
-            st.session_state.user_tags.extend(["#순둥이", "#조용한_가족추천"])
-            st.session_state.care_ok = False
-        else:  # 밝은
-            st.session_state.user_tags.extend(["#사람좋아", "#산책잘함"])
-            st.session_state.care_ok = False
+        tags, size_pref, care_ok = apply_answers(answers)
+        profile = st.session_state.profile
+        profile.set_quiz(answer_indices(answers), tags, size_pref, care_ok)
         
         st.session_state.step = 4
+        profile.catalog_version = catalog.version  # 결과 화면은 이 버전으로 고정
         st.rerun()
     
     st.markdown("</div>", unsafe_allow_html=True)
@@ -472,59 +671,36 @@ elif st.session_state.step == 4:
         st.balloons()
         st.header("🎉 당신의 댕칼코마니는?")
         
-        # 가중치 매칭 로직
-        user_set = set(st.session_state.user_tags)
-        
-        def calculate_match_score(dog):
-            score = 0
-            dog_tags = set(dog["personality_tags"])
-            
-            # 1. 기본 태그 매칭 (각 1점)
-            basic_match = user_set.intersection(dog_tags)
-            score += len(basic_match)
-            
-            # 2. 핵심 태그 가중치 (+2점 추가)
-            priority_tags = ["#임보급구", "#평생가족_급구", "#겁쟁이", "#소심함", "#인내심필요"]
-            for tag in priority_tags:
-                if tag in basic_match:
-                    score += 2
-            
-            # 3. 크기 매칭 보너스 (+3점)
-            weight_str = dog["basic_info"].get("weight", "0kg")
-            weight = int(''.join(filter(str.isdigit, weight_str))) if weight_str else 0
-            
-            size_pref = st.session_state.get("size_pref", "medium")
-            if size_pref == "small" and weight <= 10:
-                score += 3
-            elif size_pref == "medium" and 10 < weight <= 20:
-                score += 3
-            elif size_pref == "large" and weight > 20:
-                score += 3
-            
-            # 4. 케어 의지 매칭 (+2점)
-            care_ok = st.session_state.get("care_ok", False)
-            if care_ok and ("#노견케어" in dog_tags or "#살찌우기프로젝트" in dog_tags):
-                score += 2
-            
-            # 5. 긴급도 보너스 (+1점)
-            health_issue = dog["basic_info"].get("health_issue", "")
-            if "🚨" in health_issue or "임박" in health_issue or "시급" in health_issue:
-                score += 1
-            
-            return score, basic_match
-        
-        # 모든 강아지 점수 계산
-        dog_scores = []
-        for dog in dogs_data:
-            score, matched_tags = calculate_match_score(dog)
-            dog_scores.append({
-                "dog": dog,
-                "score": score,
-                "matched_tags": matched_tags
-            })
-        
-        # 점수 순으로 정렬
-        dog_scores.sort(key=lambda x: x["score"], reverse=True)
+        # 가중치 매칭 로직 (점수 규칙은 matching.py 참고)
+        # 결과 화면에 들어올 때의 카탈로그 버전 사용 (다시 그려도 결과가 바뀌지 않도록)
+        # 재정렬은 세션마다 다르고 노출 수도 계속 바뀌므로, 처음 고른 결과를 세션에 두고 다시 씀
+        session_profile = st.session_state.profile
+        match_engine = get_catalog_watcher().snapshot(session_profile.catalog_version).engine
+        ranking_table = get_ranking_tables().get(match_engine)
+        # 고정한 버전이 보관 범위를 벗어나 최신 카탈로그로 바뀌었고 그 사이 빠진 강아지가 있으면 다시 고르기
+        if session_profile.shown is not None and any(
+            dog_id not in match_engine.row_of for dog_id, _ in session_profile.shown
+        ):
+            session_profile.shown = None
+        # 성향 테스트를 푸는 동안 같은 조건으로 미리 계산해 뒀으면 그 결과 (썸네일도 준비됨)
+        if session_profile.shown is None:
+            reranker = get_reranker()
+            prefetcher = get_prefetcher()
+            shown = None
+            if prefetcher is not None:
+                shown = prefetcher.take(session_id, match_key(session_profile, match_engine.version))
+            if shown is None:
+                shown = pick_matches(
+                    session_profile, match_engine, ranking_table, get_catalog(), reranker, session_seed()
+                )
+            session_profile.shown = shown
+            if reranker is not None:
+                reranker.record(match_engine, [match_engine.row_of[dog_id] for dog_id, _ in shown])
+        profile = session_profile.match_profile()
+        result_of = match_engine.result if ranking_table.semantic is None else ranking_table.semantic.result
+        dog_scores = [
+            result_of(match_engine.row_of[dog_id], score, profile) for dog_id, score in session_profile.shown
+        ]
         
         # 1순위 강아지 (크게 표시)
         if dog_scores:
@@ -537,20 +713,8 @@ elif st.session_state.step == 4:
             
             col1, col2 = st.columns([1, 1.2])
             with col1:
-                # 이미지 경로 처리
-                img_path = best_dog["basic_info"]["image_path"]
-                base_dir = os.path.dirname(os.path.abspath(__file__))
-                full_path = os.path.join(base_dir, img_path)
-                
-                if os.path.exists(full_path):
-                    st.image(full_path, use_container_width=True)
-                else:
-                    # images/ 경로도 시도
-                    alt_path = os.path.join(base_dir, "images", os.path.basename(img_path))
-                    if os.path.exists(alt_path):
-                        st.image(alt_path, use_container_width=True)
-                    else:
-                        st.warning("이미지를 찾을 수 없습니다")
+                # 이미지 (약 320px 칸)
+                show_dog_image(best_dog, BEST_CARD_WIDTH, warn_missing=True)
                     
             with col2:
                 st.markdown(f"### 🐾 {best_dog['basic_info']['name']}")
@@ -584,16 +748,8 @@ elif st.session_state.step == 4:
                     tags = list(match_info["matched_tags"])
                     
                     with cols[idx]:
-                        # 이미지
-                        img_path = dog["basic_info"]["image_path"]
-                        full_path = os.path.join(base_dir, img_path)
-                        
-                        if os.path.exists(full_path):
-                            st.image(full_path, use_container_width=True)
-                        else:
-                            alt_path = os.path.join(base_dir, "images", os.path.basename(img_path))
-                            if os.path.exists(alt_path):
-                                st.image(alt_path, use_container_width=True)
+                        # 이미지 (약 220px 칸)
+                        show_dog_image(dog, CARD_WIDTH)
                         
                         # 정보 카드
                         st.markdown(f"""
@@ -654,12 +810,12 @@ elif st.session_state.step == 4:
         st.write("")
         if st.button("처음부터 다시 하기 🔄"):
             st.session_state.step = 1
-            st.session_state.user_tags = []
-            st.session_state.analysis_summary = ""
-            if 'size_pref' in st.session_state:
-                del st.session_state.size_pref
-            if 'care_ok' in st.session_state:
-                del st.session_state.care_ok
+            st.session_state.profile = SessionProfile()
+            st.session_state.analysis_job = None
+            st.session_state.quiz_only = False
+            get_session_store().drop(session_id)
+            if get_prefetcher() is not None:
+                get_prefetcher().drop(session_id)
             st.rerun()
             
         st.markdown("</div>", unsafe_allow_html=True)
@@ -673,3 +829,10 @@ st.markdown("""
 </div>
 
 """, unsafe_allow_html=True)
+
+# st.rerun() / st.stop() 으로 중간에 끝난 실행은 기록하지 않음
+telemetry.observe("page_run", time.perf_counter() - run_started, step=str(st.session_state.step))
+
+# 화면을 다 그린 뒤 카탈로그/분석 모듈/SDK 등을 백그라운드로 준비
+startup.mark("first_paint")
+start_warm_up()
@@ -0,0 +1,241 @@
+# ==========================================
+# 성능 측정 (매칭 / 카탈로그 로드 / 결과 화면)
+# ==========================================
+# 실제 20마리 데이터를 바탕으로 만든 가상 카탈로그(기본 20 ~ 100,000마리)와
+# 성향 테스트 답변 조합(243가지)으로 만든 가상 사용자로 시간을 잽니다.
+#
+#   python benchmarks/bench.py                      # 결과: benchmarks/results/<커밋>.json
+#   python benchmarks/bench.py --sizes 20 1000 --out before.json
+#   python benchmarks/bench.py --compare before.json after.json
+
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import numpy as np  # noqa: E402
+
+from catalog import CatalogStore  # noqa: E402
+from matching import MatchEngine  # noqa: E402
+from prompts import tag_vocabulary  # noqa: E402
+from quiz import all_answer_combinations, profile_from_answers  # noqa: E402
+from rankings import RankingTable  # noqa: E402
+from reranking import Reranker  # noqa: E402
+from semantic import SemanticIndex  # noqa: E402
+from sessions import SessionProfile  # noqa: E402
+
+DEFAULT_SIZES = (20, 1000, 10000, 100000)
+URGENT_ISSUES = ("🚨 임보 종료 임박!", "🚨 겨울철 야외견사 위험 - 따뜻한 실내 임보 시급")
+
+
+def synthetic_catalog(n, seed=0):
+    # 실제 강아지 정보를 틀로 쓰고 태그/체중/긴급도만 무작위로
+    rng = random.Random(seed)
+    with open(os.path.join(BASE_DIR, "data", "dogs.json"), "r", encoding="utf-8") as f:
+        base = json.load(f)
+    vocab = list(tag_vocabulary(base))
+    # 카탈로그가 커지면 태그 종류도 늘어난다고 가정 (500마리당 1개)
+    vocab += [f"#가상태그_{i:04d}" for i in range(n // 500)]
+    dogs = []
+    for i in range(n):
+        dog = copy.deepcopy(base[i % len(base)])
+        dog["dog_id"] = f"syn_{i:06d}"
+        dog["personality_tags"] = rng.sample(vocab, rng.randint(3, 8))
+        dog["basic_info"]["weight"] = f"약 {rng.randint(3, 35)}kg"
+        if rng.random() < 0.1:
+            dog["basic_info"]["health_issue"] = rng.choice(URGENT_ISSUES)
+        else:
+            dog["basic_info"].pop("health_issue", None)
+        dogs.append(dog)
+    return dogs
+
+
+def synthetic_profiles(vocab, seed=0):
+    # 성향 테스트 243가지 조합 + 관상 태그 3~5개
+    rng = random.Random(seed)
+    return [profile_from_answers(combo, rng.sample(vocab, rng.randint(3, 5))) for combo in all_answer_combinations()]
+
+
+def measure(fn, repeat=5, number=1):
+    # fn 을 number 번 실행하는 시간을 repeat 번 재서 1회당 초 단위 통계
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def bench_app_step4(json_path, db_path, repeat):
+    # Streamlit AppTest 로 결과 화면(Step 4) 한 번 그리는 시간
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["DOG_MATCH_CATALOG_DB"] = db_path
+    os.environ["DOG_MATCH_CATALOG_JSON"] = json_path
+    os.environ.setdefault("DOG_MATCH_MODEL_BACKEND", "fake")  # API 키 없이
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+    def run():
+        at = AppTest.from_file(os.path.join(BASE_DIR, "app.py"), default_timeout=600)
+        at.session_state.step = 4
+        at.session_state.profile = SessionProfile(["#순둥이", "#겁쟁이", "#산책잘함", "#실내정적"], "small", True)
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+    cold = measure(run, repeat=1)  # 첫 실행: 카탈로그/인덱스 로드 포함
+    warm = measure(run, repeat=repeat)
+    return {"cold": cold, "warm": warm}
+
+
+def run_size(n, repeat, workdir, with_app):
+    print(f"[{n:,}마리] 가상 카탈로그 생성...", file=sys.stderr)
+    dogs = synthetic_catalog(n)
+    json_path = os.path.join(workdir, f"dogs_{n}.json")
+    db_path = os.path.join(workdir, f"dogs_{n}.sqlite3")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(dogs, f, ensure_ascii=False)
+    store = CatalogStore(db_path)
+    store.import_json(json_path)
+
+    def load_json():
+        with open(json_path, "r", encoding="utf-8") as f:
+            json.load(f)
+
+    loaded = store.load_dogs()
+    engine = MatchEngine(loaded)
+    vocab = list(engine.vocab)
+    profiles = synthetic_profiles(vocab)
+    scores = engine.score(profiles[0])
+    state = {"i": 0}
+
+    def score_one():
+        state["i"] = (state["i"] + 1) % len(profiles)
+        engine.score(profiles[state["i"]])
+
+    table = RankingTable(engine)
+    combos = list(all_answer_combinations())
+    photo_tags = [sorted(p.tags)[:4] for p in profiles]
+
+    def table_rank():
+        # 메모에 없는 경우 (조합 점수 + 관상 태그 몫)
+        table._memo.clear()
+        state["i"] = (state["i"] + 1) % len(combos)
+        table.rank(combos[state["i"]], photo_tags[state["i"]])
+
+    reranker = Reranker()
+
+    def reranked_table_rank():
+        # 재정렬 (메모 없이 점수 배열에서 후보 풀 → 노출/다양성)
+        state["i"] = (state["i"] + 1) % len(combos)
+        table.rank(combos[state["i"]], photo_tags[state["i"]], reranker=reranker, seed=state["i"])
+
+    semantic_table = RankingTable(engine, semantic=True)
+
+    def semantic_table_rank():
+        # 의미 기반 (태그 유사도 열은 처음 한 번 계산 뒤 재사용)
+        semantic_table._memo.clear()
+        state["i"] = (state["i"] + 1) % len(combos)
+        semantic_table.rank(combos[state["i"]], photo_tags[state["i"]])
+
+    result = {
+        "dogs": n,
+        "tags": len(vocab),
+        "profiles": len(profiles),
+        "load_dogs_json": measure(load_json, repeat),
+        "load_dogs_store": measure(store.load_dogs, repeat),
+        "tag_vocabulary": measure(lambda: tag_vocabulary(loaded), repeat),
+        "match_engine_build": measure(lambda: MatchEngine(loaded), repeat),
+        "score_per_profile": measure(score_one, repeat, number=len(profiles)),
+        "score_many_all_profiles": measure(lambda: engine.score_many(profiles), repeat),
+        "top_k": measure(lambda: engine.top_k(scores, 4), repeat, number=100),
+        "full_sort_baseline": measure(lambda: np.argsort(-scores, kind="stable")[:4], repeat, number=100),
+        "rank_per_profile": measure(lambda: engine.rank(profiles[0], 4), repeat, number=20),
+        "ranking_table_build": measure(lambda: RankingTable(engine), repeat),
+        "ranking_table_rank": measure(table_rank, repeat, number=50),
+        "reranked_table_rank": measure(reranked_table_rank, repeat, number=50),
+        "semantic_index_build": measure(lambda: SemanticIndex(engine), repeat),
+        "semantic_table_rank": measure(semantic_table_rank, repeat, number=50),
+    }
+    if with_app:
+        result["app_step4"] = bench_app_step4(json_path, db_path, max(1, repeat // 2))
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(before_path, after_path):
+    # 같은 항목의 median 비교 (after / before)
+    with open(before_path, "r", encoding="utf-8") as f:
+        before = {r["dogs"]: r for r in json.load(f)["results"]}
+    with open(after_path, "r", encoding="utf-8") as f:
+        after = {r["dogs"]: r for r in json.load(f)["results"]}
+    for n in sorted(set(before) & set(after)):
+        print(f"[{n:,}마리]")
+        for name, stats in after[n].items():
+            old = before[n].get(name)
+            if isinstance(stats, dict) and "median" in stats and isinstance(old, dict) and "median" in old:
+                ratio = stats["median"] / old["median"] if old["median"] else float("inf")
+                print(f"  {name:26s} {old['median'] * 1e3:10.3f}ms → {stats['median'] * 1e3:10.3f}ms  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="댕칼코마니 성능 측정")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-app", action="store_true", help="Streamlit 결과 화면 측정 생략")
+    parser.add_argument("--out", help="결과 JSON 경로 (기본: benchmarks/results/<커밋>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = git_commit()
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run_size(n, args.repeat, workdir, not args.no_app) for n in args.sizes]
+
+    report = {
+        "commit": commit,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    out = args.out or os.path.join(BASE_DIR, "benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
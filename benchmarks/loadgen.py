@@ -0,0 +1,343 @@
+# ==========================================
+# 부하 테스트 (Step 1 → 4 동시 세션)
+# ==========================================
+# 가짜 모델 백엔드(model_backends.FakeBackend)로 API 비용 없이 여러 사용자가
+# 동시에 소개 → 관상 분석 → 성향 테스트 → 결과 화면까지 진행하는 상황을 흉내 냅니다.
+# 세션마다 Streamlit AppTest 를 스레드 하나로 돌리기 때문에 실제 서버 한 대처럼
+# st.cache_resource (카탈로그, 분석 작업 풀, 썸네일 캐시)를 모든 세션이 함께 씁니다.
+#
+#   python benchmarks/loadgen.py --sessions 5 10 20 40
+#   python benchmarks/loadgen.py --sessions 50 --latency uniform:1,6 --error-rate 0.05 --slo 20
+#   python benchmarks/loadgen.py --sessions 20 40 --backend local   (로컬 CPU 태그 추출기, local_tagger.py)
+#
+# 분석 작업 풀 크기 등은 평소처럼 환경 변수로 (DOG_MATCH_ANALYSIS_WORKERS=8 ...)
+# 결과: benchmarks/results/load_<커밋>.json
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from bench import git_commit  # noqa: E402
+
+STEPS = ("step1", "step2", "upload", "submit", "analysis", "step3", "step4")
+
+
+class PhotoFile(io.BytesIO):
+    # st.file_uploader 가 돌려주는 UploadedFile 대신 쓰는 객체 (UploadedFile 도 BytesIO)
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+        self.type = "image/jpeg"
+        self.size = len(data)
+        self.file_id = name
+
+
+def load_photos():
+    # 사진 파일 목록 (세션마다 바이트를 조금씩 달리해서 분석 캐시에 걸리지 않게)
+    image_dir = os.path.join(BASE_DIR, "images")
+    photos = []
+    for name in sorted(os.listdir(image_dir)):
+        if name.lower().endswith((".jpg", ".jpeg")):
+            with open(os.path.join(image_dir, name), "rb") as f:
+                photos.append(f.read())
+    return photos
+
+
+def patch_file_uploader():
+    # AppTest 는 파일 업로드를 지원하지 않아서, 세션 상태에 넣어 둔 사진을 돌려주도록 바꿔치기
+    import streamlit as st
+
+    def fake_file_uploader(*args, **kwargs):
+        return st.session_state.get("_loadgen_photo")
+
+    st.file_uploader = fake_file_uploader
+
+
+def patch_app_test():
+    # AppTest 는 실행할 때마다 전역 상태(Runtime, config)를 바꿨다가 되돌려서
+    # 여러 세션을 동시에 돌리면 서로의 실행을 깨뜨림 → 부하 테스트 동안 한 번만 설정해 두고 함께 쓰기
+    import contextlib
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner import ScriptRunner
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: shared)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+
+    # - 세션 ID 가 모두 "test session id" → 세션별 저장소(sessions.SessionStore)가 섞이지 않게 AppTest 마다 따로
+    # - 실행마다 새 ScriptCache 라 여러 스레드가 app.py 를 동시에 compile 하다 가끔 SystemError(빈 화면)
+    #   → 실제 서버처럼 하나를 함께 씀
+    base_init = ScriptRunner.__init__
+    script_cache = ScriptCache()
+
+    def init_shared(self, session_id, main_script_path, session_state, *args, **kwargs):
+        kwargs["script_cache"] = script_cache
+        base_init(self, f"loadgen-{id(session_state):x}", main_script_path, session_state, *args, **kwargs)
+
+    ScriptRunner.__init__ = init_shared
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def pick(q):
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    return {
+        "count": len(values),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": values[-1],
+    }
+
+
+class Session:
+    def __init__(self, index, photo, args, rng):
+        self.index = index
+        self.photo = photo
+        self.args = args
+        self.rng = rng
+        self.timings = {}
+        self.status = "running"
+        self.busy_rejections = 0
+        self.polls = 0
+        self.quiz_only = False  # 할당량 포화로 관상 분석 없이 성향 테스트로 넘어감
+
+    def _timed(self, name, fn):
+        start = time.perf_counter()
+        fn()
+        self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - start
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].message)
+
+    def _click(self, label_prefix):
+        for button in self.at.button:
+            if button.label.startswith(label_prefix):
+                return button.click()
+        raise RuntimeError(f"버튼 없음: {label_prefix!r} (step {self.at.session_state.step})")
+
+    def _think(self):
+        if self.args.think:
+            time.sleep(self.rng.uniform(0, 2 * self.args.think))
+
+    def run(self):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = at = AppTest.from_file(os.path.join(BASE_DIR, "app.py"), default_timeout=self.args.timeout)
+        started = time.perf_counter()
+        try:
+            # Step 1 → 2
+            self._timed("step1", at.run)
+            self._think()
+            self._timed("step2", lambda: self._click("나의 댕칼코마니").run())
+
+            # 사진 업로드 → 분석 요청 (작업 풀이 가득 차면 잠깐 뒤 다시)
+            at.session_state["_loadgen_photo"] = self.photo
+            self._timed("upload", at.run)
+            self._think()
+            deadline = time.perf_counter() + self.args.timeout
+            while True:
+                self._timed("submit", lambda: self._click("내 관상 분석하기").run())
+                if at.session_state.analysis_job or at.session_state.profile.analyzed or at.session_state.step == 3:
+                    break
+                self.busy_rejections += 1
+                if time.perf_counter() > deadline:
+                    self.status = "busy"
+                    return self
+                time.sleep(1)
+
+            # 분석 결과 기다리기 (브라우저의 0.5초 fragment 갱신 대신 전체 다시 실행)
+            wait_start = time.perf_counter()
+            while not at.session_state.profile.analyzed and at.session_state.step == 2:
+                if any(b.label.startswith("다시 시도하기") for b in at.button):
+                    self.status = "analysis_failed"
+                    return self
+                if time.perf_counter() > deadline:
+                    self.status = "timeout"
+                    return self
+                time.sleep(self.args.poll)
+                self.polls += 1
+                self._timed("poll", at.run)
+            self.quiz_only = at.session_state.step == 3
+            if not self.quiz_only:
+                self.timings["analysis"] = time.perf_counter() - wait_start
+            self._think()
+
+            # Step 3: 성향 테스트 답변 무작위로
+            if not self.quiz_only:
+                self._timed("step3", lambda: self._click("다음: 성향 테스트").run())
+            for radio in at.radio:
+                radio.set_value(self.rng.choice(radio.options))
+            self._think()
+            self._timed("step4", lambda: self._click("최종 댕칼코마니").run())
+            if at.session_state.step != 4:
+                raise RuntimeError("결과 화면으로 넘어가지 못함")
+            self.status = "quiz_only" if self.quiz_only else "ok"
+        except Exception as e:
+            self.status = "error"
+            self.error = str(e)
+        finally:
+            self.timings["total"] = time.perf_counter() - started
+        return self
+
+
+def run_level(n, args, photos, seed):
+    import telemetry
+
+    before, _, _ = telemetry.metrics.snapshot()
+    rng = random.Random(seed)
+    sessions = []
+    for i in range(n):
+        photo = photos[i % len(photos)] + f"\0loadgen-{seed}-{i}".encode()
+        sessions.append(Session(i, PhotoFile(photo, f"loadgen_{seed}_{i}.jpg"), args, random.Random(rng.random())))
+
+    threads = []
+    started = time.perf_counter()
+    for i, session in enumerate(sessions):
+        thread = threading.Thread(target=session.run, name=f"loadgen-{i}", daemon=True)
+        threads.append(thread)
+        thread.start()
+        if args.ramp:
+            time.sleep(args.ramp / n)
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    after, _, _ = telemetry.metrics.snapshot()
+    counters = {}
+    for key, value in after.items():
+        delta = value - before.get(key, 0)
+        if delta:
+            name, labels = key
+            counters[name + "".join(f"[{k}={v}]" for k, v in labels)] = delta
+
+    statuses = {}
+    for session in sessions:
+        statuses[session.status] = statuses.get(session.status, 0) + 1
+    ok = [s for s in sessions if s.status in ("ok", "quiz_only")]  # 성향 테스트만으로 매칭한 세션도 완료
+    errors = sorted({getattr(s, "error", "") for s in sessions if s.status == "error"})
+    return {
+        "sessions": n,
+        "wall_seconds": wall,
+        "completed_per_minute": len(ok) / wall * 60 if wall else 0,
+        "success_rate": len(ok) / n,
+        "quiz_only_rate": statuses.get("quiz_only", 0) / n,
+        "statuses": statuses,
+        "busy_rejections": sum(s.busy_rejections for s in sessions),
+        "polls": sum(s.polls for s in sessions),
+        "latency": {
+            name: percentiles([s.timings[name] for s in ok if name in s.timings])
+            for name in STEPS + ("poll", "total")
+        },
+        "counters": counters,
+        "errors": errors[:5],
+    }
+
+
+def print_level(result):
+    latency = result["latency"]
+
+    def p(name, q="p95"):
+        stats = latency.get(name)
+        return f"{stats[q]:7.2f}s" if stats else "      -"
+
+    print(
+        f"[{result['sessions']:4d} 세션] 성공 {result['success_rate'] * 100:5.1f}%  "
+        f"처리량 {result['completed_per_minute']:6.1f}/분  성향만 {result['quiz_only_rate'] * 100:5.1f}%  "
+        f"p95 분석 {p('analysis')}  결과화면 {p('step4')}  전체 {p('total')}  "
+        f"(거절 {result['busy_rejections']}, {result['statuses']})",
+        file=sys.stderr,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="댕칼코마니 부하 테스트 (가짜 모델 백엔드)")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[5, 10, 20], help="동시 세션 수 (단계별로 차례로)")
+    parser.add_argument("--backend", choices=("fake", "local"), default="fake", help="분석 모델 백엔드")
+    parser.add_argument("--latency", default="lognormal:2.5,0.4", help="가짜 모델 지연 분포 (model_backends 참고)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="가짜 모델 일시적 오류 비율")
+    parser.add_argument("--quota-rpm", type=int, default=0, help="가짜 모델 분당 요청 할당량 (넘으면 429, 0 = 없음)")
+    parser.add_argument("--rpm", type=float, default=0, help="앱 할당량 제한기 분당 요청 수 (0 = 제한 없음)")
+    parser.add_argument("--tpm", type=float, default=0, help="앱 할당량 제한기 분당 토큰 수 (0 = 제한 없음)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="세션 시작을 몇 초에 걸쳐 나눌지")
+    parser.add_argument("--think", type=float, default=0.0, help="단계 사이 평균 대기 시간(초)")
+    parser.add_argument("--poll", type=float, default=0.5, help="분석 결과 확인 간격(초)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="세션 하나의 분석 대기 상한(초)")
+    parser.add_argument("--slo", type=float, default=15.0, help="전체 소요 p95 목표(초) - 한계 판단 기준")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="결과 JSON 경로 (기본: benchmarks/results/load_<커밋>.json)")
+    args = parser.parse_args()
+
+    # 앱을 불러오기 전에 환경 설정 (분석 캐시는 임시 폴더에 새로)
+    workdir = tempfile.mkdtemp(prefix="dog-match-load-")
+    os.environ["DOG_MATCH_MODEL_BACKEND"] = args.backend
+    os.environ["DOG_MATCH_FAKE_LATENCY"] = args.latency
+    os.environ["DOG_MATCH_FAKE_ERROR_RATE"] = str(args.error_rate)
+    os.environ["DOG_MATCH_FAKE_SEED"] = str(args.seed)
+    os.environ["DOG_MATCH_FAKE_QUOTA_RPM"] = str(args.quota_rpm)
+    os.environ["DOG_MATCH_GEMINI_RPM"] = str(args.rpm)
+    os.environ["DOG_MATCH_GEMINI_TPM"] = str(args.tpm)
+    os.environ["DOG_MATCH_CACHE_DIR"] = workdir
+    patch_file_uploader()
+    patch_app_test()
+    photos = load_photos()
+
+    results = []
+    for level, n in enumerate(args.sessions):
+        result = run_level(n, args, photos, seed=args.seed * 1000 + level)
+        print_level(result)
+        results.append(result)
+
+    # 성공률 99% 이상 + 전체 p95 가 목표 이내인 가장 큰 동시 세션 수
+    ceiling = None
+    for result in results:
+        total = result["latency"]["total"]
+        if result["success_rate"] >= 0.99 and total and total["p95"] <= args.slo:
+            ceiling = max(ceiling or 0, result["sessions"])
+    print(f"목표(p95 ≤ {args.slo:.0f}초) 안에서 버틴 최대 동시 세션: {ceiling or '없음'}", file=sys.stderr)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {k: v for k, v in vars(args).items() if k != "out"},
+        "analysis_workers": os.environ.get("DOG_MATCH_ANALYSIS_WORKERS", "4"),
+        "ceiling": ceiling,
+        "results": results,
+    }
+    out = args.out or os.path.join(BASE_DIR, "benchmarks", "results", f"load_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+# ==========================================
+# 공용 캐시 계층 (메모리 LRU + 여러 서버가 함께 쓰는 공유 저장소)
+# ==========================================
+# Streamlit 서버(레플리카)를 여러 대 띄우면 카탈로그 읽기, 썸네일 만들기, 관상 분석 요청을
+# 서버마다 따로 하게 됩니다. 이 모듈은
+# - MemoryTier: 프로세스 안 LRU (바이트 예산)
+# - 공유 저장소: DiskTier(같은 디스크/볼륨) 또는 RedisTier(Redis 호환 서버)
+#   (LocalRedis 는 같은 프로세스 안에서 Redis 흉내 - 부하 테스트/점검용)
+# - StampedeGuard: 같은 키를 동시에 계산하려는 요청은 하나만 계산하고 나머지는 결과를 기다림
+#   (프로세스 안은 스레드끼리, 서버끼리는 공유 저장소의 잠금 키로)
+# 를 묶은 Cache 를 제공합니다.
+#
+# 설정: DOG_MATCH_SHARED_CACHE
+#   (비움) 공유 없음 | disk | disk:/경로 | redis://호스트:포트/DB | memory://
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import telemetry
+
+SHARED_SPEC = os.environ.get("DOG_MATCH_SHARED_CACHE", "")
+LOCK_TTL = float(os.environ.get("DOG_MATCH_CACHE_LOCK_TTL", "60"))  # 다른 서버가 계산 중일 때 기다리는 최대 시간(초)
+LOCK_POLL = 0.2
+SWEEP_EVERY = 500  # DiskTier 가 이만큼 저장할 때마다 만료 파일 정리
+
+# 값이 token 일 때만 지우기 (잠금 해제, 그사이 만료되어 다른 서버가 잡은 잠금은 그대로)
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+# ---------- 값 변환 ----------
+class BytesCodec:
+    @staticmethod
+    def encode(value):
+        return value
+
+    @staticmethod
+    def decode(data):
+        return data
+
+
+class JsonCodec:
+    @staticmethod
+    def encode(value):
+        return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+    @staticmethod
+    def decode(data):
+        return json.loads(data)
+
+
+# ---------- 저장소 ----------
+class MemoryTier:
+    # 프로세스 안 LRU (값 크기 합이 max_bytes 를 넘으면 가장 오래 안 쓴 것부터)
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, (_, old_size) = self._items.popitem(last=False)
+                self._bytes -= old_size
+
+    def delete(self, key):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+
+class DiskTier:
+    # 키마다 파일 하나 (앞 8바이트는 만료 시각, 0 이면 만료 없음), 쓰기는 임시 파일 → 교체
+    name = "shared_disk"
+    _HEADER = struct.Struct(">d")
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _tmp_path(self, path):
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.{uuid.uuid4().hex[:8]}.tmp"
+
+    def _write_tmp(self, path, data, ttl):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = self._tmp_path(path)
+        with open(tmp_path, "wb") as f:
+            f.write(self._HEADER.pack(time.time() + ttl if ttl else 0.0))
+            f.write(data)
+        return tmp_path
+
+    def _take(self, path, keep):
+        # path 를 임시 이름으로 옮겨(원자적) 내용을 확인, keep(내용)이면 되돌려 놓음 → 지웠으면 True
+        taken = self._tmp_path(path)
+        try:
+            os.rename(path, taken)
+        except OSError:
+            return False
+        try:
+            with open(taken, "rb") as f:
+                data = f.read()
+            if not keep(data):
+                return True
+            try:
+                os.link(taken, path)
+            except FileExistsError:
+                pass  # 그사이 새 파일이 생김 (그쪽을 그대로 둠)
+            return False
+        finally:
+            os.remove(taken)
+
+    def _expired(self, data):
+        if len(data) < self._HEADER.size:
+            return True
+        expires_at = self._HEADER.unpack_from(data)[0]
+        return bool(expires_at) and time.time() > expires_at
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if self._expired(data):
+            return None
+        return data[self._HEADER.size:]
+
+    def get(self, key):
+        return self._read(self._path(key))
+
+    def set(self, key, data, ttl=None):
+        path = self._path(key)
+        os.replace(self._write_tmp(path, data, ttl), path)
+        self._writes += 1
+        if self._writes % SWEEP_EVERY == 0:
+            self.sweep()
+
+    def add(self, key, data, ttl=None):
+        # 없을 때만 저장 (잠금용), 저장했으면 True
+        # 다 쓴 임시 파일을 link 로 붙여서, 다른 프로세스는 항상 내용이 다 있는 파일만 봄
+        path = self._path(key)
+        tmp_path = self._write_tmp(path, data, ttl)
+        try:
+            for _ in range(2):
+                try:
+                    os.link(tmp_path, path)
+                    return True
+                except FileExistsError:
+                    pass
+                # 만료된 잠금만 치우고 한 번 더 (확인하는 사이 새로 잡힌 잠금은 되돌려 놓음)
+                if self._read(path) is not None or not self._take(path, keep=lambda d: not self._expired(d)):
+                    return False
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def release(self, key, data):
+        # 값이 data 일 때만 지우기 (잠금 해제), 지웠으면 True
+        path = self._path(key)
+        current = self._read(path)
+        if current is None or current != data:
+            return False
+        return self._take(path, keep=lambda d: d[self._HEADER.size:] != data)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def sweep(self):
+        # 만료된 파일 지우기
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                # 확인하는 사이 새로 저장된 파일(잠금 포함)은 지우지 않음
+                if not name.endswith(".tmp") and self._read(path) is None:
+                    removed += self._take(path, keep=lambda d: not self._expired(d))
+        return removed
+
+
+class LocalRedis:
+    # Redis 클라이언트의 get / set(ex, nx) / delete / eval(RELEASE_SCRIPT) 만 흉내 내는 프로세스 안 저장소
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key, now):
+        item = self._data.get(key)
+        if item is not None and item[1] and now > item[1]:
+            del self._data[key]
+            return None
+        return item
+
+    def get(self, key):
+        with self._lock:
+            item = self._alive(key, time.time())
+            return None if item is None else item[0]
+
+    def set(self, key, value, ex=None, nx=False):
+        now = time.time()
+        with self._lock:
+            if nx and self._alive(key, now) is not None:
+                return None
+            self._data[key] = (bytes(value), now + ex if ex else 0)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def eval(self, script, numkeys, *keys_and_args):
+        # RELEASE_SCRIPT 만 (잠금 안에서 비교 후 삭제)
+        if script != RELEASE_SCRIPT or numkeys != 1:
+            raise NotImplementedError("LocalRedis.eval 은 RELEASE_SCRIPT 만 지원합니다")
+        key, token = keys_and_args
+        with self._lock:
+            item = self._alive(key, time.time())
+            if item is None or item[0] != bytes(token):
+                return 0
+            del self._data[key]
+            return 1
+
+
+class RedisTier:
+    name = "redis"
+
+    def __init__(self, client, prefix="dog-match:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, data, ttl=None):
+        self.client.set(self.prefix + key, data, ex=int(ttl) if ttl else None)
+
+    def add(self, key, data, ttl=None):
+        return bool(self.client.set(self.prefix + key, data, ex=max(1, int(ttl)) if ttl else None, nx=True))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def release(self, key, data):
+        # 값이 data 일 때만 지우기 (비교와 삭제를 서버에서 한 번에)
+        return bool(self.client.eval(RELEASE_SCRIPT, 1, self.prefix + key, data))
+
+
+_local_redis = LocalRedis()
+
+
+def open_shared(spec=SHARED_SPEC, cache_dir=None):
+    # 설정 문자열 → 공유 저장소 (없거나 연결할 수 없으면 None)
+    if not spec:
+        return None
+    if spec == "disk" or spec.startswith("disk:"):
+        directory = spec[len("disk:"):] or os.path.join(cache_dir or ".cache", "shared")
+        return DiskTier(directory)
+    if spec.startswith("memory://"):
+        return RedisTier(_local_redis)
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+
+            client = redis.Redis.from_url(spec, socket_timeout=2)
+            client.ping()
+            return RedisTier(client)
+        except Exception as e:  # 패키지가 없거나 서버에 연결할 수 없으면 공유 없이
+            print(f"공유 캐시 사용 안 함 ({spec}): {e}")
+            return None
+    raise ValueError(f"알 수 없는 공유 캐시 설정: {spec!r}")
+
+
+# ---------- 동시 계산 막기 ----------
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class StampedeGuard:
+    # 같은 키는 한 번만 계산 (프로세스 안: 먼저 온 스레드가 계산, 서버끼리: 공유 저장소 잠금 키)
+    def __init__(self, shared=None, lock_ttl=LOCK_TTL, poll=LOCK_POLL):
+        self.shared = shared
+        self.lock_ttl = lock_ttl
+        self.poll = poll
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, lookup, compute):
+        # lookup(): 이미 채워졌으면 값, 아니면 None / compute(): 계산하고 저장까지 한 뒤 값
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            telemetry.incr("cache_coalesced", where="process")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = self._run_shared(key, lookup, compute)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _run_shared(self, key, lookup, compute):
+        if self.shared is None or not hasattr(self.shared, "add"):
+            return compute()
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex.encode("ascii")
+        deadline = time.monotonic() + self.lock_ttl
+        waited = False
+        while not self._try_lock(lock_key, token):
+            # 다른 서버가 계산 중 → 결과가 올라오거나 잠금이 풀릴 때까지
+            waited = True
+            time.sleep(self.poll)
+            value = lookup()
+            if value is not None:
+                telemetry.incr("cache_coalesced", where="shared")
+                return value
+            if time.monotonic() > deadline:
+                return compute()  # 잠금을 잡은 서버가 죽었다고 보고 직접 계산
+        try:
+            if waited:
+                value = lookup()
+                if value is not None:
+                    return value
+            return compute()
+        finally:
+            try:
+                self.shared.release(lock_key, token)
+            except Exception as e:
+                print(f"공유 캐시 잠금 해제 실패: {e}")
+
+    def _try_lock(self, lock_key, token):
+        try:
+            return self.shared.add(lock_key, token, self.lock_ttl)
+        except Exception as e:  # 공유 저장소 오류면 잠금 없이 계산
+            print(f"공유 캐시 잠금 실패: {e}")
+            return True
+
+
+# ---------- 캐시 ----------
+class Cache:
+    # 이름공간 하나 (memory_bytes=0 이면 메모리 단계 없이 공유 저장소만)
+    def __init__(self, namespace, memory_bytes=0, shared=None, ttl=None, codec=BytesCodec):
+        self.namespace = namespace
+        self.memory = MemoryTier(memory_bytes) if memory_bytes else None
+        self.shared = shared
+        self.ttl = ttl
+        self.codec = codec
+        self.guard = StampedeGuard(shared)
+
+    def _shared_key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _record(self, tier, hit):
+        telemetry.incr("cache_requests", cache=f"{self.namespace}_{tier}", result="hit" if hit else "miss")
+
+    def _shared_get(self, key):
+        try:
+            return self.shared.get(self._shared_key(key))
+        except Exception as e:  # 공유 저장소 오류는 없는 것으로
+            print(f"공유 캐시 읽기 실패 ({self.namespace}): {e}")
+            return None
+
+    def peek(self, key):
+        # 통계 없이 조회 (다른 요청이 채웠는지 확인할 때)
+        if self.memory is not None:
+            value = self.memory.get(key)
+            if value is not None:
+                return value
+        if self.shared is None:
+            return None
+        data = self._shared_get(key)
+        if data is None:
+            return None
+        value = self.codec.decode(data)
+        if self.memory is not None:
+            self.memory.set(key, value, len(data))
+        return value
+
+    def get(self, key):
+        if self.memory is not None:
+            value = self.memory.get(key)
+            self._record("memory", value is not None)
+            if value is not None:
+                return value
+        if self.shared is None:
+            return None
+        data = self._shared_get(key)
+        self._record(self.shared.name, data is not None)
+        if data is None:
+            return None
+        value = self.codec.decode(data)
+        if self.memory is not None:
+            self.memory.set(key, value, len(data))
+        return value
+
+    def set(self, key, value):
+        data = self.codec.encode(value)
+        if self.memory is not None:
+            self.memory.set(key, value, len(data))
+        if self.shared is not None:
+            try:
+                self.shared.set(self._shared_key(key), data, self.ttl)
+            except Exception as e:  # 공유 저장소 오류로 화면이 깨지지 않게
+                print(f"공유 캐시 저장 실패 ({self.namespace}): {e}")
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        def fill():
+            value = compute()
+            if value is not None:
+                self.set(key, value)
+            return value
+
+        return self.guard.run(self._shared_key(key), lambda: self.peek(key), fill)
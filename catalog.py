@@ -0,0 +1,256 @@
+# ==========================================
+# 유기견 카탈로그 저장소 (SQLite)
+# ==========================================
+# data/dogs.json 을 가져와(import) 인덱스가 있는 DB로 관리합니다.
+# - 태그 / 체급 / 긴급도 / 입양 상태별 인덱스
+# - 변경될 때마다 version 이 올라가서, 앱은 재시작 없이 새 데이터를 읽습니다
+#
+# 가져오기:  python catalog.py import data/dogs.json
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from matching import is_urgent, parse_weight, weight_class, SIZE_CLASSES, CARE_TAGS
+
+DEFAULT_STATUS = "available"  # 입양 가능
+
+
+def content_hash(dog):
+    # 강아지 항목 내용 해시 (키 순서와 관계없이 같은 내용이면 같은 값)
+    return hashlib.sha256(json.dumps(dog, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def dog_id_of(dog, position):
+    # dog_id 가 없는 항목은 사진 파일명(dog_007)으로, 그것도 없으면 순번으로
+    if dog.get("dog_id"):
+        return dog["dog_id"]
+    image_path = dog.get("basic_info", {}).get("image_path")
+    if image_path:
+        return os.path.splitext(os.path.basename(image_path))[0]
+    return f"dog_{position + 1:03d}"
+
+
+class CatalogStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS dogs (
+                dog_id TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                weight_class INTEGER NOT NULL,
+                urgent INTEGER NOT NULL,
+                care INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dog_tags (
+                dog_id TEXT NOT NULL REFERENCES dogs(dog_id) ON DELETE CASCADE,
+                tag TEXT NOT NULL,
+                PRIMARY KEY (dog_id, tag)
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_dog_tags_tag ON dog_tags(tag);
+            CREATE INDEX IF NOT EXISTS idx_dogs_weight_class ON dogs(weight_class);
+            CREATE INDEX IF NOT EXISTS idx_dogs_urgent ON dogs(urgent);
+            CREATE INDEX IF NOT EXISTS idx_dogs_status ON dogs(status, position);
+        """)
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        # 이 DB 의 고유 이름 (같은 DB 를 쓰는 서버끼리 공유 캐시 키로 사용)
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('catalog_id', ?)", (uuid.uuid4().hex,))
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def version(self):
+        # 매 실행(rerun)마다 불러도 될 만큼 가벼운 조회
+        rows = self._query("SELECT value FROM meta WHERE key = 'version'")
+        return int(rows[0][0]) if rows else 0
+
+    def catalog_id(self):
+        return self._query("SELECT value FROM meta WHERE key = 'catalog_id'")[0][0]
+
+    def count(self, status=DEFAULT_STATUS):
+        return self._query("SELECT COUNT(*) FROM dogs WHERE status = ?", (status,))[0][0]
+
+    def _bump_version(self):
+        self._conn.execute("""
+            INSERT INTO meta (key, value) VALUES ('version', '1')
+            ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+        """)
+
+    def _row(self, dog, position, now):
+        info = dog.get("basic_info", {})
+        tags = list(dict.fromkeys(dog.get("personality_tags", [])))
+        dog_id = dog_id_of(dog, position)
+        row = (
+            dog_id,
+            position,
+            json.dumps(dog, ensure_ascii=False),
+            weight_class(parse_weight(info.get("weight", "0kg"))),
+            int(is_urgent(info.get("health_issue"))),
+            int(any(t in tags for t in CARE_TAGS)),
+            dog.get("status", DEFAULT_STATUS),
+            now,
+        )
+        return dog_id, row, tags
+
+    def import_dogs(self, dogs):
+        # 전체 교체 (기존 JSON 스키마 그대로)
+        now = time.time()
+        rows, tag_rows = [], []
+        for position, dog in enumerate(dogs):
+            dog_id, row, tags = self._row(dog, position, now)
+            rows.append(row)
+            tag_rows.extend((dog_id, tag) for tag in tags)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM dog_tags")
+                self._conn.execute("DELETE FROM dogs")
+                self._conn.executemany("INSERT INTO dogs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._conn.executemany("INSERT OR IGNORE INTO dog_tags VALUES (?, ?)", tag_rows)
+                self._bump_version()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def apply_delta(self, upserts, removed_ids=(), order=None):
+        # 바뀐 강아지만 반영 (upserts: (순번, dog) 목록), 새 version 반환
+        # order: 전체 dog_id 목록(카탈로그 순서) - 주면 같은 트랜잭션에서 순번을 다시 매김
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for position, dog in upserts:
+                    dog_id, row, tags = self._row(dog, position, now)
+                    self._conn.execute("INSERT OR REPLACE INTO dogs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+                    self._conn.execute("DELETE FROM dog_tags WHERE dog_id = ?", (dog_id,))
+                    self._conn.executemany("INSERT OR IGNORE INTO dog_tags VALUES (?, ?)", [(dog_id, t) for t in tags])
+                self._conn.executemany("DELETE FROM dogs WHERE dog_id = ?", [(d,) for d in removed_ids])
+                if order is not None:
+                    self._conn.executemany(
+                        "UPDATE dogs SET position = ? WHERE dog_id = ? AND position != ?",
+                        [(position, dog_id, position) for position, dog_id in enumerate(order)],
+                    )
+                self._bump_version()
+                version = int(self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return version
+
+    def import_json(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return self.import_dogs(json.load(f))
+
+    def load_dogs(self, status=DEFAULT_STATUS):
+        # 기존 JSON 과 같은 모양의 dict 목록 (dog_id 는 항상 채워서)
+        dogs = []
+        for dog_id, data in self._query(
+            "SELECT dog_id, data FROM dogs WHERE status = ? ORDER BY position", (status,)
+        ):
+            dog = json.loads(data)
+            dog["dog_id"] = dog_id
+            dogs.append(dog)
+        return dogs
+
+    def content_hashes(self):
+        # 입양 상태와 관계없이 모든 강아지의 dog_id → 내용 해시 (dogs.json 과 차이 비교용)
+        hashes = {}
+        for dog_id, data in self._query("SELECT dog_id, data FROM dogs"):
+            dog = json.loads(data)
+            dog["dog_id"] = dog_id
+            hashes[dog_id] = content_hash(dog)
+        return hashes
+
+    def load_snapshot(self, status=DEFAULT_STATUS):
+        # version, 강아지 목록(load_dogs), 전체 내용 해시(content_hashes)를 한 읽기 트랜잭션에서
+        # (읽는 사이 다른 곳에서 DB를 바꿔도 세 값이 같은 버전)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                rows = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchall()
+                dog_rows = self._conn.execute("SELECT dog_id, data, status FROM dogs ORDER BY position").fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+        dogs, hashes = [], {}
+        for dog_id, data, dog_status in dog_rows:
+            dog = json.loads(data)
+            dog["dog_id"] = dog_id
+            hashes[dog_id] = content_hash(dog)
+            if dog_status == status:
+                dogs.append(dog)
+        return {"version": int(rows[0][0]) if rows else 0, "dogs": dogs, "hashes": hashes}
+
+    def candidate_ids(self, user_tags, size_pref="medium", care_ok=False, status=DEFAULT_STATUS):
+        # 점수가 0보다 클 수 있는 강아지만 (태그 하나라도 겹침 / 체급 일치 / 케어 / 긴급)
+        tags = list(set(user_tags))
+        clauses = ["d.urgent = 1"]
+        params = []
+        if tags:
+            clauses.append(
+                f"d.dog_id IN (SELECT dog_id FROM dog_tags WHERE tag IN ({', '.join('?' * len(tags))}))"
+            )
+            params.extend(tags)
+        if size_pref in SIZE_CLASSES:
+            clauses.append("d.weight_class = ?")
+            params.append(SIZE_CLASSES[size_pref])
+        if care_ok:
+            clauses.append("d.care = 1")
+        query = f"SELECT d.dog_id FROM dogs d WHERE d.status = ? AND ({' OR '.join(clauses)}) ORDER BY d.position"
+        return [row[0] for row in self._query(query, [status, *params])]
+
+
+def default_path(base_dir):
+    return os.environ.get("DOG_MATCH_CATALOG_DB") or os.path.join(base_dir, "data", "dogs.sqlite3")
+
+
+def default_json_path(base_dir):
+    # 원본 JSON (data/dogs.json, 없으면 예전 위치인 dogs.json)
+    if os.environ.get("DOG_MATCH_CATALOG_JSON"):
+        return os.environ["DOG_MATCH_CATALOG_JSON"]
+    for json_path in (os.path.join(base_dir, "data", "dogs.json"), os.path.join(base_dir, "dogs.json")):
+        if os.path.exists(json_path):
+            return json_path
+    return os.path.join(base_dir, "data", "dogs.json")
+
+
+def open_store(base_dir):
+    # 저장소가 비어 있으면 기존 JSON 에서 가져오기
+    path = default_path(base_dir)
+    store = CatalogStore(path)
+    if store.version() == 0:
+        json_path = default_json_path(base_dir)
+        if os.path.exists(json_path):
+            print(f"카탈로그 가져오기: {json_path} → {path} ({store.import_json(json_path)}마리)")
+    return store
+
+
+if __name__ == "__main__":
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    if len(sys.argv) >= 2 and sys.argv[1] == "import":
+        json_path = sys.argv[2] if len(sys.argv) > 2 else default_json_path(base_dir)
+        store = CatalogStore(default_path(base_dir))
+        count = store.import_json(json_path)
+        print(f"{count}마리 가져오기 완료 (version {store.version()}) → {store.path}")
+    else:
+        print("사용법: python catalog.py import [dogs.json 경로]")
@@ -0,0 +1,184 @@
+# ==========================================
+# 카탈로그 변경 감시 & 부분 갱신
+# ==========================================
+# 백그라운드 스레드가 data/dogs.json 을 주기적으로 확인해서
+# dog_id 기준으로 추가/변경/삭제된 강아지만 DB와 매칭 인덱스에 반영합니다.
+# - 갱신 결과는 버전이 붙은 새 스냅샷으로 만들어 한 번에 교체합니다
+#   (화면을 그리는 중인 세션은 이전 스냅샷을 끝까지 그대로 사용)
+# - 다른 프로세스가 DB를 바꾸면(python catalog.py import) 전체를 다시 읽습니다
+#   (공유 캐시를 주면 같은 DB 의 같은 버전은 서버 한 곳만 DB 에서 읽고 나머지는 캐시에서)
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import telemetry
+from cache_layer import Cache, JsonCodec
+from catalog import DEFAULT_STATUS, content_hash, dog_id_of
+from matching import MatchEngine
+
+POLL_INTERVAL = float(os.environ.get("DOG_MATCH_CATALOG_POLL", "5"))
+KEEP_SNAPSHOTS = 4  # 세션이 고정해 둔 이전 버전을 몇 개까지 보관할지
+SHARED_TTL = 24 * 60 * 60  # 공유 캐시에 둔 카탈로그 버전 보관 시간
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    dogs: list
+    engine: MatchEngine
+    vocab: tuple
+
+
+def with_ids(dogs):
+    # JSON 항목에도 DB와 같은 규칙으로 dog_id 채우기
+    return [{**dog, "dog_id": dog_id_of(dog, position)} for position, dog in enumerate(dogs)]
+
+
+def diff_dogs(old_hashes, new_dogs):
+    # (추가/변경된 (순번, dog) 목록, 삭제된 dog_id 목록)
+    upserts = []
+    seen = set()
+    for position, dog in enumerate(new_dogs):
+        seen.add(dog["dog_id"])
+        if old_hashes.get(dog["dog_id"]) != content_hash(dog):
+            upserts.append((position, dog))
+    removed = [dog_id for dog_id in old_hashes if dog_id not in seen]
+    return upserts, removed
+
+
+class CatalogWatcher:
+    def __init__(self, store, json_path, poll_interval=POLL_INTERVAL, shared=None):
+        self.store = store
+        self.json_path = json_path
+        self.poll_interval = poll_interval
+        self.cache = Cache("catalog", 0, shared, SHARED_TTL, JsonCodec)
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()
+        self._hashes = {}
+        self._json_stamp = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._publish_full(store.version())
+
+    # ---------- 스냅샷 ----------
+    @property
+    def current(self):
+        return next(reversed(self._snapshots.values()))
+
+    def snapshot(self, version=None):
+        # 세션이 고정해 둔 버전이 아직 있으면 그것, 없으면 최신
+        return self._snapshots.get(version) or self.current
+
+    def _publish(self, snapshot):
+        snapshots = OrderedDict(self._snapshots)
+        snapshots[snapshot.version] = snapshot
+        while len(snapshots) > KEEP_SNAPSHOTS:
+            snapshots.popitem(last=False)
+        self._snapshots = snapshots  # 참조 교체 한 번으로 반영
+
+    def _load(self, version):
+        # 버전 version 의 {"version", "dogs", "hashes"} (공유 캐시 → DB)
+        # DB는 버전과 목록을 한 트랜잭션에서 읽고, 그사이 버전이 바뀌었으면 실제로 읽은 버전 키에만 저장
+        catalog_id = self.store.catalog_id()
+        loaded = {}
+
+        def compute():
+            snapshot = self.store.load_snapshot()
+            loaded.update(snapshot)
+            if snapshot["version"] != version:
+                self.cache.set(f"{catalog_id}:v{snapshot['version']}:snapshot", snapshot)
+                return None
+            return snapshot
+
+        snapshot = self.cache.get_or_compute(f"{catalog_id}:v{version}:snapshot", compute)
+        return snapshot or loaded or self.store.load_snapshot()
+
+    def _publish_full(self, version):
+        with telemetry.span("catalog_load", kind="full"):
+            snapshot = self._load(version)
+        version, dogs = snapshot["version"], snapshot["dogs"]
+        with telemetry.span("match_index_build", kind="full"):
+            engine = MatchEngine(dogs, version=version)
+        # 입양 완료 등 매칭에서 빠진 강아지도 포함 (그래야 dogs.json 과 비교할 때 바뀌지 않은 것은 건너뛰고,
+        # JSON 에서 지운 것은 DB 에서도 지움)
+        self._hashes = dict(snapshot["hashes"])
+        self._publish(CatalogSnapshot(version, dogs, engine, engine.active_vocab()))
+
+    # ---------- 변경 감지 ----------
+    def _stamp(self):
+        try:
+            stat = os.stat(self.json_path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def sync_json(self):
+        # dogs.json 이 바뀌었으면 차이만 반영, 반영한 변경 수 반환
+        stamp = self._stamp()
+        if stamp is None or stamp == self._json_stamp:
+            return 0
+        try:
+            with open(self.json_path, "r", encoding="utf-8") as f:
+                new_dogs = with_ids(json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            # 저장 도중 읽은 경우 등 - 다음 확인 때 다시 시도
+            print(f"카탈로그 JSON 읽기 오류: {e}")
+            return 0
+
+        with self._lock:
+            self._json_stamp = stamp
+            upserts, removed = diff_dogs(self._hashes, new_dogs)
+            if not upserts and not removed:
+                return 0
+            order = [dog["dog_id"] for dog in new_dogs]
+            version = self.store.apply_delta(upserts, removed, order=order)
+            current = self.current
+            if version != current.version + 1:
+                # 그 사이 다른 곳에서도 DB가 바뀜 → 전체 다시 읽기
+                self._publish_full(version)
+            else:
+                # 입양 가능이 아닌 강아지는 매칭에서 빼기 (CatalogStore.load_dogs 와 같은 기준)
+                available = [dog for _, dog in upserts if dog.get("status", DEFAULT_STATUS) == DEFAULT_STATUS]
+                unlisted = [dog["dog_id"] for _, dog in upserts if dog.get("status", DEFAULT_STATUS) != DEFAULT_STATUS]
+                with telemetry.span("match_index_build", kind="delta"):
+                    engine = current.engine.with_changes(available, [*removed, *unlisted], version=version, order=order)
+                for _, dog in upserts:
+                    self._hashes[dog["dog_id"]] = content_hash(dog)
+                for dog_id in removed:
+                    self._hashes.pop(dog_id, None)
+                self._publish(CatalogSnapshot(version, engine.dogs, engine, engine.active_vocab()))
+            print(f"카탈로그 갱신 v{version}: 추가/변경 {len(upserts)}, 삭제 {len(removed)}")
+            return len(upserts) + len(removed)
+
+    def sync_store(self):
+        # 다른 프로세스가 DB를 바꿨으면 전체 다시 읽기
+        with self._lock:
+            version = self.store.version()
+            if version != self.current.version:
+                self._publish_full(version)
+                return True
+            return False
+
+    def poll_once(self):
+        try:
+            self.sync_store()
+            self.sync_json()
+        except Exception as e:
+            print(f"카탈로그 감시 오류: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            self.poll_once()
+
+    def start(self):
+        self.poll_once()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="catalog-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
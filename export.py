@@ -0,0 +1,221 @@
+# ==========================================
+# 성향 테스트 조합 x 강아지 점수 일괄 내보내기 (보호소 직원용)
+# ==========================================
+# "이 강아지는 어떤 성향의 입양자에게 잘 맞을까?" 를 화면을 일일이 눌러 보지 않고 표로 봅니다.
+# 성향 테스트 답 조합(243가지) 마다 모든 강아지의 점수와 순위를 한 줄씩 씁니다.
+# - 점수는 결과 화면과 같은 규칙 (quiz.py 답 → 태그, matching.py 가중치, 선택 시 semantic.py)
+# - 순위는 재정렬 없이 점수 → 목록 순서 (결과 화면 DOG_MATCH_RERANK=0 과 같음)
+# - 점수 표는 조건 수 x 강아지 수 하나만, 나머지는 조각(--chunk 줄)씩 만들어 바로 파일에 씀
+#   (작업 프로세스 --workers 개, 동시에 메모리에 있는 조각은 작업 프로세스 수의 두 배까지)
+#
+#   python export.py rankings.csv                  # 카탈로그 DB 전체, 엑셀에서 바로 열리는 CSV
+#   python export.py rankings.parquet --top 10     # 조합마다 상위 10마리만, Parquet (pyarrow 필요)
+#   python export.py out.csv --catalog data/dogs.json --workers 4
+#
+# 열: answers(Q1~Q5 보기 번호, 1부터), rank, dog_id, name, score
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from catalog import dog_id_of, open_store
+from matching import MatchEngine
+from quiz import all_answer_combinations
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHUNK_ROWS = 100_000
+ORDER_CACHE = 8  # 작업 프로세스마다 기억해 둘 조건별 강아지 순서 개수
+COLUMNS = ("answers", "rank", "dog_id", "name", "score")
+
+
+class ExportTable:
+    # 작업 프로세스에 한 번만 넘기는 점수 표 (조합 → 조건 번호, 조건 x 강아지 점수)
+    def __init__(self, engine, semantic=False):
+        from rankings import RankingTable
+
+        table = RankingTable(engine, semantic=semantic)
+        combos = sorted(table.combo_rows)
+        self.answers = ["-".join(str(i + 1) for i in combo) for combo in combos]
+        self.combo_rows = np.array([table.combo_rows[combo] for combo in combos], dtype=np.intp)
+        if table.semantic is None:
+            self.scores = table.quiz_scores
+        else:
+            self.scores = np.stack([table.scores(row, frozenset()) for row in range(len(table.quiz_profiles))])
+        self.dog_ids = [dog["dog_id"] for dog in engine.dogs]
+        self.names = [dog.get("basic_info", {}).get("name", "") for dog in engine.dogs]
+        self._orders = {}
+
+    def __len__(self):
+        return len(self.dog_ids)
+
+    def order(self, row):
+        # 조건 row 의 강아지 순서 (점수 높은 순, 동점이면 목록 순서 - MatchEngine.top_k 와 같은 규칙)
+        # 한 조합의 조각들은 이어서 처리되므로 최근 몇 개만 기억
+        order = self._orders.get(row)
+        if order is None:
+            if len(self._orders) >= ORDER_CACHE:
+                self._orders.clear()
+            order = self._orders[row] = np.argsort(-self.scores[row].astype(np.float64), kind="stable")
+        return order
+
+    def chunk(self, combo, start, stop):
+        # 조합 combo 의 start~stop 위 (행 번호, 반올림한 점수)
+        row = self.combo_rows[combo]
+        dog_rows = self.order(row)[start:stop]
+        return dog_rows, np.rint(self.scores[row][dog_rows]).astype(np.int64)
+
+
+def csv_field(value):
+    value = str(value)
+    if any(c in value for c in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def load_engine(catalog_path=None):
+    # 기본은 앱과 같은 카탈로그 DB, --catalog 를 주면 그 JSON
+    if catalog_path is None:
+        dogs = open_store(BASE_DIR).load_dogs()
+    else:
+        with open(catalog_path, "r", encoding="utf-8") as f:
+            dogs = [{**dog, "dog_id": dog_id_of(dog, position)} for position, dog in enumerate(json.load(f))]
+    return MatchEngine(dogs)
+
+
+def plan(table, top=None, chunk_rows=CHUNK_ROWS):
+    # (조합, 시작, 끝) 조각 목록 - 조합 순서, 조합 안에서는 순위 순서
+    per_combo = len(table) if top is None else min(top, len(table))
+    for combo in range(len(table.answers)):
+        for start in range(0, per_combo, chunk_rows):
+            yield combo, start, min(start + chunk_rows, per_combo)
+
+
+# ---------- 작업 프로세스 ----------
+_worker_table = None
+_worker_prefixes = None  # 강아지마다 "dog_id,name," (처음 쓸 때 한 번)
+
+
+def _init_worker(table):
+    global _worker_table, _worker_prefixes
+    _worker_table = table
+    _worker_prefixes = None
+
+
+def _csv_chunk(task):
+    global _worker_prefixes
+    table = _worker_table
+    if _worker_prefixes is None:
+        _worker_prefixes = [f"{csv_field(d)},{csv_field(n)}," for d, n in zip(table.dog_ids, table.names)]
+    combo, start, stop = task
+    dog_rows, scores = table.chunk(combo, start, stop)
+    prefixes = _worker_prefixes
+    answers = table.answers[combo]
+    return stop - start, "".join([
+        f"{answers},{rank},{prefixes[r]}{s}\n"
+        for rank, r, s in zip(range(start + 1, stop + 1), dog_rows.tolist(), scores.tolist())
+    ]).encode("utf-8")
+
+
+def _array_chunk(task):
+    combo, start, stop = task
+    dog_rows, scores = _worker_table.chunk(combo, start, stop)
+    return combo, np.arange(start + 1, stop + 1, dtype=np.int32), dog_rows.astype(np.int32), scores
+
+
+def _run(table, fn, tasks, workers):
+    # 조각 결과를 순서대로 (진행 중인 조각은 작업 프로세스 수의 두 배까지)
+    if workers <= 1:
+        _init_worker(table)
+        yield from map(fn, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(table,)) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(fn, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# ---------- 파일 쓰기 ----------
+def write_csv(path, table, tasks, workers):
+    rows = 0
+    # 엑셀에서 한글이 깨지지 않도록 BOM 포함
+    with open(path, "wb") as f:
+        f.write(("\ufeff" + ",".join(COLUMNS) + "\n").encode("utf-8"))
+        for count, data in _run(table, _csv_chunk, tasks, workers):
+            f.write(data)
+            rows += count
+    return rows
+
+
+def write_parquet(path, table, tasks, workers):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # 조합/강아지 문자열은 사전(dictionary) 열로 - 조각마다 번호만 씀
+    answers = pa.array(table.answers)
+    dog_ids = pa.array(table.dog_ids)
+    names = pa.array(table.names)
+    schema = pa.schema([
+        ("answers", pa.dictionary(pa.int32(), pa.string())),
+        ("rank", pa.int32()),
+        ("dog_id", pa.dictionary(pa.int32(), pa.string())),
+        ("name", pa.dictionary(pa.int32(), pa.string())),
+        ("score", pa.int64()),
+    ])
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for combo, ranks, dog_rows, scores in _run(table, _array_chunk, tasks, workers):
+            writer.write_table(pa.table([
+                pa.DictionaryArray.from_arrays(np.full(len(ranks), combo, dtype=np.int32), answers),
+                ranks,
+                pa.DictionaryArray.from_arrays(dog_rows, dog_ids),
+                pa.DictionaryArray.from_arrays(dog_rows, names),
+                scores,
+            ], schema=schema))
+            rows += len(ranks)
+    return rows
+
+
+def export(path, engine, fmt=None, top=None, chunk_rows=CHUNK_ROWS, workers=None, semantic=False):
+    # → 쓴 줄 수
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "csv")
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    table = ExportTable(engine, semantic=semantic)
+    tasks = plan(table, top, chunk_rows)
+    if fmt == "parquet":
+        return write_parquet(path, table, tasks, workers)
+    return write_csv(path, table, tasks, workers)
+
+
+if __name__ == "__main__":
+    import semantic
+
+    parser = argparse.ArgumentParser(description="성향 테스트 조합 x 강아지 점수 내보내기 (CSV / Parquet)")
+    parser.add_argument("out", help="저장할 파일 (.csv 또는 .parquet)")
+    parser.add_argument("--format", choices=("csv", "parquet"), help="기본: 파일 확장자로 판단")
+    parser.add_argument("--catalog", help="카탈로그 JSON (기본: 앱과 같은 카탈로그 DB)")
+    parser.add_argument("--top", type=int, help="조합마다 상위 N마리만 (기본: 전체)")
+    parser.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="한 번에 만드는 줄 수")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="작업 프로세스 수 (1 이면 이 프로세스에서)")
+    parser.add_argument("--semantic", action=argparse.BooleanOptionalAction, default=semantic.ENABLED,
+                        help="의미 기반 점수 섞기 (기본: DOG_MATCH_SEMANTIC)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    engine = load_engine(args.catalog)
+    try:
+        rows = export(args.out, engine, args.format, args.top, args.chunk, args.workers, args.semantic)
+    except ImportError as e:
+        print(f"Parquet 로 저장하려면 pyarrow 가 필요합니다: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{len(engine)}마리 x {len(list(all_answer_combinations()))}조합 → {rows:,}줄 "
+          f"({time.perf_counter() - started:.1f}초) → {args.out}")
@@ -0,0 +1,228 @@
+# ==========================================
+# 강아지 사진 썸네일 (반응형 이미지 캐시)
+# ==========================================
+# basic_info.image_path 의 원본 사진을 여러 너비로 줄여 .cache/images 에 저장하고,
+# 카드 크기에 맞는 가장 작은 버전을 메모리 LRU 캐시에서 꺼내 씁니다.
+# 공유 캐시(cache_layer.py)를 주면 다른 서버가 만든 썸네일도 그대로 씁니다 (키는 원본 내용 해시).
+# 원본 위치/크기/해상도/해시는 시작할 때 한 번 확인해서 목록(manifest.json)으로 두고,
+# 화면을 그릴 때는 파일 확인 없이 목록만 봅니다 (없는 사진도 시작할 때 한꺼번에 알림).
+#
+# 미리 만들어 두기:  python image_assets.py
+
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+from dataclasses import asdict, dataclass
+
+from PIL import Image, ImageOps
+
+import telemetry
+from cache_layer import Cache
+
+VARIANT_WIDTHS = (320, 480, 640, 960)
+QUALITY = 82
+DEVICE_PIXEL_RATIO = 2  # 모바일 고해상도 화면 기준
+MEMORY_BUDGET = int(os.environ.get("DOG_MATCH_IMAGE_CACHE_BYTES", str(32 * 1024 * 1024)))
+MANIFEST_NAME = "manifest.json"
+
+
+def pick_width(display_width, dpr=DEVICE_PIXEL_RATIO):
+    # 카드에 맞는 가장 작은 썸네일 너비
+    needed = display_width * dpr
+    for width in VARIANT_WIDTHS:
+        if width >= needed:
+            return width
+    return VARIANT_WIDTHS[-1]
+
+
+def resolve_source(base_dir, image_path):
+    # image_path 그대로, 없으면 images/ 폴더에서 찾기
+    full_path = os.path.join(base_dir, image_path)
+    if os.path.exists(full_path):
+        return full_path
+    alt_path = os.path.join(base_dir, "images", os.path.basename(image_path))
+    if os.path.exists(alt_path):
+        return alt_path
+    return None
+
+
+@dataclass(frozen=True)
+class Asset:
+    path: str       # 실제 원본 파일
+    size: int       # bytes
+    mtime_ns: int
+    width: int      # EXIF 회전 반영
+    height: int
+    sha256: str
+
+
+def read_asset(path, known=None):
+    # 원본 파일 정보 (크기와 수정 시각이 known 과 같으면 다시 읽지 않음)
+    stat = os.stat(path)
+    if known is not None and (known.path, known.size, known.mtime_ns) == (path, stat.st_size, stat.st_mtime_ns):
+        return known
+    with open(path, "rb") as f:
+        data = f.read()
+    with Image.open(io.BytesIO(data)) as img:
+        width, height = img.size
+        if img.getexif().get(0x0112) in (5, 6, 7, 8):  # 90도 회전된 사진
+            width, height = height, width
+    return Asset(path, stat.st_size, stat.st_mtime_ns, width, height, hashlib.sha256(data).hexdigest())
+
+
+class AssetManifest:
+    # basic_info.image_path → Asset (없는 사진은 None)
+    # 시작할 때 build() 로 한 번 확인, 처음 보는 경로(카탈로그에 새로 들어온 강아지)만 조회 때 확인
+    # 실행 중에 원본 파일을 바꾸면 다음 build() 부터 반영
+    def __init__(self, base_dir, path=None):
+        self.base_dir = base_dir
+        self.path = path  # 저장 위치 (다음 시작 때 바뀌지 않은 파일은 해시를 다시 계산하지 않음)
+        self._assets = {}
+        self._lock = threading.Lock()
+        self._saved = self._load()
+
+    def _load(self):
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return {image_path: Asset(**fields) for image_path, fields in json.load(f).items()}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {image_path: asdict(asset) for image_path, asset in self._assets.items() if asset is not None}
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _resolve(self, image_path):
+        source_path = resolve_source(self.base_dir, image_path)
+        if source_path is None:
+            return None
+        try:
+            return read_asset(source_path, self._saved.get(image_path))
+        except Exception as e:  # 읽을 수 없는 사진은 없는 것으로
+            print(f"이미지를 읽을 수 없습니다 ({source_path}): {e}")
+            return None
+
+    def build(self, image_paths):
+        # 전체 확인 → 없는 사진 목록
+        with telemetry.span("asset_manifest_build"):
+            assets = {image_path: self._resolve(image_path) for image_path in dict.fromkeys(image_paths)}
+        with self._lock:
+            self._assets.update(assets)
+        missing = [image_path for image_path, asset in assets.items() if asset is None]
+        if missing:
+            print(f"이미지를 찾을 수 없습니다 ({len(missing)}장): {', '.join(missing)}")
+        try:
+            self._save()
+        except OSError as e:
+            print(f"이미지 목록 저장 실패: {e}")
+        return missing
+
+    def get(self, image_path):
+        asset = self._assets.get(image_path, False)
+        if asset is False:
+            asset = self._resolve(image_path)
+            with self._lock:
+                self._assets[image_path] = asset
+        return asset
+
+    @property
+    def missing(self):
+        with self._lock:
+            return [image_path for image_path, asset in self._assets.items() if asset is None]
+
+
+def make_variant(source_path, width, quality=QUALITY):
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        if img.width > width:
+            img.thumbnail((width, width * 10), Image.LANCZOS)
+        out = io.BytesIO()
+        # EXIF 등 메타데이터 없이 저장
+        img.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+class ImageVariantCache:
+    def __init__(self, base_dir, cache_dir, max_bytes=MEMORY_BUDGET, shared=None):
+        self.base_dir = base_dir
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache = Cache("image", max_bytes, shared)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.manifest = AssetManifest(base_dir, os.path.join(cache_dir, MANIFEST_NAME))
+
+    def variant_path(self, asset, width):
+        # 파일명만으로는 다른 폴더의 같은 이름 사진과 겹치므로 원본 내용 해시를 붙임
+        stem = os.path.splitext(os.path.basename(asset.path))[0]
+        return os.path.join(self.cache_dir, f"{stem}_{asset.sha256[:16]}_{width}w.jpg")
+
+    def _load_or_build(self, asset, width):
+        path = self.variant_path(asset, width)
+        try:
+            if os.stat(path).st_mtime_ns >= asset.mtime_ns:
+                with open(path, "rb") as f:
+                    data = f.read()
+                telemetry.incr("cache_requests", cache="image_disk", result="hit")
+                return data
+        except OSError:
+            pass
+        telemetry.incr("cache_requests", cache="image_disk", result="miss")
+        with telemetry.span("image_variant_build"):
+            data = make_variant(asset.path, width)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return data
+
+    def get(self, image_path, width):
+        asset = self.manifest.get(image_path)
+        if asset is None:
+            return None
+        # 메모리 → 공유 캐시 → 로컬 썸네일 파일/새로 만들기 (같은 썸네일을 동시에 만들지 않음)
+        try:
+            key = f"{asset.sha256}:{width}:{QUALITY}"
+            return self.cache.get_or_compute(key, lambda: self._load_or_build(asset, width))
+        except Exception as e:
+            print(f"썸네일 생성 오류 ({asset.path}): {e}")
+            return None
+
+    def build_all(self, dogs, widths=VARIANT_WIDTHS):
+        # 원본 목록부터 만들고(없는 사진은 여기서 한꺼번에 알림) 썸네일 생성
+        image_paths = [dog["basic_info"]["image_path"] for dog in dogs]
+        self.manifest.build(image_paths)
+        built = 0
+        for image_path in dict.fromkeys(image_paths):
+            asset = self.manifest.get(image_path)
+            if asset is None:
+                continue
+            for width in widths:
+                try:
+                    self._load_or_build(asset, width)
+                    built += 1
+                except Exception as e:
+                    print(f"썸네일 생성 오류 ({asset.path}): {e}")
+        return built
+
+
+if __name__ == "__main__":
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    catalog = sys.argv[1] if len(sys.argv) > 1 else os.path.join(base_dir, "data", "dogs.json")
+    with open(catalog, "r", encoding="utf-8") as f:
+        dogs = json.load(f)
+    cache_dir = os.environ.get("DOG_MATCH_CACHE_DIR") or os.path.join(base_dir, ".cache")
+    cache = ImageVariantCache(base_dir, os.path.join(cache_dir, "images"))
+    print(f"썸네일 {cache.build_all(dogs)}개 준비 완료 → {cache.cache_dir} (없는 사진 {len(cache.manifest.missing)}장)")
@@ -0,0 +1,172 @@
+# ==========================================
+# 업로드 사진 전처리 (Gemini 전송 전)
+# ==========================================
+# 1. 디코딩 + EXIF 회전 적용
+# 2. 얼굴 영역 크롭 (OpenCV가 설치된 경우에만 - pip install -r requirements-face.txt, 없으면 크롭 생략)
+# 3. 긴 변을 MAX_SIDE 이하로 축소
+# 4. JPEG/WebP로 다시 인코딩 (메타데이터 제거)
+
+import io
+import os
+import threading
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:  # 얼굴 크롭은 선택 기능 (opencv-python-headless<5)
+    cv2 = None
+
+if cv2 is not None and not hasattr(cv2, "CascadeClassifier"):  # OpenCV 5부터 Haar 모델 제외
+    cv2 = None
+
+MAX_SIDE = int(os.environ.get("DOG_MATCH_MAX_IMAGE_SIDE", "1024"))
+OUTPUT_FORMAT = os.environ.get("DOG_MATCH_IMAGE_FORMAT", "JPEG").upper()  # JPEG 또는 WEBP
+QUALITY = int(os.environ.get("DOG_MATCH_IMAGE_QUALITY", "85"))
+FACE_MARGIN = 0.8  # 얼굴 박스 주변으로 더 포함할 비율 (머리카락, 어깨 등 분위기 파악용)
+PREVIEW_WIDTH = 300  # Step 2 에 표시하는 사진 폭 (분석 후 보관용 미리보기)
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    original_size: int
+    width: int = 0
+    height: int = 0
+    face_cropped: bool = False
+
+    @property
+    def prepared_size(self):
+        return len(self.data)
+
+    @property
+    def bytes_saved(self):
+        return self.original_size - self.prepared_size
+
+
+class PrepStats:
+    # 프로세스 전체 누적 통계 (요청별 값은 PreparedImage에 있음)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.original_bytes = 0
+        self.prepared_bytes = 0
+        self.face_crops = 0
+
+    def record(self, prepared):
+        with self._lock:
+            self.requests += 1
+            self.original_bytes += prepared.original_size
+            self.prepared_bytes += prepared.prepared_size
+            self.face_crops += int(prepared.face_cropped)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "original_bytes": self.original_bytes,
+                "prepared_bytes": self.prepared_bytes,
+                "bytes_saved": self.original_bytes - self.prepared_bytes,
+                "face_crops": self.face_crops,
+            }
+
+
+stats = PrepStats()
+
+
+def signature(max_side=MAX_SIDE, fmt=OUTPUT_FORMAT, quality=QUALITY):
+    # 전처리 설정이 바뀌면 분석 결과 캐시 키도 달라지도록
+    return f"prep:{max_side}:{fmt}:{quality}:{'face' if cv2 is not None else 'noface'}"
+
+
+_cascades = threading.local()
+
+
+def _face_cascade():
+    # CascadeClassifier 는 여러 스레드가 동시에 쓰면 깨지므로 작업 스레드마다 하나씩
+    cascade = getattr(_cascades, "classifier", None)
+    if cascade is None:
+        path = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        cascade = _cascades.classifier = cv2.CascadeClassifier(path)
+    return cascade
+
+
+def detect_face(img):
+    # 가장 큰 얼굴 박스 (left, top, right, bottom), 없으면 None
+    if cv2 is None:
+        return None
+    gray = np.asarray(img.convert("L"))
+    min_side = max(32, min(img.size) // 10)
+    faces = _face_cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_side, min_side))
+    if len(faces) == 0:
+        return None
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    return int(x), int(y), int(x + w), int(y + h)
+
+
+def crop_to_face(img, box, margin=FACE_MARGIN):
+    left, top, right, bottom = box
+    w, h = right - left, bottom - top
+    left = max(0, int(left - w * margin))
+    top = max(0, int(top - h * margin))
+    right = min(img.width, int(right + w * margin))
+    bottom = min(img.height, int(bottom + h * margin))
+    return img.crop((left, top, right, bottom))
+
+
+def prepare_image(image_bytes, mime_type="image/jpeg", max_side=MAX_SIDE, fmt=OUTPUT_FORMAT,
+                  quality=QUALITY, crop_face=True):
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        img = ImageOps.exif_transpose(img)
+    except Exception as e:
+        # 디코딩이 안 되면 원본 그대로 전송
+        print(f"이미지 전처리 건너뜀: {e}")
+        prepared = PreparedImage(image_bytes, mime_type, len(image_bytes))
+        stats.record(prepared)
+        return prepared
+
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    face_cropped = False
+    if crop_face:
+        box = detect_face(img)
+        if box:
+            img = crop_to_face(img, box)
+            face_cropped = True
+
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    out = io.BytesIO()
+    if fmt == "WEBP":
+        img.save(out, format="WEBP", quality=quality, method=4)
+    else:
+        fmt = "JPEG"
+        img.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+
+    # 원본보다 커지더라도 항상 다시 인코딩한 사진 전송 (EXIF/GPS 등 메타데이터 제거, 회전 적용)
+    prepared = PreparedImage(out.getvalue(), MIME_TYPES[fmt], len(image_bytes), img.width, img.height, face_cropped)
+    stats.record(prepared)
+    return prepared
+
+
+def make_preview(image_bytes, width=PREVIEW_WIDTH, quality=75):
+    # 분석이 끝난 뒤 원본 업로드 대신 세션에 남겨 둘 작은 미리보기 (디코딩 실패 시 None)
+    try:
+        img = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.thumbnail((width, width * 4), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+        return out.getvalue()
+    except Exception as e:
+        print(f"미리보기 생성 실패: {e}")
+        return None
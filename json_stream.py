@@ -0,0 +1,143 @@
+# ==========================================
+# 스트리밍 응답용 점진적 JSON 파서
+# ==========================================
+# 모델 응답이 조각(chunk)으로 들어올 때마다 feed() 하면
+# - 문자열 값은 완성 전이라도 지금까지의 내용을 on_partial 로 알려주고
+# - 값이 완성되면 on_complete 로 파싱된 값을 알려줍니다.
+# 최상위 객체 하나만 다룹니다 ({"summary": "...", "matched_tags": [...]}).
+# 앞뒤의 ```json 코드펜스 같은 잡음은 무시합니다.
+
+import json
+
+_WHITESPACE = " \t\r\n"
+
+
+def _decode_partial_string(raw):
+    # 끝이 잘린 이스케이프(\, \u12 등)가 있으면 그만큼 덜어내고 디코딩
+    for cut in range(7):
+        try:
+            return json.loads(f'"{raw[:len(raw) - cut]}"')
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+class StreamingObjectParser:
+    def __init__(self, on_partial=None, on_complete=None):
+        self.on_partial = on_partial
+        self.on_complete = on_complete
+        self.values = {}
+        self._state = "start"   # start → key → colon → value → (string | nested | scalar) → comma → ... → end
+        self._key_raw = []
+        self._key = None
+        self._raw = []          # 현재 값의 원문
+        self._escape = False
+        self._depth = 0
+        self._in_string = False
+
+    @property
+    def finished(self):
+        return self._state == "end"
+
+    def feed(self, text):
+        for ch in text:
+            self._step(ch)
+        # 문자열 값은 조각마다 한 번씩만 알려줌
+        if self._state == "string" and self.on_partial:
+            partial = _decode_partial_string("".join(self._raw))
+            if partial is not None:
+                self.on_partial(self._key, partial)
+
+    def _finish_value(self, raw):
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = None
+        self.values[self._key] = value
+        if self.on_complete:
+            self.on_complete(self._key, value)
+        self._raw = []
+        self._state = "comma"
+
+    def _step(self, ch):
+        state = self._state
+        if state == "start":
+            if ch == "{":
+                self._state = "key_start"
+        elif state == "key_start":
+            if ch == '"':
+                self._key_raw = []
+                self._state = "key"
+            elif ch == "}":
+                self._state = "end"
+        elif state == "key":
+            if self._escape:
+                self._escape = False
+                self._key_raw.append(ch)
+            elif ch == "\\":
+                self._escape = True
+                self._key_raw.append(ch)
+            elif ch == '"':
+                self._key = json.loads('"' + "".join(self._key_raw) + '"')
+                self._state = "colon"
+            else:
+                self._key_raw.append(ch)
+        elif state == "colon":
+            if ch == ":":
+                self._state = "value"
+        elif state == "value":
+            if ch in _WHITESPACE:
+                return
+            if ch == '"':
+                self._raw = []
+                self._state = "string"
+            elif ch in "[{":
+                self._raw = [ch]
+                self._depth = 1
+                self._in_string = False
+                self._state = "nested"
+            else:
+                self._raw = [ch]
+                self._state = "scalar"
+        elif state == "string":
+            if self._escape:
+                self._escape = False
+                self._raw.append(ch)
+            elif ch == "\\":
+                self._escape = True
+                self._raw.append(ch)
+            elif ch == '"':
+                self._finish_value('"' + "".join(self._raw) + '"')
+            else:
+                self._raw.append(ch)
+        elif state == "nested":
+            self._raw.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish_value("".join(self._raw))
+        elif state == "scalar":
+            if ch in ",}" or ch in _WHITESPACE:
+                self._finish_value("".join(self._raw).strip())
+                if ch == "}":
+                    self._state = "end"
+                elif ch == ",":
+                    self._state = "key_start"
+            else:
+                self._raw.append(ch)
+        elif state == "comma":
+            if ch == ",":
+                self._state = "key_start"
+            elif ch == "}":
+                self._state = "end"
@@ -0,0 +1,230 @@
+# ==========================================
+# 로컬 관상 태그 추출 (CPU, 원격 모델 없이)
+# ==========================================
+# 얼굴 사진 → 인상 특징(attribute) 점수 → 태그 사전의 태그 3~5개
+# - 기본: 사진 통계(밝기, 색감, 채도, 윤곽, 명암) 기반 특징 추출기 (추가 패키지 없음)
+# - DOG_MATCH_LOCAL_MODEL=모델.onnx 이고 onnxruntime 이 설치되어 있으면 그 모델의 출력 사용
+#   DOG_MATCH_LOCAL_LABELS=라벨.json (출력 순서대로 특징 이름 목록, 특징 이름 대신 semantic.CONCEPTS 개념 이름도 가능)
+# - 특징 → 개념(semantic.CONCEPTS) → 그 개념 어간이 들어 있는 태그 순으로 점수를 매겨 고름
+# - 추론은 프로세스 풀(DOG_MATCH_LOCAL_WORKERS, 0 이면 호출한 스레드에서)에서,
+#   모델은 작업 프로세스마다 처음 한 번만 불러와 모든 세션이 함께 씀
+#   (풀은 별도 호스트 프로세스가 가짐, tagger_pool.py)
+
+import hashlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import threading
+import zlib
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from semantic import concepts_in
+
+MODEL_PATH = os.environ.get("DOG_MATCH_LOCAL_MODEL", "")
+LABELS_PATH = os.environ.get("DOG_MATCH_LOCAL_LABELS", "")
+WORKERS = int(os.environ.get("DOG_MATCH_LOCAL_WORKERS", str(min(2, os.cpu_count() or 1))))
+STATS_SIDE = 64   # 통계 특징 추출 때 줄이는 크기
+MIN_TAGS, MAX_TAGS = 3, 5
+
+# 특징 → 개념 가중치
+ATTRIBUTE_CONCEPTS = {
+    "bright": {"active": 1.0, "social": 0.6},
+    "warm": {"gentle": 1.0, "touch": 1.0},
+    "soft": {"calm": 1.0, "gentle": 0.5, "alone_ok": 0.3},
+    "vivid": {"active": 0.6, "charm": 1.0, "walk": 0.5},
+    "deep": {"shy": 0.6, "patience": 1.0, "senior_care": 0.6},
+}
+
+# 가장 강한 특징 / 두 번째 특징에 따른 리포트 문장
+SUMMARY_LEADS = {
+    "bright": "환한 얼굴빛에서 밝고 긍정적인 에너지가 느껴져요.",
+    "warm": "따뜻한 분위기에서 다정하고 포근한 마음이 느껴져요.",
+    "soft": "부드러운 인상에서 차분하고 온화한 성격이 느껴져요.",
+    "vivid": "생기 있는 표정에서 호기심 많고 활발한 모습이 보여요.",
+    "deep": "깊이 있는 눈빛에서 세심하고 속 깊은 마음이 보여요.",
+}
+SUMMARY_FOLLOWS = {
+    "bright": "함께 있으면 주변까지 즐거워지는 분이실 것 같아요!",
+    "warm": "작은 생명에게도 아낌없이 사랑을 주실 분 같아요.",
+    "soft": "느긋하게 곁을 지켜 주는 든든한 친구가 되어 주실 거예요.",
+    "vivid": "새로운 곳을 함께 누빌 단짝을 만나면 더 빛나실 거예요.",
+    "deep": "마음을 여는 데 시간이 필요한 아이도 기다려 주실 분이에요.",
+}
+
+
+def _clip01(value):
+    return float(min(1.0, max(0.0, value)))
+
+
+def decode(image_bytes, side):
+    # RGB 0~1 float32 (side x side 안에 들어가게 축소)
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+    img = img.convert("RGB")
+    img.thumbnail((side, side), Image.BILINEAR)
+    return np.asarray(img, dtype=np.float32) / 255.0
+
+
+class StatsTagger:
+    # 사진 통계로 인상 특징 점수 (학습된 모델이 없을 때의 기본 추출기)
+    name = "stats-v1"
+
+    def attributes(self, image_bytes):
+        rgb = decode(image_bytes, STATS_SIDE)
+        r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+        lum = 0.299 * r + 0.587 * g + 0.114 * b
+        saturation = rgb.max(axis=2) - rgb.min(axis=2)
+        edges = np.abs(np.diff(lum, axis=0)).mean() + np.abs(np.diff(lum, axis=1)).mean()
+        return {
+            "bright": _clip01((lum.mean() - 0.35) / 0.4),
+            "warm": _clip01((r.mean() - b.mean()) * 4 + 0.3),
+            "soft": _clip01(1 - edges / 0.12),
+            "vivid": _clip01((saturation.mean() - 0.1) / 0.3),
+            "deep": _clip01((lum.std() - 0.12) / 0.18),
+        }
+
+
+class OnnxTagger:
+    # 얼굴 크롭 → 특징별 점수를 내는 ONNX 모델 (입력 NCHW RGB 0~1, 출력 특징 수 길이)
+    def __init__(self, model_path, labels):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = 1  # 병렬은 프로세스 풀이 맡음
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        side = model_input.shape[-1]
+        self.side = side if isinstance(side, int) else 224
+        self.labels = labels
+        self.name = model_id(model_path)
+
+    def attributes(self, image_bytes):
+        rgb = decode(image_bytes, self.side)
+        x = np.zeros((1, 3, self.side, self.side), dtype=np.float32)
+        x[0, :, :rgb.shape[0], :rgb.shape[1]] = rgb.transpose(2, 0, 1)
+        out = np.asarray(self.session.run(None, {self.input_name: x})[0], dtype=np.float32).reshape(-1)
+        if out.min() < 0 or out.max() > 1:  # 로짓이면 확률로
+            out = 1 / (1 + np.exp(-out))
+        return {label: float(v) for label, v in zip(self.labels, out)}
+
+
+def onnx_available():
+    return importlib.util.find_spec("onnxruntime") is not None
+
+
+def model_id(model_path=MODEL_PATH):
+    # 분석 캐시 키에 쓰는 추출기 이름 (모델 파일이 바뀌면 달라짐)
+    if not model_path or not onnx_available() or not os.path.exists(model_path):
+        return StatsTagger.name
+    with open(model_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    return f"onnx-{os.path.basename(model_path)}-{digest}"
+
+
+def load_tagger(model_path=MODEL_PATH, labels_path=LABELS_PATH):
+    if model_path:
+        try:
+            with open(labels_path, "r", encoding="utf-8") as f:
+                return OnnxTagger(model_path, json.load(f))
+        except Exception as e:  # onnxruntime 이 없거나 모델/라벨을 못 읽으면 기본 추출기
+            print(f"로컬 모델 사용 안 함 ({model_path}): {e}")
+    return StatsTagger()
+
+
+@lru_cache(maxsize=8)
+def _tag_concepts(vocab):
+    return tuple((tag, tuple(concepts_in(tag))) for tag in vocab)
+
+
+def pick_tags(attributes, vocab, seed=b"", min_tags=MIN_TAGS, max_tags=MAX_TAGS):
+    # 특징 점수 → 개념 점수 → 태그 점수 상위 (동점은 사진마다 다르게 섞되 같은 사진이면 항상 같게)
+    concept_scores = {}
+    for attribute, value in attributes.items():
+        for concept, weight in ATTRIBUTE_CONCEPTS.get(attribute, {attribute: 1.0}).items():
+            concept_scores[concept] = concept_scores.get(concept, 0.0) + value * weight
+    ranked = sorted(
+        (-sum(concept_scores.get(c, 0.0) for c in concepts), zlib.crc32(seed + tag.encode("utf-8")), tag)
+        for tag, concepts in _tag_concepts(tuple(vocab))
+    )
+    picked = [tag for score, _, tag in ranked[:max_tags] if score < 0]
+    return picked if len(picked) >= min_tags else [tag for _, _, tag in ranked[:min_tags]]
+
+
+def template_summary(attributes):
+    # 가장 강한 두 특징으로 2문장 리포트
+    order = sorted((a for a in attributes if a in SUMMARY_LEADS), key=lambda a: -attributes[a])
+    if not order:
+        return SUMMARY_LEADS["warm"] + " " + SUMMARY_FOLLOWS["warm"]
+    return SUMMARY_LEADS[order[0]] + " " + SUMMARY_FOLLOWS[order[1] if len(order) > 1 else order[0]]
+
+
+def analyze(tagger, image_bytes, vocab):
+    # → (태그, 특징 점수)
+    attributes = tagger.attributes(image_bytes)
+    seed = hashlib.sha256(image_bytes).digest()[:8]
+    return pick_tags(attributes, vocab, seed), attributes
+
+
+# ---------- 작업 프로세스 (tagger_pool.py 호스트가 띄움) ----------
+_worker_tagger = None
+
+
+def _init_worker(model_path, labels_path):
+    global _worker_tagger
+    _worker_tagger = load_tagger(model_path, labels_path)
+    # 호스트가 강제로 끝나도 남지 않도록 (쉬는 작업 프로세스는 풀이 끝난 것을 모름)
+    threading.Thread(target=_exit_with_parent, name="tagger-worker-parent", daemon=True).start()
+
+
+def _exit_with_parent():
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        parent.join()
+        os._exit(0)
+
+
+def _analyze_in_worker(image_bytes, vocab):
+    return analyze(_worker_tagger, image_bytes, vocab)
+
+
+def _worker_ready():
+    return _worker_tagger.name
+
+
+class TaggerPool:
+    # 프로세스 풀 (처음 쓸 때 띄움, 작업 프로세스가 죽으면 다음 요청 때 새로 띄움)
+    def __init__(self, workers=WORKERS, model_path=MODEL_PATH, labels_path=LABELS_PATH):
+        from tagger_pool import PoolClient
+
+        self.workers = workers
+        self.model_path = model_path
+        self.labels_path = labels_path
+        self.name = model_id(model_path)
+        self._client = PoolClient(workers, model_path, labels_path)
+        self._tagger = None  # workers=0 일 때
+        self._lock = threading.Lock()
+
+    def _local_tagger(self):
+        with self._lock:
+            if self._tagger is None:
+                self._tagger = load_tagger(self.model_path, self.labels_path)
+            return self._tagger
+
+    def warm(self):
+        # 작업 프로세스를 모두 띄우고 모델을 불러 둠
+        if self.workers <= 0:
+            return self._local_tagger()
+        return self._client.call("warm")
+
+    def analyze(self, image_bytes, vocab, timeout=None):
+        if self.workers <= 0:
+            return analyze(self._local_tagger(), image_bytes, tuple(vocab))
+        return self._client.call("analyze", image_bytes, tuple(vocab), timeout=timeout)
+
+    def shutdown(self):
+        self._client.shutdown()
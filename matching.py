@@ -0,0 +1,343 @@
+# ==========================================
+# 매칭 엔진 - 태그 인덱스 & 배치 점수 계산
+# ==========================================
+# 카탈로그를 불러올 때 한 번만 인덱스를 만들어 두고,
+# 모든 강아지의 점수를 NumPy 연산 한 번으로 계산합니다.
+
+import json
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+# 가중치 (app.py Step 4의 기존 규칙과 동일)
+TAG_SCORE = 1            # 기본 태그 매칭 (각 1점)
+PRIORITY_BONUS = 2       # 핵심 태그 가중치 (+2점 추가)
+SIZE_BONUS = 3           # 크기 매칭 보너스 (+3점)
+CARE_BONUS = 2           # 케어 의지 매칭 (+2점)
+URGENCY_BONUS = 1        # 긴급도 보너스 (+1점)
+
+PRIORITY_TAGS = ["#임보급구", "#평생가족_급구", "#겁쟁이", "#소심함", "#인내심필요"]
+CARE_TAGS = ["#노견케어", "#살찌우기프로젝트"]
+URGENCY_MARKERS = ["🚨", "임박", "시급"]
+
+SIZE_CLASSES = {"small": 0, "medium": 1, "large": 2}
+
+SCORE_CHUNK = 8192       # score_many 에서 한 번에 곱할 강아지 수 (임시 행렬 크기 제한)
+
+
+def parse_weight(weight_str):
+    # "약 20kg", "22kg (마른 체형)" 처럼 숫자만 이어 붙여 읽습니다
+    digits = ''.join(filter(str.isdigit, weight_str or ""))
+    return int(digits) if digits else 0
+
+
+def weight_class(weight):
+    if weight <= 10:
+        return SIZE_CLASSES["small"]
+    if weight <= 20:
+        return SIZE_CLASSES["medium"]
+    return SIZE_CLASSES["large"]
+
+
+def is_urgent(health_issue):
+    health_issue = health_issue or ""
+    return any(marker in health_issue for marker in URGENCY_MARKERS)
+
+
+@dataclass(frozen=True)
+class Profile:
+    # 사용자 한 명의 매칭 조건 (관상 태그 + 성향 테스트 결과)
+    tags: frozenset
+    size_pref: str = "medium"
+    care_ok: bool = False
+
+    @classmethod
+    def of(cls, tags, size_pref="medium", care_ok=False):
+        return cls(frozenset(tags), size_pref, bool(care_ok))
+
+
+def dog_features(dog):
+    # (태그 목록, 체급, 케어 필요, 긴급) - 강아지 한 마리분 인덱스 재료
+    info = dog.get("basic_info", {})
+    tags = list(dict.fromkeys(dog.get("personality_tags", [])))
+    return (
+        tags,
+        weight_class(parse_weight(info.get("weight", "0kg"))),
+        any(t in tags for t in CARE_TAGS),
+        is_urgent(info.get("health_issue")),
+    )
+
+
+def _tag_weight(tag):
+    return TAG_SCORE + (PRIORITY_BONUS if tag in PRIORITY_TAGS else 0)
+
+
+class MatchEngine:
+    def __init__(self, dogs, version=0):
+        self.version = version
+        self.dogs = list(dogs)
+        features = [dog_features(dog) for dog in self.dogs]
+        self.dog_tags = [f[0] for f in features]
+        self.row_of = {dog.get("dog_id", str(row)): row for row, dog in enumerate(self.dogs)}
+
+        # 태그 사전 (정렬해서 프로세스가 달라도 순서가 같도록)
+        self.vocab = sorted({tag for tags in self.dog_tags for tag in tags})
+        self.tag_index = {tag: i for i, tag in enumerate(self.vocab)}
+
+        # 강아지 x 태그 행렬
+        n_dogs, n_tags = len(self.dogs), len(self.vocab)
+        self.tag_matrix = np.zeros((n_dogs, n_tags), dtype=np.uint8)
+        for row, tags in enumerate(self.dog_tags):
+            self.tag_matrix[row, [self.tag_index[t] for t in tags]] = 1
+        self.tag_counts = self.tag_matrix.sum(axis=0, dtype=np.int64)
+
+        # 태그별 점수 (핵심 태그는 1 + 2점)
+        self.tag_weights = np.array([_tag_weight(t) for t in self.vocab], dtype=np.int32)
+
+        # 크기 / 케어 / 긴급도 플래그
+        self.weight_classes = np.array([f[1] for f in features], dtype=np.int8)
+        self.care_flags = np.array([f[2] for f in features], dtype=bool)
+        self.urgent_flags = np.array([f[3] for f in features], dtype=bool)
+        self.base_scores = self.urgent_flags.astype(np.int32) * URGENCY_BONUS
+        self._postings = {}
+
+    def active_vocab(self):
+        # 현재 카탈로그에 실제로 쓰이는 태그 (정렬)
+        return tuple(sorted(t for t, c in zip(self.vocab, self.tag_counts) if c > 0))
+
+    def with_changes(self, upserts, removed_ids=(), version=None, order=None):
+        # 바뀐 강아지만 반영한 새 엔진 (기존 엔진은 그대로라 읽던 화면은 영향 없음)
+        # - 새 태그는 사전 끝에 추가, 기존 태그 번호는 유지
+        # - 새 강아지는 끝에 추가, 바뀐 강아지는 같은 자리에서 갱신
+        # - order(카탈로그 순서 dog_id 목록)를 주면 행을 그 순서로 다시 정렬
+        #   (동점일 때 목록 순서 우선 규칙이 전체 다시 읽기와 같도록)
+        new = object.__new__(MatchEngine)
+        new.version = self.version + 1 if version is None else version
+        new.dogs = list(self.dogs)
+        new.dog_tags = list(self.dog_tags)
+        new.vocab = list(self.vocab)
+        new.tag_index = dict(self.tag_index)
+
+        features = [(dog, dog_features(dog)) for dog in upserts]
+        for _, (tags, *_rest) in features:
+            for tag in tags:
+                if tag not in new.tag_index:
+                    new.tag_index[tag] = len(new.vocab)
+                    new.vocab.append(tag)
+        added_tags = len(new.vocab) - len(self.vocab)
+
+        matrix = np.pad(self.tag_matrix, ((0, 0), (0, added_tags)))
+        counts = np.concatenate([self.tag_counts, np.zeros(added_tags, dtype=np.int64)])
+        new.tag_weights = np.concatenate(
+            [self.tag_weights, np.array([_tag_weight(t) for t in new.vocab[len(self.vocab):]], dtype=np.int32)]
+        )
+        weight_classes = self.weight_classes.copy()
+        care_flags = self.care_flags.copy()
+        urgent_flags = self.urgent_flags.copy()
+
+        appended = []
+        for dog, (tags, w_class, care, urgent) in features:
+            row_vec = np.zeros(len(new.vocab), dtype=np.uint8)
+            row_vec[[new.tag_index[t] for t in tags]] = 1
+            row = self.row_of.get(dog.get("dog_id"))
+            if row is None:
+                appended.append((dog, tags, row_vec, w_class, care, urgent))
+                counts += row_vec
+                continue
+            counts -= matrix[row]
+            counts += row_vec
+            matrix[row] = row_vec
+            new.dogs[row], new.dog_tags[row] = dog, tags
+            weight_classes[row], care_flags[row], urgent_flags[row] = w_class, care, urgent
+
+        if appended:
+            new.dogs += [a[0] for a in appended]
+            new.dog_tags += [a[1] for a in appended]
+            matrix = np.vstack([matrix, np.array([a[2] for a in appended], dtype=np.uint8)])
+            weight_classes = np.concatenate([weight_classes, np.array([a[3] for a in appended], dtype=np.int8)])
+            care_flags = np.concatenate([care_flags, np.array([a[4] for a in appended], dtype=bool)])
+            urgent_flags = np.concatenate([urgent_flags, np.array([a[5] for a in appended], dtype=bool)])
+
+        removed_rows = sorted(self.row_of[d] for d in removed_ids if d in self.row_of)
+        if removed_rows:
+            counts -= matrix[removed_rows].sum(axis=0, dtype=np.int64)
+            keep = np.ones(len(new.dogs), dtype=bool)
+            keep[removed_rows] = False
+            matrix, weight_classes = matrix[keep], weight_classes[keep]
+            care_flags, urgent_flags = care_flags[keep], urgent_flags[keep]
+            new.dogs = [d for d, k in zip(new.dogs, keep) if k]
+            new.dog_tags = [t for t, k in zip(new.dog_tags, keep) if k]
+
+        if order is not None:
+            # order 에 없는 강아지는 지금 순서대로 맨 뒤에
+            rank = {dog_id: i for i, dog_id in enumerate(order)}
+            n = len(new.dogs)
+            last = len(order)
+            perm = np.array(
+                sorted(range(n), key=lambda row: (rank.get(new.dogs[row].get("dog_id", str(row)), last), row)),
+                dtype=np.intp,
+            )
+            if np.any(perm != np.arange(n)):
+                matrix, weight_classes = matrix[perm], weight_classes[perm]
+                care_flags, urgent_flags = care_flags[perm], urgent_flags[perm]
+                new.dogs = [new.dogs[row] for row in perm]
+                new.dog_tags = [new.dog_tags[row] for row in perm]
+
+        new.tag_matrix = matrix
+        new.tag_counts = counts
+        new.weight_classes, new.care_flags, new.urgent_flags = weight_classes, care_flags, urgent_flags
+        new.base_scores = urgent_flags.astype(np.int32) * URGENCY_BONUS
+        new.row_of = {dog.get("dog_id", str(row)): row for row, dog in enumerate(new.dogs)}
+        new._postings = {}
+        return new
+
+    def __len__(self):
+        return len(self.dogs)
+
+    def tag_ids(self, tags):
+        # 사전에 있는 태그 번호 (중복 제거, 정렬)
+        return sorted({self.tag_index[t] for t in tags if t in self.tag_index})
+
+    def user_vector(self, tags):
+        vec = np.zeros(len(self.vocab), dtype=np.int32)
+        idx = self.tag_ids(tags)
+        vec[idx] = self.tag_weights[idx]
+        return vec
+
+    def tag_rows(self, tag):
+        # 이 태그를 가진 강아지 행 번호 (역색인, 처음 쓸 때 만들어 둠)
+        rows = self._postings.get(tag)
+        if rows is None:
+            j = self.tag_index.get(tag)
+            rows = np.array([], dtype=np.intp) if j is None else np.flatnonzero(self.tag_matrix[:, j])
+            self._postings[tag] = rows
+        return rows
+
+    def rows_for(self, dog_ids):
+        # 카탈로그 순서를 유지한 행 번호 배열
+        return np.array(sorted(self.row_of[d] for d in dog_ids if d in self.row_of), dtype=np.intp)
+
+    def score(self, profile, rows=None):
+        # 모든 강아지(또는 rows 후보만) 점수를 한 번에 계산
+        pick = slice(None) if rows is None else rows
+        # 사용자 태그 열만 골라서 곱하기 (태그 사전 전체와 곱하지 않음)
+        idx = self.tag_ids(profile.tags)
+        columns = self.tag_matrix[:, idx] if rows is None else self.tag_matrix[np.ix_(rows, idx)]
+        scores = columns @ self.tag_weights[idx]
+        scores += self.base_scores[pick]
+        if profile.size_pref in SIZE_CLASSES:
+            scores += (self.weight_classes[pick] == SIZE_CLASSES[profile.size_pref]) * SIZE_BONUS
+        if profile.care_ok:
+            scores += self.care_flags[pick] * CARE_BONUS
+        return scores
+
+    def score_many(self, profiles):
+        # N명 x M마리 점수 행렬을 한 번에 (행렬곱 + 브로드캐스트)
+        profiles = list(profiles)
+        users = np.zeros((len(profiles), len(self.vocab)), dtype=np.int32)
+        size_onehot = np.zeros((len(profiles), len(SIZE_CLASSES)), dtype=np.int32)
+        care = np.zeros(len(profiles), dtype=np.int32)
+        for i, profile in enumerate(profiles):
+            users[i] = self.user_vector(profile.tags)
+            if profile.size_pref in SIZE_CLASSES:
+                size_onehot[i, SIZE_CLASSES[profile.size_pref]] = SIZE_BONUS
+            care[i] = CARE_BONUS if profile.care_ok else 0
+
+        # 작은 정수끼리라 float32 행렬곱(BLAS)도 값이 정확함, 강아지 SCORE_CHUNK 마리씩 나눠서
+        users_f = users.astype(np.float32)
+        scores = np.empty((len(profiles), len(self.dogs)), dtype=np.int32)
+        for start in range(0, len(self.dogs), SCORE_CHUNK):
+            chunk = self.tag_matrix[start:start + SCORE_CHUNK].astype(np.float32)
+            scores[:, start:start + SCORE_CHUNK] = users_f @ chunk.T
+        scores += self.base_scores[None, :]
+        scores += size_onehot[:, self.weight_classes]
+        scores += care[:, None] * self.care_flags[None, :]
+        return scores
+
+    def top_k(self, scores, k=4):
+        # 전체 정렬 대신 부분 선택 (동점이면 기존처럼 목록 순서 우선)
+        n = len(scores)
+        if n == 0 or k <= 0:
+            return np.array([], dtype=np.intp)
+        k = min(k, n)
+        if scores.dtype.kind == "f":
+            # 의미 점수를 섞은 실수 점수 (semantic.py) - 고른 k개 안에서 동점이면 목록 순서
+            top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+            return top[np.lexsort((top, -scores[top]))]
+        keys = scores.astype(np.int64) * n + (n - 1 - np.arange(n))
+        top = np.argpartition(-keys, k - 1)[:k] if k < n else np.arange(n)
+        return top[np.argsort(-keys[top])]
+
+    def top_k_many(self, scores, k=4):
+        # 행(사용자)마다 top_k 와 같은 규칙으로 부분 선택
+        n_users, n = scores.shape
+        k = min(k, n)
+        if k <= 0:
+            return np.zeros((n_users, 0), dtype=np.intp)
+        keys = scores.astype(np.int64) * n + (n - 1 - np.arange(n))[None, :]
+        top = np.argpartition(-keys, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (n_users, 1))
+        order = np.argsort(-np.take_along_axis(keys, top, axis=1), axis=1)
+        return np.take_along_axis(top, order, axis=1)
+
+    def select(self, scores, k=4, reranker=None, seed=0, rows=None):
+        # 상위 k 위치 (reranker 가 있으면 동점 무작위 + 노출/다양성 재정렬, reranking.py)
+        if reranker is None:
+            return self.top_k(scores, k)
+        return reranker.select(self, scores, k, seed, rows)
+
+    def matched_tags(self, row, tags):
+        return [t for t in self.dog_tags[row] if t in tags]
+
+    def result(self, row, score, profile):
+        return {
+            "row": int(row),
+            "dog": self.dogs[row],
+            "score": int(round(float(score))),
+            "matched_tags": self.matched_tags(row, profile.tags),
+        }
+
+    def rank(self, profile, k=4, rows=None, reranker=None, seed=0):
+        # rows: 카탈로그에서 미리 골라낸 후보 (k개보다 적으면 전체에서 선택)
+        if rows is not None and len(rows) < k:
+            rows = None
+        scores = self.score(profile, rows)
+        picked = self.select(scores, k, reranker, seed, rows)
+        dog_rows = picked if rows is None else rows[picked]
+        return [self.result(row, scores[i], profile) for i, row in zip(picked, dog_rows)]
+
+    def rank_many(self, profiles, k=4):
+        # 여러 사용자를 한 번에 (야간 일괄 재추천 등)
+        profiles = list(profiles)
+        if not profiles:
+            return []
+        scores = self.score_many(profiles)
+        top = self.top_k_many(scores, k)
+        return [
+            [self.result(row, scores[i, row], profile) for row in top[i]]
+            for i, profile in enumerate(profiles)
+        ]
+
+
+if __name__ == "__main__":
+    # 일괄 매칭: python matching.py profiles.jsonl [dogs.json] > rankings.jsonl
+    # profiles.jsonl 한 줄: {"id": "...", "tags": [...], "size_pref": "small", "care_ok": true}
+    if len(sys.argv) < 2:
+        print("사용법: python matching.py profiles.jsonl [dogs.json]", file=sys.stderr)
+        sys.exit(1)
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    catalog_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(base_dir, "data", "dogs.json")
+    with open(catalog_path, "r", encoding="utf-8") as f:
+        engine = MatchEngine(json.load(f))
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    profiles = [Profile.of(r.get("tags", []), r.get("size_pref", "medium"), r.get("care_ok", False)) for r in rows]
+    for row, results in zip(rows, engine.rank_many(profiles)):
+        print(json.dumps({
+            "id": row.get("id"),
+            "matches": [
+                {"name": m["dog"]["basic_info"]["name"], "score": m["score"], "matched_tags": m["matched_tags"]}
+                for m in results
+            ],
+        }, ensure_ascii=False))
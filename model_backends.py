@@ -0,0 +1,394 @@
+# ==========================================
+# 관상 분석 모델 백엔드
+# ==========================================
+# analyze_image_with_gemini 에서 모델을 실제로 부르는 부분만 갈아끼울 수 있게 분리했습니다.
+# - gemini: Google Gemini (GEMINI_API_KEY 필요)
+# - fake:   API 호출 없이 지연 시간 분포와 오류율만 흉내 내는 로컬 백엔드 (부하 테스트용)
+# - local:  CPU 로컬 추출기(local_tagger.py)로 태그를 고르고, 리포트 문장은 템플릿 또는 Gemini
+#
+# 선택: DOG_MATCH_MODEL_BACKEND=gemini|fake|local
+# fake 설정:
+#   DOG_MATCH_FAKE_LATENCY     fixed:초 | uniform:최소,최대 | lognormal:중앙값,시그마 (기본 lognormal:2.5,0.4)
+#   DOG_MATCH_FAKE_ERROR_RATE  일시적 오류(503) 비율 0~1 (기본 0)
+#   DOG_MATCH_FAKE_SEED        난수 시드 (지정하면 지연/오류 순서가 재현됨)
+#   DOG_MATCH_FAKE_QUOTA_RPM   분당 요청 할당량 (넘으면 429, 기본 0 = 없음)
+# local 설정:
+#   DOG_MATCH_LOCAL_SUMMARY    template(기본, 원격 호출 없음) | gemini(태그 대신 리포트 문장만 요청)
+#   모델/작업 프로세스 수는 local_tagger.py 참고
+
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+
+from prompts import build_summary_prompt, estimate_tokens
+
+# 모델명 설정
+MODEL_NAME = 'models/gemini-2.5-flash'
+
+# 고정 안내문을 Gemini 컨텍스트 캐시에 올려두고 재사용할지 여부 (최소 토큰 수 미달이면 자동으로 건너뜀)
+CONTEXT_CACHE = os.environ.get("DOG_MATCH_CONTEXT_CACHE", "1") != "0"
+CONTEXT_CACHE_TTL = timedelta(hours=1)
+
+IMAGE_TOKENS = 258  # Gemini 이미지 1장 기본 토큰 수 (fake 사용량 계산용)
+
+
+@dataclass
+class Chunk:
+    # 응답 조각 (스트리밍이 아니면 조각 하나로 전체 응답)
+    text: str
+    usage: dict = None  # {"prompt": 토큰, "output": 토큰, "cached": 토큰} - 누적값, 마지막 것만 집계
+
+
+class ModelBackend:
+    name = "base"
+    model_name = ""
+    requires_api_key = False
+    uses_quota = True  # 원격 할당량(rate_limit.py)을 거쳐야 하는지
+
+    def configure(self, api_key):
+        pass
+
+    def warm(self):
+        # 무거운 준비(SDK import 등)를 첫 요청 전에 미리
+        pass
+
+    def generate(self, image, prompt, vocab, structured=True, stream=False, timeout=None):
+        # image: {"mime_type", "data"}, prompt: prompts.Prompt → Chunk 이터레이터
+        raise NotImplementedError
+
+
+# ---------- Gemini ----------
+def response_schema(all_dog_tags):
+    return {
+        "type": "object",
+        "properties": {
+            "summary": {"type": "string"},
+            "matched_tags": {
+                "type": "array",
+                "items": {"type": "string", "format": "enum", "enum": list(all_dog_tags)},
+                "min_items": 3,
+                "max_items": 5,
+            },
+        },
+        "required": ["summary", "matched_tags"],
+    }
+
+
+def _usage_of(response):
+    usage = getattr(response, "usage_metadata", None)
+    if not usage or not usage.total_token_count:
+        return None
+    return {
+        "prompt": usage.prompt_token_count,
+        "output": usage.candidates_token_count,
+        "cached": getattr(usage, "cached_content_token_count", 0),
+    }
+
+
+class GeminiBackend(ModelBackend):
+    name = "gemini"
+    model_name = MODEL_NAME
+    requires_api_key = True
+
+    def __init__(self):
+        self._genai = None
+        self._api_key = None
+        self._import_lock = threading.Lock()
+        self._context_lock = threading.Lock()
+        self._context_caches = {}      # 안내문 해시 → (CachedContent, 만료 시각)
+        self._context_unsupported = set()
+        self._token_counts = {}
+        self._configs = {}             # (태그 목록, 구조화 여부) → GenerationConfig
+
+    @property
+    def genai(self):
+        # SDK import 에 1초 가까이 걸려서 처음 쓸 때(또는 warm) 불러옴
+        if self._genai is None:
+            with self._import_lock:
+                if self._genai is None:
+                    import google.generativeai as genai
+
+                    if self._api_key:
+                        genai.configure(api_key=self._api_key)
+                    self._genai = genai
+        return self._genai
+
+    @property
+    def configured(self):
+        return bool(self._api_key)
+
+    def configure(self, api_key):
+        if api_key == self._api_key:
+            return
+        self._api_key = api_key
+        if self._genai is not None:
+            self._genai.configure(api_key=api_key)
+
+    def warm(self):
+        return self.genai
+
+    def generation_config(self, vocab, structured):
+        if not structured:
+            return None
+        config = self._configs.get(vocab)
+        if config is None:
+            config = self._configs[vocab] = self.genai.GenerationConfig(
+                response_mime_type="application/json",
+                response_schema=response_schema(vocab),
+            )
+        return config
+
+    def _count_tokens(self, model, prompt):
+        # 안내문 토큰 수는 안내문이 바뀔 때 한 번만 세기 (API 실패 시 추정치)
+        digest = hashlib.sha256(prompt.system.encode("utf-8")).hexdigest()
+        if digest not in self._token_counts:
+            try:
+                self._token_counts[digest] = model.count_tokens(prompt.system).total_tokens
+            except Exception:
+                self._token_counts[digest] = estimate_tokens(prompt.system)
+            print(f"프롬프트 안내문 토큰: {self._token_counts[digest]:,} (태그 목록 {'포함' if prompt.tags_inline else '스키마로 분리'})")
+        return self._token_counts[digest]
+
+    def get_model(self, prompt, vocab, structured=True):
+        genai = self.genai
+        config = self.generation_config(tuple(vocab), structured)
+        digest = hashlib.sha256(f"{MODEL_NAME}\0{prompt.system}".encode("utf-8")).hexdigest()
+
+        if CONTEXT_CACHE and digest not in self._context_unsupported:
+            with self._context_lock:
+                cached, expires_at = self._context_caches.get(digest, (None, 0))
+                if cached is None or time.time() > expires_at - 60:
+                    try:
+                        cached = genai.caching.CachedContent.create(
+                            model=MODEL_NAME,
+                            display_name=f"dog-match-{digest[:12]}",
+                            system_instruction=prompt.system,
+                            ttl=CONTEXT_CACHE_TTL,
+                        )
+                        self._context_caches[digest] = (cached, time.time() + CONTEXT_CACHE_TTL.total_seconds())
+                    except Exception as e:
+                        # 안내문이 캐시 최소 크기보다 작거나 권한이 없으면 일반 호출 사용
+                        print(f"컨텍스트 캐시 사용 안 함: {e}")
+                        self._context_unsupported.add(digest)
+                        cached = None
+            if cached is not None:
+                return genai.GenerativeModel.from_cached_content(cached, generation_config=config)
+
+        model = genai.GenerativeModel(MODEL_NAME, generation_config=config, system_instruction=prompt.system)
+        self._count_tokens(model, prompt)
+        return model
+
+    def generate(self, image, prompt, vocab, structured=True, stream=False, timeout=None):
+        # 고정 안내문은 system_instruction(또는 컨텍스트 캐시)으로, 요청마다 보내는 건 사진 + 짧은 지시문뿐
+        model = self.get_model(prompt, vocab, structured)
+        contents = [image, prompt.instruction]
+        request_options = {"timeout": timeout} if timeout else None
+        if not stream:
+            response = model.generate_content(contents, request_options=request_options)
+            yield Chunk(response.text, _usage_of(response))
+            return
+        for chunk in model.generate_content(contents, stream=True, request_options=request_options):
+            try:
+                text = chunk.text
+            except ValueError:  # 안전 필터 등으로 텍스트가 없는 조각
+                text = ""
+            yield Chunk(text, _usage_of(chunk))
+
+
+# ---------- 로컬 가짜 백엔드 ----------
+FAKE_SUMMARIES = (
+    "부드러운 눈매에서 다정하고 차분한 분위기가 느껴져요.",
+    "밝은 표정에서 사람을 좋아하는 활발한 에너지가 느껴져요.",
+    "조심스러운 눈빛 속에 깊은 배려심이 보이는 얼굴이에요.",
+    "여유로운 미소에서 느긋하고 편안한 성격이 묻어나요.",
+)
+
+
+def parse_latency(spec):
+    # "fixed:2" / "uniform:0.5,3" / "lognormal:2.5,0.4" → (rng → 초) 함수
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"알 수 없는 지연 시간 분포: {spec!r}")
+
+
+class FakeBackend(ModelBackend):
+    name = "fake"
+    model_name = "fake-local"
+
+    def __init__(self, latency=None, error_rate=None, seed=None, quota_rpm=None):
+        latency = latency or os.environ.get("DOG_MATCH_FAKE_LATENCY", "lognormal:2.5,0.4")
+        if error_rate is None:
+            error_rate = float(os.environ.get("DOG_MATCH_FAKE_ERROR_RATE", "0"))
+        if seed is None and os.environ.get("DOG_MATCH_FAKE_SEED"):
+            seed = int(os.environ["DOG_MATCH_FAKE_SEED"])
+        if quota_rpm is None:
+            quota_rpm = int(os.environ.get("DOG_MATCH_FAKE_QUOTA_RPM", "0"))
+        self.latency_spec = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.quota_rpm = quota_rpm
+        self._calls = deque()  # 최근 1분 동안 받은 요청 시각 (할당량 흉내)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            return self.sample_latency(self._rng), self._rng.random() < self.error_rate
+
+    def _within_quota(self):
+        # 최근 60초 요청 수가 할당량 미만이면 이번 요청을 세고 True (거절된 요청도 API 처럼 바로 응답)
+        if not self.quota_rpm:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            while self._calls and now - self._calls[0] >= 60:
+                self._calls.popleft()
+            if len(self._calls) >= self.quota_rpm:
+                return False
+            self._calls.append(now)
+            return True
+
+    def fake_result(self, image_bytes, vocab):
+        # 같은 사진이면 항상 같은 결과 (사진 해시로 고름)
+        rng = random.Random(hashlib.sha256(image_bytes).digest())
+        tags = rng.sample(list(vocab), min(len(vocab), rng.randint(3, 5)))
+        return {"summary": rng.choice(FAKE_SUMMARIES), "matched_tags": tags}
+
+    def generate(self, image, prompt, vocab, structured=True, stream=False, timeout=None):
+        from google.api_core import exceptions as api_exceptions
+
+        if not self._within_quota():
+            time.sleep(0.1)
+            raise api_exceptions.ResourceExhausted("fake backend: quota exceeded (requests per minute)")
+        latency, fail = self._draw()
+        if timeout and latency > timeout:
+            time.sleep(timeout)
+            raise api_exceptions.DeadlineExceeded(f"fake backend: {latency:.1f}s > timeout {timeout}s")
+        if fail:
+            time.sleep(latency * 0.5)  # 실패는 보통 응답보다 일찍 옴
+            raise api_exceptions.ServiceUnavailable("fake backend: simulated 503")
+
+        text = json.dumps(self.fake_result(image["data"], vocab), ensure_ascii=False)
+        usage = {
+            "prompt": estimate_tokens(prompt.system) + estimate_tokens(prompt.instruction) + IMAGE_TOKENS,
+            "output": estimate_tokens(text),
+            "cached": 0,
+        }
+        if not stream:
+            time.sleep(latency)
+            yield Chunk(text, usage)
+            return
+        # 첫 조각까지 지연의 40%, 나머지는 조각마다 나눠서
+        pieces = [text[i:i + 24] for i in range(0, len(text), 24)]
+        time.sleep(latency * 0.4)
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(latency * 0.6 / max(1, len(pieces) - 1))
+            yield Chunk(piece, usage if i == len(pieces) - 1 else None)
+
+
+# ---------- 로컬 CPU 추출기 ----------
+class LocalBackend(ModelBackend):
+    name = "local"
+
+    def __init__(self, summary=None, pool=None):
+        from local_tagger import TaggerPool
+
+        self.summary = (summary or os.environ.get("DOG_MATCH_LOCAL_SUMMARY", "template")).lower()
+        if self.summary not in ("template", "gemini"):
+            raise ValueError(f"알 수 없는 리포트 방식: {self.summary!r} (template, gemini 중 하나)")
+        self.pool = pool or TaggerPool()
+        self.summary_backend = GeminiBackend() if self.summary == "gemini" else None
+        self.model_name = f"local-{self.pool.name}+{self.summary}"
+
+    @property
+    def requires_api_key(self):
+        return self.summary_backend is not None
+
+    @property
+    def uses_quota(self):
+        return self.summary_backend is not None
+
+    @property
+    def configured(self):
+        return self.summary_backend is None or self.summary_backend.configured
+
+    def configure(self, api_key):
+        if self.summary_backend is not None:
+            self.summary_backend.configure(api_key)
+
+    def warm(self):
+        self.pool.warm()
+        if self.summary_backend is not None:
+            self.summary_backend.warm()
+
+    def _tags(self, image, vocab, timeout):
+        from concurrent.futures.process import BrokenProcessPool
+
+        from google.api_core import exceptions as api_exceptions
+
+        try:
+            return self.pool.analyze(image["data"], vocab, timeout)
+        except BrokenProcessPool as e:  # 작업 프로세스가 죽음 → 재시도하면 새 풀에서
+            raise api_exceptions.InternalServerError(f"local tagger: {e}") from e
+
+    def generate(self, image, prompt, vocab, structured=True, stream=False, timeout=None):
+        from analysis import QUOTA_ERRORS
+        from local_tagger import template_summary
+
+        tags, attributes = self._tags(image, vocab, timeout)
+        if self.summary_backend is None:
+            text = json.dumps({"matched_tags": tags, "summary": template_summary(attributes)}, ensure_ascii=False)
+            yield Chunk(text)
+            return
+
+        # 태그를 먼저 보내고(화면에 바로 표시) 리포트 문장은 Gemini 응답을 JSON 문자열로 이어 붙임
+        yield Chunk(json.dumps({"matched_tags": tags}, ensure_ascii=False)[:-1] + ', "summary": "')
+        sent = False
+        try:
+            chunks = self.summary_backend.generate(
+                image, build_summary_prompt(tuple(tags)), vocab, structured=False, stream=stream, timeout=timeout
+            )
+            for chunk in chunks:
+                text = chunk.text.lstrip() if not sent else chunk.text
+                sent = sent or bool(text)
+                yield Chunk(json.dumps(text, ensure_ascii=False)[1:-1], chunk.usage)
+        except QUOTA_ERRORS:
+            # 할당량 초과는 analysis_service 가 보고 할당량 제한기를 멈추도록 그대로 올림
+            raise
+        except Exception as e:
+            # 태그는 이미 골랐으니 리포트 문장 때문에 분석 전체를 실패시키지 않음
+            print(f"리포트 문장 요청 실패, 템플릿 사용: {e}")
+            summary = json.dumps(template_summary(attributes), ensure_ascii=False)[1:-1]
+            # 중간에 끊긴 문장은 summary 를 한 번 더 보내서 템플릿으로 바꿈 (같은 키는 마지막 값이 남음)
+            yield Chunk(f'", "summary": "{summary}' if sent else summary)
+        yield Chunk('"}')
+
+
+BACKENDS = {"gemini": GeminiBackend, "fake": FakeBackend, "local": LocalBackend}
+
+
+def get_backend(name=None):
+    # 프로세스당 백엔드 하나 (이름을 주지 않으면 DOG_MATCH_MODEL_BACKEND)
+    return _backend((name or os.environ.get("DOG_MATCH_MODEL_BACKEND", "gemini")).lower())
+
+
+@lru_cache(maxsize=None)
+def _backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f"알 수 없는 모델 백엔드: {name!r} ({', '.join(BACKENDS)} 중 하나)")
+    return BACKENDS[name]()
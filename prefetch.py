@@ -0,0 +1,77 @@
+# ==========================================
+# 결과 화면 미리 계산 (성향 테스트를 푸는 동안)
+# ==========================================
+# Step 3 에서 질문을 읽고 답을 고르는 동안, 지금 답 그대로 결과 보기를 누른다고 보고
+# 상위 4마리 점수 계산 + 카드 썸네일 준비를 백그라운드에서 해 둡니다.
+# - 관상 태그가 정해질 때(보기 기본값으로) 한 번, 답을 바꿀 때마다 다시
+# - 세션마다 가장 최근 요청 하나만 (아직 시작 안 한 이전 요청은 취소)
+# - Step 4 는 매칭 조건(키)이 같으면 미리 계산한 결과를 그대로 쓰고, 다르면 평소처럼 계산
+#
+# 끄기: DOG_MATCH_PREFETCH=0
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import telemetry
+
+ENABLED = os.environ.get("DOG_MATCH_PREFETCH", "1") != "0"
+WORKERS = int(os.environ.get("DOG_MATCH_PREFETCH_WORKERS", "2"))
+MAX_SESSIONS = 2000  # 결과를 보관하는 세션 수 (넘으면 가장 오래된 것부터)
+
+
+class Prefetcher:
+    def __init__(self, workers=WORKERS, max_sessions=MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._jobs = OrderedDict()  # 세션 ID → (키, Future)
+        self._lock = threading.Lock()
+
+    def submit(self, session_id, key, fn, *args):
+        # 같은 키가 이미 있으면 그대로, 다르면 이전 요청을 취소하고 새로
+        with self._lock:
+            job = self._jobs.get(session_id)
+            if job is not None and job[0] == key:
+                self._jobs.move_to_end(session_id)
+                return job[1]
+            if job is not None:
+                job[1].cancel()
+            future = self._executor.submit(self._run, fn, args)
+            self._jobs[session_id] = (key, future)
+            self._jobs.move_to_end(session_id)
+            while len(self._jobs) > self.max_sessions:
+                _, (_, old) = self._jobs.popitem(last=False)
+                old.cancel()
+        telemetry.incr("prefetch_requests")
+        return future
+
+    def _run(self, fn, args):
+        with telemetry.span("prefetch"):
+            try:
+                return fn(*args)
+            except Exception as e:
+                print(f"결과 미리 계산 오류: {e}")
+                raise
+
+    def take(self, session_id, key):
+        # 키가 같고 이미 시작한 요청이면 그 결과 (끝날 때까지 기다림), 아니면 None
+        with self._lock:
+            job = self._jobs.pop(session_id, None)
+        if job is None or job[0] != key or job[1].cancel():
+            if job is not None:
+                job[1].cancel()
+            telemetry.incr("prefetch_results", result="miss")
+            return None
+        try:
+            result = job[1].result()
+        except Exception:
+            result = None
+        telemetry.incr("prefetch_results", result="miss" if result is None else "hit")
+        return result
+
+    def drop(self, session_id):
+        with self._lock:
+            job = self._jobs.pop(session_id, None)
+        if job is not None:
+            job[1].cancel()
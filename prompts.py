@@ -0,0 +1,93 @@
+# ==========================================
+# 관상 분석 프롬프트 템플릿
+# ==========================================
+# 고정된 부분(역할, 말투, 태그 목록, 응답 형식)은 시스템 안내문으로 한 번만 만들고,
+# 요청마다 보내는 것은 사진과 짧은 지시문뿐입니다.
+# 태그 목록은 정렬/중복 제거된 순서를 써서 프로세스가 달라도 글자 하나 다르지 않게 유지합니다.
+# (같은 안내문이어야 Gemini 쪽 프롬프트 캐시를 재사용할 수 있습니다)
+
+import math
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+# 시스템 안내문 토큰 예산 (넘으면 태그 목록은 응답 스키마에만 남김)
+PROMPT_TOKEN_BUDGET = int(os.environ.get("DOG_MATCH_PROMPT_TOKEN_BUDGET", "2000"))
+
+PERSONA = """당신은 따뜻한 마음을 가진 '댕댕이 운명 매칭사'입니다! 🐾
+
+사진 속 사람의 얼굴을 보고, 그 사람의 **분위기, 인상, 눈빛**을 읽어주세요.
+
+중요한 것은:
+- 외모 평가가 아닌, 그 사람이 풍기는 **따뜻함, 에너지, 성향**을 파악하는 것!
+- 마치 오래된 친구처럼 편안하고 공감하는 톤으로 이야기해주세요
+- "이런 분이시네요!" 하고 긍정적으로 해석해주세요
+
+예시:
+- "부드러운 미소를 가지셨네요. 차분하고 온화한 분위기가 느껴져요."
+- "눈빛에 에너지가 넘치시네요! 활발하고 긍정적인 성격이실 것 같아요."
+- "조용하지만 깊이 있는 눈빛이에요. 세심하고 따뜻한 마음을 가지신 것 같아요."
+
+"""
+
+SYSTEM_TEMPLATE = PERSONA + """그리고 이 사람과 **가장 찰떡궁합**인 강아지 성향 태그를 {tag_source} 3~5개 골라주세요.{tag_list}
+
+반드시 아래 JSON 형식으로만 답변해주세요 (다른 텍스트는 절대 포함하지 마세요):
+{{
+    "summary": "2-3문장으로 따뜻하고 긍정적인 톤으로 분석",
+    "matched_tags": ["태그1", "태그2", "태그3"]
+}}"""
+
+TAG_LIST = "\n[태그 목록] {tags}"
+TAG_SOURCE_LIST = "아래 목록에서"
+TAG_SOURCE_SCHEMA = "응답 스키마의 태그 목록에서"
+
+USER_INSTRUCTION = "이 사진 속 사람의 분위기를 읽고 JSON으로 답해주세요."
+
+# 태그는 로컬에서 고르고 리포트 문장만 Gemini 에 맡길 때 (model_backends.LocalBackend)
+SUMMARY_SYSTEM = PERSONA + "2-3문장으로 따뜻하고 긍정적인 톤의 분석 문장만 답해주세요 (JSON, 태그, 다른 설명 없이)."
+SUMMARY_INSTRUCTION = "이 사진 속 사람의 분위기를 읽어주세요. 찰떡궁합 강아지 성향: {tags}"
+
+
+@dataclass(frozen=True)
+class Prompt:
+    system: str
+    instruction: str
+    system_tokens: int
+    tags_inline: bool
+
+    @property
+    def text(self):
+        # 캐시 키 등에 쓰는 전체 프롬프트
+        return f"{self.system}\n\n{self.instruction}"
+
+
+def tag_vocabulary(dogs):
+    # 정렬 + 중복 제거된 태그 사전
+    return tuple(sorted({tag for dog in dogs for tag in dog.get("personality_tags", [])}))
+
+
+def estimate_tokens(text):
+    # 대략적인 토큰 수 (영문/기호 4글자 ≈ 1토큰, 한글 등은 1글자 ≈ 1토큰)
+    ascii_chars = sum(1 for ch in text if ch.isascii())
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+@lru_cache(maxsize=8)
+def build_prompt(vocab, structured=True, budget=PROMPT_TOKEN_BUDGET):
+    vocab = tuple(sorted(set(vocab)))
+    system = SYSTEM_TEMPLATE.format(tag_source=TAG_SOURCE_LIST, tag_list=TAG_LIST.format(tags=", ".join(vocab)))
+    tokens = estimate_tokens(system)
+    tags_inline = True
+    if structured and tokens > budget:
+        # 태그가 너무 많으면 목록은 응답 스키마(enum)에만 두고 안내문에서는 뺌
+        system = SYSTEM_TEMPLATE.format(tag_source=TAG_SOURCE_SCHEMA, tag_list="")
+        tokens = estimate_tokens(system)
+        tags_inline = False
+    return Prompt(system, USER_INSTRUCTION, tokens, tags_inline)
+
+
+@lru_cache(maxsize=64)
+def build_summary_prompt(tags):
+    # 안내문은 고정 (컨텍스트 캐시 재사용), 고른 태그는 지시문에
+    return Prompt(SUMMARY_SYSTEM, SUMMARY_INSTRUCTION.format(tags=", ".join(tags)), estimate_tokens(SUMMARY_SYSTEM), False)
@@ -0,0 +1,96 @@
+# ==========================================
+# Step 3 성향 테스트 - 질문과 답변 → 태그 규칙
+# ==========================================
+# 화면(app.py), 일괄 매칭, 사전 계산 등에서 같은 규칙을 쓰도록 한 곳에 모았습니다.
+
+import itertools
+from dataclasses import dataclass
+
+from matching import Profile
+
+
+@dataclass(frozen=True)
+class Option:
+    label: str
+    tags: tuple = ()
+    size_pref: str = None   # 이 답을 고르면 크기 선호가 정해짐
+    care_ok: bool = None    # 이 답을 고르면 케어 의지가 정해짐
+
+
+@dataclass(frozen=True)
+class Question:
+    key: str
+    label: str
+    options: tuple
+
+
+QUESTIONS = (
+    # Q1. 주말 스타일 (→ 활동성)
+    Question("q1", "Q1. 당신의 주말은?", (
+        Option("집콕하며 넷플릭스 정주행 🛋️", ("#실내정적", "#조용한_가족추천", "#분리불안없음")),
+        Option("카페 투어하며 힐링 산책 ☕", ("#산책잘함", "#순둥이")),
+        Option("등산이나 러닝으로 땀 흘리기 🏃", ("#산책러버", "#산책마스터", "#실외배변_선호")),
+    )),
+    # Q2. 친구들이 보는 나 (→ 에너지)
+    Question("q2", "Q2. 친구들이 말하는 나는?", (
+        Option("차분하고 조용한 편 🤫", ("#조용한_가족추천", "#순둥이", "#실내정적")),
+        Option("활발하고 에너지 넘쳐 🎉", ("#사람좋아", "#산책잘함")),
+        Option("중간? 때에 따라 달라 😌", ("#순둥이",)),
+    )),
+    # Q3. 새로운 사람 만날 때 (→ 강아지 겁 많은지 여부)
+    Question("q3", "Q3. 새로운 사람을 만나면?", (
+        Option("낯을 좀 가리는 편, 천천히 친해져요 🙈", ("#겁쟁이", "#소심함", "#인내심필요", "#사회성기르는중", "#겁이많음")),
+        Option("금방 친해지는 스타일! 😄", ("#사람좋아", "#사람손길_좋아함", "#순둥이")),
+        Option("상대에 따라 다르게 반응해요 🤔", ("#순둥이", "#손길허용")),
+    )),
+    # Q4. 선호하는 공간 (→ 크기 선호)
+    Question("q4", "Q4. 내가 좋아하는 분위기는?", (
+        Option("아늑하고 포근한 공간 🕯️", ("#소형견",), size_pref="small"),
+        Option("적당히 아담한 공간 🏠", (), size_pref="medium"),
+        Option("넓고 여유로운 공간 🏡", ("#대형견",), size_pref="large"),
+    )),
+    # Q5. 관계 스타일 (→ 케어 의지)
+    Question("q5", "Q5. 누군가 나에게 의지한다면?", (
+        Option("천천히 기다려주며 함께 성장할게요 🌱", ("#인내심필요", "#기다림이_필요해요", "#적응기간_필요"), care_ok=True),
+        Option("서로 편안하게 있고 싶어요 🌙", ("#순둥이", "#조용한_가족추천"), care_ok=False),
+        Option("밝은 에너지로 함께 즐기고 싶어요 ☀️", ("#사람좋아", "#산책잘함"), care_ok=False),
+    )),
+)
+
+
+def option_for(question, answer):
+    # answer: 보기 번호 또는 보기 문구
+    if isinstance(answer, int):
+        return question.options[answer]
+    for option in question.options:
+        if option.label == answer:
+            return option
+    raise ValueError(f"{question.key}: 알 수 없는 답변 {answer!r}")
+
+
+def answer_indices(answers):
+    # 답변(보기 번호 또는 문구) 5개 → 보기 번호 튜플 (사전 계산 표 조회 키)
+    return tuple(question.options.index(option_for(question, answer)) for question, answer in zip(QUESTIONS, answers))
+
+
+def apply_answers(answers, size_pref="medium", care_ok=False):
+    # 답변 5개 → (추가 태그 목록, 크기 선호, 케어 의지)
+    tags = []
+    for question, answer in zip(QUESTIONS, answers):
+        option = option_for(question, answer)
+        tags.extend(option.tags)
+        if option.size_pref is not None:
+            size_pref = option.size_pref
+        if option.care_ok is not None:
+            care_ok = option.care_ok
+    return tags, size_pref, care_ok
+
+
+def profile_from_answers(answers, photo_tags=()):
+    tags, size_pref, care_ok = apply_answers(answers)
+    return Profile.of(list(photo_tags) + tags, size_pref, care_ok)
+
+
+def all_answer_combinations():
+    # 보기 번호 조합 전체 (3^5 = 243가지)
+    return itertools.product(*(range(len(q.options)) for q in QUESTIONS))
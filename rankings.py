@@ -0,0 +1,178 @@
+# ==========================================
+# 성향 테스트 조합별 사전 계산 랭킹
+# ==========================================
+# 성향 테스트 답은 3^5 = 243가지(서로 다른 조건은 그보다 적음)뿐이라,
+# 카탈로그 버전마다 조합별 전체 점수를 한 번에 계산해 표로 둡니다.
+# 결과 화면에서는 표의 점수에 관상 태그 몫만 역색인으로 더해서 상위 k마리를 고르고,
+# 같은 (조합, 관상 태그) 결과는 메모해 두었다가 그대로 씁니다.
+# 카탈로그가 바뀌면 새 버전의 엔진으로 새 표를 만듭니다 (이전 표는 그 버전을 보던 세션용).
+# 의미 기반 매칭(semantic.py)을 켜면 표 점수에 태그 유사도 점수를 섞어서 고릅니다.
+# 재정렬(reranking.py)은 세션마다 결과가 달라서 메모 없이 점수 배열에서 바로 고릅니다.
+#
+# 메모리: 조건 수 x 강아지 수 x 2 bytes (100,000마리면 약 35MB, 의미 기반이면 두 배)
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import telemetry
+from matching import Profile
+from quiz import all_answer_combinations, profile_from_answers
+
+MEMO_SIZE = 4096     # (조합, 관상 태그) 결과 메모 수
+KEEP_TABLES = 4      # 보관할 카탈로그 버전 수 (catalog_watch 의 스냅샷 수와 같게)
+
+
+class RankingTable:
+    def __init__(self, engine, k=4, memo_size=MEMO_SIZE, semantic=False):
+        self.engine = engine
+        self.version = engine.version
+        self.k = k
+        self.memo_size = memo_size
+        self.semantic = None
+        if semantic:
+            from semantic import SemanticIndex
+
+            self.semantic = SemanticIndex(engine)
+
+        # 243가지 답 → 서로 다른 조건 번호
+        rows = {}
+        self.combo_rows = {}
+        for combo in all_answer_combinations():
+            self.combo_rows[combo] = rows.setdefault(profile_from_answers(combo), len(rows))
+        self.quiz_profiles = list(rows)
+
+        with telemetry.span("ranking_table_build"):
+            scores = engine.score_many(self.quiz_profiles)
+            dtype = np.int16 if scores.size == 0 or scores.max() < np.iinfo(np.int16).max else np.int32
+            self.quiz_scores = scores.astype(dtype)
+
+        if self.semantic is not None:
+            # 조건별 성향 테스트 태그의 유사도 열 합 (결과 화면에서는 관상 태그 열만 더함)
+            with telemetry.span("semantic_table_build"):
+                self.semantic_quiz = np.stack(
+                    [self.semantic.column_sum(quiz.tags) for quiz in self.quiz_profiles]
+                ).astype(np.float16)
+
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _extra_tags(self, quiz, photo_tags):
+        # 성향 테스트 태그에 없는 관상 태그만 (같은 태그는 한 번만 점수에 들어감)
+        # 의미 기반이면 카탈로그에 없는 태그도 유사도에 쓰이므로 남김
+        return frozenset(
+            t for t in photo_tags
+            if t not in quiz.tags and (self.semantic is not None or t in self.engine.tag_index)
+        )
+
+    def _pick(self, row, extra, k):
+        key = (row, extra, k)
+        with self._lock:
+            picks = self._memo.get(key)
+            if picks is not None:
+                self._memo.move_to_end(key)
+        if picks is not None:
+            telemetry.incr("cache_requests", cache="ranking_memo", result="hit")
+            return picks
+        telemetry.incr("cache_requests", cache="ranking_memo", result="miss")
+
+        scores = self.scores(row, extra)
+        picks = tuple((int(r), scores[r].item()) for r in self.engine.top_k(scores, k))
+
+        with self._lock:
+            self._memo[key] = picks
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return picks
+
+    def scores(self, row, extra):
+        # 조건 row 의 표 점수 + 관상 태그 몫 (+ 의미 기반 유사도) - 강아지 수 길이
+        engine = self.engine
+        scores = self.quiz_scores[row]
+        exact = [t for t in extra if t in engine.tag_index]
+        if exact:
+            scores = scores.astype(np.int32)  # 표는 그대로 두고 복사본에 더하기
+            for tag in exact:
+                scores[engine.tag_rows(tag)] += engine.tag_weights[engine.tag_index[tag]]
+        if self.semantic is not None:
+            with telemetry.span("semantic_rank"):
+                similarity = self.semantic.column_sum(extra, base=self.semantic_quiz[row])
+                similarity /= self.semantic.norm(self.quiz_profiles[row].tags | extra) or 1.0
+                scores = scores + self.semantic.weight * similarity
+        return scores
+
+    def rank(self, answers, photo_tags=(), k=None, reranker=None, seed=0):
+        # answers: 보기 번호 5개 → MatchEngine.rank 와 같은 모양의 결과
+        k = self.k if k is None else k
+        row = self.combo_rows[tuple(answers)]
+        quiz = self.quiz_profiles[row]
+        extra = self._extra_tags(quiz, photo_tags)
+        if reranker is None:
+            picks = self._pick(row, extra, k)
+        else:
+            scores = self.scores(row, extra)
+            picks = [(int(r), scores[r].item()) for r in reranker.select(self.engine, scores, k, seed)]
+        profile = Profile(quiz.tags | frozenset(photo_tags), quiz.size_pref, quiz.care_ok)
+        result = self.engine.result if self.semantic is None else self.semantic.result
+        return [result(dog_row, score, profile) for dog_row, score in picks]
+
+    def warm(self, photo_tag_sets, k=None):
+        # 최근 관상 분석 결과들에 대해 모든 조합의 상위 k마리를 미리 계산
+        k = self.k if k is None else k
+        count = 0
+        for photo_tags in photo_tag_sets:
+            for combo, row in self.combo_rows.items():
+                if count >= self.memo_size:
+                    return count
+                self._pick(row, self._extra_tags(self.quiz_profiles[row], photo_tags), k)
+                count += 1
+        return count
+
+
+class RankingTables:
+    # 카탈로그 버전별 표 (같은 버전은 한 번만 계산, 계산 중이면 기다렸다 같이 사용)
+    def __init__(self, k=4, keep=KEEP_TABLES, warm_with=None, semantic=False):
+        self.k = k
+        self.keep = keep
+        self.warm_with = warm_with  # 표를 만든 뒤 미리 계산할 관상 태그 목록을 돌려주는 함수
+        self.semantic = semantic    # 표마다 의미 기반 색인도 함께 (semantic.py)
+        self._tables = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def get(self, engine):
+        with self._lock:
+            table = self._tables.get(engine.version)
+            if table is not None and table.engine is engine:
+                return table
+            build_lock = self._building.setdefault(engine.version, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                table = self._tables.get(engine.version)
+                if table is not None and table.engine is engine:
+                    return table
+            table = RankingTable(engine, self.k, semantic=self.semantic)
+            with self._lock:
+                self._tables[engine.version] = table
+                while len(self._tables) > self.keep:
+                    self._tables.popitem(last=False)
+                self._building.pop(engine.version, None)
+
+        if self.warm_with is not None:
+            threading.Thread(target=self._warm, args=(table,), name="ranking-warm", daemon=True).start()
+        return table
+
+    def _warm(self, table):
+        try:
+            table.warm(self.warm_with())
+        except Exception as e:
+            print(f"랭킹 미리 계산 오류: {e}")
+
+    def build_async(self, engine):
+        # 새 카탈로그 버전의 표를 백그라운드에서 미리 (성향 테스트 화면에 있는 동안)
+        with self._lock:
+            if engine.version in self._tables or engine.version in self._building:
+                return
+        threading.Thread(target=self.get, args=(engine,), name="ranking-build", daemon=True).start()
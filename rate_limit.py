@@ -0,0 +1,199 @@
+# ==========================================
+# 모델 호출 할당량 제한 (분당 요청 수 / 분당 토큰 수)
+# ==========================================
+# 모든 세션이 함께 쓰는 토큰 버킷 두 개(RPM, TPM)와 선착순 대기열입니다.
+# - 분석 작업은 접수할 때 대기표(Ticket)를 받고, 모델을 부르기 직전에 차례와 할당량을 기다림
+#   → 화면에 "N번째 순서 (약 M초)" 를 보여줄 수 있음
+# - 토큰 수는 요청 전에 알 수 없어서 최근 평균으로 미리 떼고, 응답의 실제 사용량으로 정산
+# - 할당량 초과(429)가 오면 각자 재시도하지 않고 대기열 전체를 잠깐 멈춤 (재시도 폭주 방지)
+# - 새 요청의 예상 대기가 MAX_WAIT 를 넘으면 포화 상태 (화면은 성향 테스트만으로 매칭)
+#
+# 설정 (0 이면 제한 없음, 기본값은 gemini-2.5-flash 무료 등급):
+#   DOG_MATCH_GEMINI_RPM, DOG_MATCH_GEMINI_TPM, DOG_MATCH_TOKENS_PER_REQUEST(첫 추정치),
+#   DOG_MATCH_QUOTA_MAX_WAIT(초), DOG_MATCH_QUOTA_COOLDOWN(429 뒤 멈추는 초)
+
+import os
+import threading
+import time
+from collections import deque
+
+import telemetry
+
+RPM = float(os.environ.get("DOG_MATCH_GEMINI_RPM", "10"))
+TPM = float(os.environ.get("DOG_MATCH_GEMINI_TPM", "250000"))
+TOKENS_PER_REQUEST = float(os.environ.get("DOG_MATCH_TOKENS_PER_REQUEST", "1500"))
+MAX_WAIT = float(os.environ.get("DOG_MATCH_QUOTA_MAX_WAIT", "30"))
+COOLDOWN = float(os.environ.get("DOG_MATCH_QUOTA_COOLDOWN", "10"))
+USAGE_SMOOTHING = 0.2  # 요청당 토큰 추정치 갱신 비율 (지수 이동 평균)
+# 할당량은 "최근 1분" 기준이라 버킷은 조금 덜 차오르게, 몰아서 쓰는 양은 몇 초치만
+# (1분 어디를 잘라도 HEADROOM x (1 + BURST_SECONDS/60) < 1 이 되도록)
+HEADROOM = 0.9
+BURST_SECONDS = 5.0
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    # 분당 per_minute 의 HEADROOM 만큼 차오르는 버킷 (최대 BURST_SECONDS 치), 잠금은 QuotaLimiter 가 잡음
+    def __init__(self, per_minute, headroom=HEADROOM, burst_seconds=BURST_SECONDS):
+        self.per_minute = per_minute
+        self.rate = per_minute * headroom / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self):
+        return self.per_minute <= 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, amount, now):
+        # 음수(빚)까지 허용: 추정보다 많이 쓴 요청은 다음 요청들이 그만큼 더 기다림
+        if not self.unlimited:
+            self._refill(now)
+            self.tokens -= amount
+
+
+class Ticket:
+    __slots__ = ("tokens", "enqueued_at")
+
+    def __init__(self):
+        self.tokens = 0.0  # 입장할 때 미리 뗀 토큰 수
+        self.enqueued_at = time.monotonic()
+
+
+class QuotaLimiter:
+    def __init__(self, rpm=RPM, tpm=TPM, tokens_per_request=TOKENS_PER_REQUEST,
+                 max_wait=MAX_WAIT, cooldown=COOLDOWN):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.estimate = float(tokens_per_request)
+        self.max_wait = max_wait
+        self.cooldown = cooldown
+        self._queue = deque()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    # ---------- 대기열 ----------
+    def enqueue(self, front=False):
+        # 재시도는 맨 앞에서 다시 기다림
+        ticket = Ticket()
+        with self._cond:
+            if front:
+                self._queue.appendleft(ticket)
+            else:
+                self._queue.append(ticket)
+        return ticket
+
+    def cancel(self, ticket):
+        with self._cond:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def position(self, ticket):
+        # 1부터, 이미 들어갔거나 취소됐으면 None
+        with self._cond:
+            try:
+                return self._queue.index(ticket) + 1
+            except ValueError:
+                return None
+
+    def interval(self):
+        # 할당량이 꽉 찬 상태에서 요청 하나가 들어가는 간격(초)
+        per_request = 0.0 if self.requests.unlimited else 1.0 / self.requests.rate
+        per_tokens = 0.0 if self.tokens.unlimited else self.estimate / self.tokens.rate
+        return max(per_request, per_tokens)
+
+    def _head_wait(self, now):
+        return max(
+            self._paused_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(self.estimate, now),
+            0.0,
+        )
+
+    def eta(self, ticket):
+        # 대기표의 예상 대기 시간(초), 대기열에 없으면 0
+        with self._cond:
+            try:
+                ahead = self._queue.index(ticket)
+            except ValueError:
+                return 0.0
+            return self._head_wait(time.monotonic()) + ahead * self.interval()
+
+    def expected_wait(self):
+        # 지금 새로 줄을 서면 기다릴 시간(초)
+        with self._cond:
+            return self._head_wait(time.monotonic()) + len(self._queue) * self.interval()
+
+    def saturated(self):
+        return self.expected_wait() > self.max_wait
+
+    # ---------- 입장 / 정산 ----------
+    def acquire(self, ticket, timeout):
+        # 차례가 오고 할당량이 생길 때까지 기다렸다가 입장 (timeout 을 넘기면 QuotaExceeded)
+        deadline = time.monotonic() + timeout
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if ticket not in self._queue:
+                    raise QuotaExceeded("대기표가 취소되었습니다")
+                wait = None  # 앞사람이 들어갈 때까지 (notify)
+                if self._queue[0] is ticket:
+                    wait = self._head_wait(now)
+                    if wait <= 0:
+                        self._queue.popleft()
+                        ticket.tokens = self.estimate
+                        self.requests.take(1, now)
+                        self.tokens.take(ticket.tokens, now)
+                        self._cond.notify_all()
+                        break
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._queue.remove(ticket)
+                    self._cond.notify_all()
+                    telemetry.incr("quota_timeouts")
+                    raise QuotaExceeded(f"할당량 대기 시간 초과 ({timeout:.0f}초)")
+                self._cond.wait(remaining if wait is None else min(wait, remaining))
+        telemetry.observe("quota_wait", time.monotonic() - started)
+
+    def settle(self, ticket, used_tokens):
+        # 응답의 실제 토큰 사용량으로 정산하고 추정치 갱신
+        if not used_tokens:
+            return
+        with self._cond:
+            self.tokens.take(used_tokens - ticket.tokens, time.monotonic())
+            ticket.tokens = used_tokens
+            self.estimate += USAGE_SMOOTHING * (used_tokens - self.estimate)
+
+    def penalize(self, seconds=None):
+        # 할당량 초과 응답: 모두 잠깐 멈춤
+        seconds = self.cooldown if seconds is None else seconds
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+        telemetry.incr("quota_penalties")
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "queued": len(self._queue),
+                "paused": max(0.0, self._paused_until - now),
+                "tokens_per_request": round(self.estimate),
+                "expected_wait": self._head_wait(now) + len(self._queue) * self.interval(),
+            }
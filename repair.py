@@ -0,0 +1,82 @@
+# ==========================================
+# 모델 응답 복구 (재요청 없이 로컬에서 고치기)
+# ==========================================
+# - JSON 앞뒤 잡음, 코드펜스, 끝의 쉼표 등을 정리해서 파싱
+# - 태그 목록에 살짝 어긋난 태그(#빼먹음, 띄어쓰기, 오타)를 가장 가까운 태그로 맞추기
+
+import difflib
+import json
+import re
+
+from json_stream import StreamingObjectParser
+
+FUZZY_CUTOFF = 0.75
+
+_TRAILING_COMMA = re.compile(r",\s*([\]}])")
+
+
+def parse_json_loose(text):
+    # 항상 객체(dict) 반환, 객체를 얻지 못하면 ValueError (json.JSONDecodeError)
+    # 1. 그대로 파싱 (목록/문자열/숫자만 온 경우는 아래 복구 단계로)
+    cleaned = text.replace("```json", "").replace("```", "").strip()
+    try:
+        value = json.loads(cleaned)
+        if isinstance(value, dict):
+            return value
+    except json.JSONDecodeError:
+        pass
+
+    # 2. 가장 바깥 { ... } 만 잘라서, 끝의 쉼표 제거 후 파싱
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start != -1 and end > start:
+        body = _TRAILING_COMMA.sub(r"\1", cleaned[start:end + 1])
+        try:
+            value = json.loads(body)
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+
+    # 3. 잘린 응답이라도 완성된 값들만 건지기
+    parser = StreamingObjectParser()
+    parser.feed(cleaned)
+    if parser.values:
+        return parser.values
+    raise json.JSONDecodeError("복구할 수 없는 응답입니다", cleaned, 0)
+
+
+def _normalize(tag):
+    tag = tag.strip().replace(" ", "_")
+    return tag if tag.startswith("#") else f"#{tag}"
+
+
+def _squash(tag):
+    return tag.replace("_", "").replace("#", "")
+
+
+def repair_tags(tags, all_dog_tags, cutoff=FUZZY_CUTOFF):
+    # 태그 목록에 있는 것만, 중복 없이 (가까운 태그로 보정)
+    if not isinstance(tags, list):
+        return []
+    vocab = set(all_dog_tags)
+    squashed = {}
+    for tag in all_dog_tags:
+        squashed.setdefault(_squash(tag), tag)
+
+    repaired = []
+    for tag in tags:
+        if not isinstance(tag, str) or not tag.strip():
+            continue
+        if tag in vocab:
+            repaired.append(tag)
+            continue
+        tag = _normalize(tag)
+        if tag in vocab:
+            repaired.append(tag)
+        elif _squash(tag) in squashed:
+            repaired.append(squashed[_squash(tag)])
+        else:
+            close = difflib.get_close_matches(tag, all_dog_tags, n=1, cutoff=cutoff)
+            if close:
+                repaired.append(close[0])
+    return list(dict.fromkeys(repaired))
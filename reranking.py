@@ -0,0 +1,114 @@
+# ==========================================
+# 결과 재정렬 (동점 무작위 + 노출 균형 + 태그 다양성)
+# ==========================================
+# 점수가 작은 정수라 동점이 많은데, 목록 순서로만 자르면 늘 같은 강아지만 보이고
+# 아래쪽의 급한 아이들은 화면에 나오지 않습니다. 점수 배열 한 번 훑어서
+# 1. 후보 풀: 상위 POOL_SIZE 마리 (경계 점수와 같은 강아지가 많으면 그 전체에서 세션 시드로 무작위)
+# 2. 노출 균형: 프로세스 공용 노출 수가 풀 안 다른 강아지보다 많을수록 점수를 조금 깎음
+# 3. 다양성: MMR (점수 - 이미 고른 강아지와의 태그 겹침) 으로 k마리
+# 고른 k마리는 점수 순으로 보여줍니다 (다양성은 "누구를" 고를지에만).
+#
+# 끄기: DOG_MATCH_RERANK=0 (기존처럼 점수 → 목록 순서)
+
+import os
+import threading
+
+import numpy as np
+
+import telemetry
+
+ENABLED = os.environ.get("DOG_MATCH_RERANK", "1") != "0"
+POOL_SIZE = int(os.environ.get("DOG_MATCH_RERANK_POOL", "32"))
+DIVERSITY = float(os.environ.get("DOG_MATCH_DIVERSITY", "0.3"))             # MMR 에서 태그 겹침 비중 (0~1)
+EXPOSURE_WEIGHT = float(os.environ.get("DOG_MATCH_EXPOSURE_WEIGHT", "1.5"))  # 노출 많은 강아지 감점 (점)
+DECAY_EVERY = 1000   # 노출 기록이 이만큼 쌓일 때마다 전체를 절반으로 (최근 노출 위주)
+
+
+class ImpressionCounter:
+    # 강아지 ID → 결과 화면 노출 수 (모든 세션 공용)
+    def __init__(self, decay_every=DECAY_EVERY):
+        self.decay_every = decay_every
+        self._counts = {}
+        self._since_decay = 0
+        self._lock = threading.Lock()
+
+    def counts(self, dog_ids):
+        with self._lock:
+            return np.array([self._counts.get(d, 0.0) for d in dog_ids], dtype=np.float64)
+
+    def record(self, dog_ids):
+        with self._lock:
+            for d in dog_ids:
+                self._counts[d] = self._counts.get(d, 0.0) + 1
+            self._since_decay += len(dog_ids)
+            if self._since_decay >= self.decay_every:
+                self._since_decay = 0
+                self._counts = {d: c / 2 for d, c in self._counts.items() if c >= 1}
+        telemetry.incr("impressions", len(dog_ids))
+
+    def stats(self):
+        with self._lock:
+            return {"dogs": len(self._counts), "impressions": sum(self._counts.values())}
+
+
+def candidate_pool(scores, size, rng):
+    # 점수 상위 size 개 위치 (경계 점수 동점은 전체 중에서 무작위)
+    n = len(scores)
+    if n <= size:
+        return np.arange(n)
+    cut = np.partition(scores, n - size)[n - size]
+    above = np.flatnonzero(scores > cut)
+    tied = np.flatnonzero(scores == cut)
+    return np.concatenate([above, rng.choice(tied, size - len(above), replace=False)])
+
+
+class Reranker:
+    def __init__(self, impressions=None, pool_size=POOL_SIZE, diversity=DIVERSITY, exposure_weight=EXPOSURE_WEIGHT):
+        self.impressions = impressions or ImpressionCounter()
+        self.pool_size = pool_size
+        self.diversity = diversity
+        self.exposure_weight = exposure_weight
+
+    def dog_ids(self, engine, rows):
+        return [engine.dogs[r].get("dog_id", str(r)) for r in rows]
+
+    def select(self, engine, scores, k, seed, rows=None):
+        # scores(전체 또는 rows 후보의 점수) 안의 위치 k개, 점수 높은 순
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.array([], dtype=np.intp)
+        with telemetry.span("rerank"):
+            rng = np.random.default_rng(seed)
+            pool = candidate_pool(scores, max(self.pool_size, k), rng)
+            dog_rows = pool if rows is None else rows[pool]
+            relevance = scores[pool].astype(np.float64)
+
+            # 풀 안에서 남들보다 많이 보인 강아지일수록 감점
+            seen = self.impressions.counts(self.dog_ids(engine, dog_rows))
+            relevance -= self.exposure_weight * np.log2(1 + seen / (1 + seen.mean()))
+            relevance += rng.random(len(pool)) * 1e-6  # 남은 동점은 무작위로
+
+            # MMR: 0~1 로 맞춘 점수 vs 이미 고른 강아지와의 태그 자카드 유사도
+            tags = engine.tag_matrix[dog_rows].astype(np.float32)
+            overlap = tags @ tags.T
+            sizes = np.diag(overlap)
+            union = sizes[:, None] + sizes[None, :] - overlap
+            similarity = np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+            span = relevance.max() - relevance.min()
+            relevance = (relevance - relevance.min()) / (span or 1.0)
+
+            chosen = []
+            closest = np.zeros(len(pool), dtype=np.float32)
+            for _ in range(k):
+                mmr = (1 - self.diversity) * relevance - self.diversity * closest
+                mmr[chosen] = -np.inf
+                i = int(np.argmax(mmr))
+                chosen.append(i)
+                closest = np.maximum(closest, similarity[i])
+
+            picked = pool[chosen]
+            return picked[np.argsort(-scores[picked], kind="stable")]
+
+    def record(self, engine, rows):
+        # 결과 화면에 보여준 강아지들 (세션마다 한 번)
+        self.impressions.record(self.dog_ids(engine, rows))
@@ -0,0 +1,241 @@
+# ==========================================
+# 의미 기반 매칭 (선택 기능)
+# ==========================================
+# 태그 문자열이 정확히 같아야만 점수가 붙는 기존 방식은
+# "#겁쟁이" / "#겁이많음" / "#소심함" 같은 비슷한 말을 서로 다른 태그로 봅니다.
+# 이 모듈은 태그(와 강아지 이야기)를 벡터로 바꿔 코사인 유사도를 구하고,
+# 기존 가중치 점수에 SEMANTIC_WEIGHT 배로 더합니다.
+#
+# - 기본 임베딩: 글자 n-gram 해싱 + 작은 개념 사전 (추가 패키지/모델 없이 CPU 에서 바로)
+# - DOG_MATCH_EMBEDDING_MODEL 을 주고 sentence-transformers 가 설치되어 있으면 그 로컬 모델 사용
+# - 카탈로그 버전마다 강아지 벡터를 한 번 계산 (태그 행렬 x 태그 벡터 행렬곱 한 번 + 이야기)
+# - 사용자 질의는 태그별 유사도 열(처음 쓸 때 계산해서 보관)을 더하기만 하므로
+#   강아지 수가 많아도 태그 몇 개 x 강아지 수 덧셈
+#
+# 켜기: DOG_MATCH_SEMANTIC=1
+# 메모리: 강아지 수 x DIM x 4 bytes + 쓰인 태그 수 x 강아지 수 x 2 bytes
+
+import os
+import re
+import threading
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+import telemetry
+
+ENABLED = os.environ.get("DOG_MATCH_SEMANTIC", "0") != "0"
+EMBEDDING_MODEL = os.environ.get("DOG_MATCH_EMBEDDING_MODEL", "")
+SEMANTIC_WEIGHT = float(os.environ.get("DOG_MATCH_SEMANTIC_WEIGHT", "4"))
+STORY_WEIGHT = 0.3   # 강아지 벡터에서 이야기(story)가 차지하는 비중 (태그는 1)
+RELATED_MIN = 0.5    # "통하는 점"에 비슷한 태그로 함께 보여줄 최소 유사도
+DIM = 256
+
+# 같은 뜻으로 보는 어간 묶음 (태그/이야기에 하나라도 있으면 같은 개념 특징이 켜짐)
+CONCEPTS = {
+    "shy": ("겁", "소심", "쫄보", "낯가림", "낯을가", "트라우마", "무서워"),
+    "gentle": ("순둥", "순함", "순한", "온순", "얌전", "착한", "점잖"),
+    "touch": ("손길", "쓰다듬", "안아", "스킨십", "애교", "사람좋아", "바라기", "밥보다사랑"),
+    "alone_ok": ("분리불안없", "분리불안x", "분리행복", "혼자서도", "혼자있는"),
+    "walk": ("산책",),
+    "social": ("친구", "사회성", "잘지냄", "고양이와"),
+    "calm": ("정적", "조용", "차분", "짖음없", "위로", "힐링"),
+    "active": ("활발", "에너지", "러버", "마스터", "뛰어"),
+    "senior_care": ("노견", "노령", "케어", "살찌우", "관리", "건강"),
+    "urgent": ("급구", "임보", "장기쉼터", "평생가족", "견생"),
+    "patience": ("적응", "기다림", "인내", "성장", "극복", "기르는중"),
+    "potty": ("배변",),
+    "charm": ("외모", "비주얼", "매력", "귀요미", "미견", "표정", "눈망울", "미소", "웃는"),
+    "large": ("대형",),
+    "small": ("소형",),
+}
+CONCEPT_WEIGHT = 2.0
+
+_SEPARATORS = re.compile(r"[#_\s()\[\],.!?~'\"]+")
+# 어간 전체를 한 번에 찾는 패턴 (긴 어간 먼저) + 어간 → 개념
+_STEM_CONCEPT = {stem: name for name, stems in CONCEPTS.items() for stem in stems}
+_STEMS = re.compile("|".join(re.escape(s) for s in sorted(_STEM_CONCEPT, key=len, reverse=True)))
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def _bucket(feature, dim):
+    # 프로세스가 달라도 같은 자리 (파이썬 hash() 는 실행마다 달라서 crc32)
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, 1.0 if (h >> 31) & 1 else -1.0
+
+
+def concepts_in(text):
+    found = {_STEM_CONCEPT[m] for m in _STEMS.findall(_SEPARATORS.sub("", text).lower())}
+    return [name for name in CONCEPTS if name in found]
+
+
+class HashingEmbedder:
+    # 글자 1~3-gram 해싱 + 개념 특징 (학습 없는 로컬 임베딩)
+    name = "hashing"
+
+    def __init__(self, dim=DIM):
+        self.dim = dim
+        self._concept_rows = {name: _bucket(f"concept:{name}", dim) for name in CONCEPTS}
+
+    def _concepts(self, vec, text):
+        for name in concepts_in(text):
+            j, sign = self._concept_rows[name]
+            vec[j] += sign * CONCEPT_WEIGHT
+
+    def embed_tags(self, tags):
+        out = np.zeros((len(tags), self.dim), dtype=np.float32)
+        for i, tag in enumerate(tags):
+            for word in filter(None, _SEPARATORS.split(tag.lower())):
+                for n, weight in ((1, 0.5), (2, 1.0), (3, 1.0)):
+                    for start in range(len(word) - n + 1):
+                        j, sign = _bucket(word[start:start + n], self.dim)
+                        out[i, j] += sign * weight
+            self._concepts(out[i], tag)
+        return _normalize_rows(out)
+
+    def embed_texts(self, texts):
+        # 긴 글(이야기)은 개념 특징만 (글자 n-gram 은 잡음이 많고 강아지 10만 마리면 느림)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            self._concepts(out[i], text or "")
+        return _normalize_rows(out)
+
+
+class SentenceTransformerEmbedder:
+    # sentence-transformers 로컬 모델 (CPU)
+    name = "sentence-transformers"
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def _encode(self, texts):
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.asarray(
+            self.model.encode(list(texts), batch_size=64, normalize_embeddings=True, show_progress_bar=False),
+            dtype=np.float32,
+        )
+
+    def embed_tags(self, tags):
+        return self._encode([_SEPARATORS.sub(" ", t).strip() for t in tags])
+
+    def embed_texts(self, texts):
+        return self._encode([t or "" for t in texts])
+
+
+@lru_cache(maxsize=None)
+def get_embedder(model_name=EMBEDDING_MODEL):
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:  # 패키지가 없거나 모델을 못 불러오면 기본 임베딩
+            print(f"임베딩 모델 사용 안 함 ({model_name}): {e}")
+    return HashingEmbedder()
+
+
+class TagVectors:
+    # 태그 문자열 → 벡터 (카탈로그 버전이 바뀌어도 재사용)
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self._vectors = {}
+        self._lock = threading.Lock()
+
+    def get(self, tags):
+        tags = list(tags)
+        missing = [t for t in dict.fromkeys(tags) if t not in self._vectors]
+        if missing:
+            vectors = self.embedder.embed_tags(missing)
+            with self._lock:
+                self._vectors.update(zip(missing, vectors))
+        if not tags:
+            return np.zeros((0, self.embedder.dim), dtype=np.float32)
+        return np.stack([self._vectors[t] for t in tags])
+
+
+@lru_cache(maxsize=None)
+def tag_vectors(embedder):
+    return TagVectors(embedder)
+
+
+class SemanticIndex:
+    # 카탈로그 버전 하나의 강아지 벡터 + 태그별 유사도 열
+    def __init__(self, engine, embedder=None, weight=SEMANTIC_WEIGHT):
+        self.engine = engine
+        self.version = engine.version
+        self.embedder = embedder or get_embedder()
+        self.tags = tag_vectors(self.embedder)
+        self.weight = weight
+        self._columns = {}
+        self._lock = threading.Lock()
+
+        with telemetry.span("semantic_index_build", embedder=self.embedder.name):
+            # 태그 부분: 강아지별 태그 벡터 평균 (태그 행렬 x 태그 벡터)
+            vocab_vectors = self.tags.get(engine.vocab)
+            tag_part = _normalize_rows(engine.tag_matrix.astype(np.float32) @ vocab_vectors)
+            story_part = self.embedder.embed_texts([dog.get("story", "") for dog in engine.dogs])
+            self.dog_vectors = _normalize_rows(tag_part + STORY_WEIGHT * story_part).astype(np.float32)
+
+    def column(self, tag):
+        # 모든 강아지와 이 태그의 코사인 유사도 (처음 쓸 때 계산, float16 보관)
+        col = self._columns.get(tag)
+        if col is None:
+            col = (self.dog_vectors @ self.tags.get([tag])[0]).astype(np.float16)
+            with self._lock:
+                self._columns[tag] = col
+        return col
+
+    def column_sum(self, tags, rows=None, base=None):
+        # 태그별 유사도 열의 합 (정규화 전, float32), base 는 미리 더해 둔 열 합
+        n = len(self.engine) if rows is None else len(rows)
+        total = np.zeros(n, dtype=np.float32) if base is None else base.astype(np.float32)
+        for tag in set(tags):
+            col = self.column(tag)
+            total += col if rows is None else col[rows]
+        return total
+
+    def norm(self, tags):
+        # 사용자 벡터(태그 벡터 합)의 길이
+        tags = sorted(set(tags))
+        return float(np.linalg.norm(self.tags.get(tags).sum(axis=0))) if tags else 0.0
+
+    def similarity(self, tags, rows=None):
+        # 사용자 태그 벡터 평균과 강아지 벡터의 코사인 유사도 (강아지 수 길이, float32)
+        return self.column_sum(tags, rows) / (self.norm(tags) or 1.0)
+
+    def blend(self, scores, tags, rows=None):
+        # 기존 가중치 점수 + SEMANTIC_WEIGHT x 코사인 유사도
+        return scores + self.weight * self.similarity(tags, rows)
+
+    def matched_tags(self, row, tags):
+        # 정확히 같은 태그 + 뜻이 비슷한 태그 (강아지 태그 순서)
+        dog_tags = self.engine.dog_tags[row]
+        tags = sorted(set(tags))
+        if not dog_tags or not tags:
+            return []
+        related = (self.tags.get(dog_tags) @ self.tags.get(tags).T).max(axis=1)
+        return [t for t, sim in zip(dog_tags, related) if t in tags or sim >= RELATED_MIN]
+
+    def rank(self, profile, k=4, rows=None, reranker=None, seed=0):
+        # MatchEngine.rank 와 같은 모양 (점수는 반올림한 혼합 점수)
+        engine = self.engine
+        if rows is not None and len(rows) < k:
+            rows = None
+        scores = self.blend(engine.score(profile, rows), profile.tags, rows)
+        picked = engine.select(scores, k, reranker, seed, rows)
+        dog_rows = picked if rows is None else rows[picked]
+        return [self.result(row, scores[i], profile) for i, row in zip(picked, dog_rows)]
+
+    def result(self, row, score, profile):
+        result = self.engine.result(row, score, profile)
+        result["matched_tags"] = self.matched_tags(row, profile.tags)
+        return result
@@ -0,0 +1,228 @@
+# ==========================================
+# 세션 상태 압축 & 프로세스 메모리 예산
+# ==========================================
+# 동시 접속이 많아도 프로세스 메모리가 일정하게 유지되도록
+# - SessionProfile: 세션마다 남는 매칭 조건을 __slots__ + 태그 번호(tuple)로 작게 보관
+#   (태그 문자열은 프로세스 전체에서 한 벌만, 같은 태그가 여러 번 들어와도 한 번만)
+# - SessionStore:   분석 전 업로드 파일, 분석 리포트 문장, 사진 미리보기처럼 큰 데이터는 세션 밖 공용 저장소에 두고
+#   예산(DOG_MATCH_SESSION_MEMORY_MB)을 넘으면 가장 오래 쉬고 있는 세션 것부터 비움
+#   오래 쉰 세션(DOG_MATCH_SESSION_IDLE_SECONDS)은 예산과 관계없이 비움
+# 비워진 리포트는 분석 캐시에서 다시 읽고, 미리보기는 표시하지 않습니다.
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import telemetry
+
+MEMORY_BUDGET = int(float(os.environ.get("DOG_MATCH_SESSION_MEMORY_MB", "64")) * 1024 * 1024)
+IDLE_SECONDS = float(os.environ.get("DOG_MATCH_SESSION_IDLE_SECONDS", "1800"))
+SWEEP_INTERVAL = 10.0  # 오래 쉰 세션 정리 간격(초)
+
+
+class TagTable:
+    # 태그 문자열 ↔ 번호 (프로세스 전체 공용, 한 번 붙인 번호는 바뀌지 않음)
+    def __init__(self):
+        self._ids = {}
+        self._names = []
+        self._lock = threading.Lock()
+
+    def id(self, tag):
+        tag_id = self._ids.get(tag)
+        if tag_id is None:
+            with self._lock:
+                tag_id = self._ids.get(tag)
+                if tag_id is None:
+                    tag_id = self._ids[tag] = len(self._names)
+                    self._names.append(sys.intern(tag))
+        return tag_id
+
+    def ids(self, tags):
+        # 순서 유지 + 중복 제거
+        return tuple(dict.fromkeys(self.id(t) for t in tags))
+
+    def names(self, ids):
+        return [self._names[i] for i in ids]
+
+
+tag_table = TagTable()
+
+
+class SessionProfile:
+    # 세션 하나의 매칭 조건 (관상 태그, 성향 테스트 답/태그, 체급/케어 조건)
+    __slots__ = ("photo", "quiz", "answers", "size_pref", "care_ok", "analysis_key", "catalog_version", "shown")
+
+    def __init__(self, photo_tags=(), size_pref="medium", care_ok=False):
+        self.photo = tag_table.ids(photo_tags)
+        self.quiz = ()
+        self.answers = None       # 성향 테스트 보기 번호 5개 (tuple)
+        self.size_pref = size_pref
+        self.care_ok = care_ok
+        self.analysis_key = None  # 분석 캐시 키 (리포트 문장을 다시 읽을 때)
+        self.catalog_version = None
+        self.shown = None         # 결과 화면에 보여준 (dog_id, 점수) - 다시 그려도 같은 결과
+
+    @property
+    def analyzed(self):
+        return self.analysis_key is not None or bool(self.photo)
+
+    @property
+    def photo_tags(self):
+        return tag_table.names(self.photo)
+
+    @property
+    def tags(self):
+        # 관상 태그 + 성향 테스트 태그 (중복 없이)
+        return tag_table.names(dict.fromkeys(self.photo + self.quiz))
+
+    def set_photo(self, tags, analysis_key=None):
+        self.photo = tag_table.ids(tags)
+        self.analysis_key = analysis_key
+        self.shown = None
+
+    def clear_photo(self):
+        self.photo = ()
+        self.analysis_key = None
+        self.shown = None
+
+    def set_quiz(self, answers, tags, size_pref, care_ok):
+        self.answers = tuple(answers)
+        self.quiz = tag_table.ids(tags)
+        self.size_pref = size_pref
+        self.care_ok = bool(care_ok)
+        self.shown = None
+
+    def match_profile(self):
+        from matching import Profile
+
+        return Profile.of(self.tags, self.size_pref, self.care_ok)
+
+
+def _sizeof(value):
+    if value is None:
+        return 0
+    size = getattr(value, "size", None)  # 업로드 파일(UploadedFile)은 담고 있는 바이트 수
+    return size if isinstance(size, int) else sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ("last_seen", "fields", "nbytes")
+
+    def __init__(self):
+        self.last_seen = time.monotonic()
+        self.fields = {}
+        self.nbytes = 0
+
+
+class SessionStore:
+    # 세션별 큰 데이터 (세션 ID → {이름: 값}), 최근에 본 세션이 뒤쪽
+    def __init__(self, budget=MEMORY_BUDGET, idle_seconds=IDLE_SECONDS, on_evict=None):
+        self.budget = budget
+        self.idle_seconds = idle_seconds
+        self.on_evict = on_evict  # 비운 세션 ID 를 받아 세션 밖 자원(업로드 파일 등)도 정리
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def touch(self, session_id):
+        # 이번 실행에서 본 세션 (가끔 오래 쉰 세션 정리도 함께)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry.last_seen = now
+                self._entries.move_to_end(session_id)
+            sweep = now - self._last_sweep >= SWEEP_INTERVAL
+            if sweep:
+                self._last_sweep = now
+        if sweep:
+            self.sweep(now)
+
+    def get(self, session_id, name, default=None):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            return default if entry is None else entry.fields.get(name, default)
+
+    def put(self, session_id, **fields):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                entry = self._entries[session_id] = _Entry()
+            entry.last_seen = time.monotonic()
+            self._entries.move_to_end(session_id)
+            for name, value in fields.items():
+                size = _sizeof(entry.fields.pop(name, None))
+                entry.nbytes -= size
+                self._bytes -= size
+                if value is not None:
+                    entry.fields[name] = value
+                    entry.nbytes += _sizeof(value)
+                    self._bytes += _sizeof(value)
+            evicted = self._evict_over_budget(keep=session_id)
+        self._notify(evicted, "budget")
+
+    def drop(self, session_id, *names):
+        # 이름을 주지 않으면 그 세션 데이터 전부
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            for name in names or list(entry.fields):
+                size = _sizeof(entry.fields.pop(name, None))
+                entry.nbytes -= size
+                self._bytes -= size
+            if not entry.fields:
+                del self._entries[session_id]
+
+    def sweep(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            evicted = []
+            while self._entries:
+                session_id, entry = next(iter(self._entries.items()))
+                if now - entry.last_seen < self.idle_seconds:
+                    break
+                self._remove(session_id)
+                evicted.append(session_id)
+        self._notify(evicted, "idle")
+        return len(evicted)
+
+    def _remove(self, session_id):
+        entry = self._entries.pop(session_id)
+        self._bytes -= entry.nbytes
+
+    def _evict_over_budget(self, keep):
+        # 지금 쓰는 세션은 남기고 가장 오래 쉰 세션부터
+        evicted = []
+        for session_id in list(self._entries):
+            if self._bytes <= self.budget:
+                break
+            if session_id != keep:
+                self._remove(session_id)
+                evicted.append(session_id)
+        return evicted
+
+    def _notify(self, evicted, reason):
+        if not evicted:
+            return
+        telemetry.incr("session_evictions", len(evicted), reason=reason)
+        if self.on_evict is not None:
+            for session_id in evicted:
+                try:
+                    self.on_evict(session_id)
+                except Exception as e:
+                    print(f"세션 정리 오류: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._entries), "bytes": self._bytes, "budget": self.budget}
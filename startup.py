@@ -0,0 +1,120 @@
+# ==========================================
+# 시작 시간 측정 (첫 화면 / 백그라운드 준비)
+# ==========================================
+# 프로세스에서 스크립트를 처음 실행할 때 단계별 시각을 기록합니다.
+# - imports:     app.py 가 가벼운 모듈만 불러온 시점
+# - first_paint: Step 1 화면을 다 그린 시점
+# - 그 뒤 백그라운드 준비: 카탈로그/태그 인덱스, 분석 모듈, 모델 SDK, 랭킹 표, 썸네일
+# 시각은 항상 telemetry 의 startup 구간으로 남기고,
+# DOG_MATCH_STARTUP_PROFILE=1 이면 준비가 끝날 때 표로도 출력합니다.
+#
+# 콜드 스타트 측정 (매번 새 프로세스):  python startup.py --repeat 5
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import telemetry
+
+PROFILE = os.environ.get("DOG_MATCH_STARTUP_PROFILE", "0") != "0"
+
+_started = time.perf_counter()  # 이 모듈을 처음 불러온 시각 (첫 스크립트 실행 시작 무렵)
+_marks = {}
+_durations = {}
+_lock = threading.Lock()
+ready = threading.Event()       # 백그라운드 준비 완료
+
+
+def elapsed():
+    return time.perf_counter() - _started
+
+
+def mark(name):
+    # 처음 한 번만 기록 (다시 실행(rerun)할 때는 무시)
+    with _lock:
+        if name in _marks:
+            return
+        _marks[name] = elapsed()
+    telemetry.observe("startup", _marks[name], phase=name)
+
+
+@contextmanager
+def phase(name):
+    # 준비 단계 하나의 소요 시간과 끝난 시각
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _durations[name] = time.perf_counter() - start
+        mark(name)
+
+
+def marks():
+    with _lock:
+        return {"marks": dict(_marks), "durations": dict(_durations)}
+
+
+def finish():
+    ready.set()
+    if PROFILE:
+        report = marks()
+        print("시작 시간 (첫 스크립트 실행부터, 초):")
+        for name, at in sorted(report["marks"].items(), key=lambda item: item[1]):
+            took = report["durations"].get(name)
+            print(f"  {name:20s} {at:7.3f}" + (f"  (소요 {took:.3f})" if took is not None else ""))
+
+
+def _measure_once():
+    # 새 프로세스 안에서: AppTest 로 첫 화면을 그리고 준비가 끝날 때까지 기다림
+    from streamlit.testing.v1 import AppTest
+
+    import startup  # python startup.py 로 실행하면 이 파일은 __main__ 이라 app.py 가 쓰는 모듈을 따로 불러옴
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    wall_start = time.perf_counter()
+    at = AppTest.from_file(os.path.join(base_dir, "app.py"), default_timeout=120)
+    at.run()
+    first_run = time.perf_counter() - wall_start
+    startup.ready.wait(120)
+    return {"first_run_wall": first_run, "warm_wall": time.perf_counter() - wall_start, **startup.marks()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="댕칼코마니 콜드 스타트 측정")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_measure_once()))
+        return
+
+    env = dict(os.environ, DOG_MATCH_STARTUP_PROFILE="0")
+    runs = []
+    for _ in range(args.repeat):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+
+    def median(values):
+        return statistics.median(values) if values else float("nan")
+
+    print(f"콜드 스타트 {args.repeat}회 중앙값 (초)")
+    print(f"  첫 화면 (AppTest 첫 실행)   {median([r['first_run_wall'] for r in runs]):.3f}")
+    names = sorted({n for r in runs for n in r["marks"]}, key=lambda n: median([r["marks"][n] for r in runs if n in r["marks"]]))
+    for name in names:
+        print(f"  {name:26s} {median([r['marks'][name] for r in runs if name in r['marks']]):.3f}")
+    print(f"  백그라운드 준비 완료        {median([r['warm_wall'] for r in runs]):.3f}")
+
+
+if __name__ == "__main__":
+    main()
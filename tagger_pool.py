@@ -0,0 +1,180 @@
+# ==========================================
+# 로컬 태그 추출 작업 프로세스 묶음 (별도 호스트 프로세스)
+# ==========================================
+# Streamlit 은 app.py 를 __main__ 으로 실행하므로 앱 프로세스에서 spawn/forkserver 로 띄운
+# 작업 프로세스는 모두 화면 스크립트를 다시 실행합니다.
+# → 앱은 이 파일을 `python tagger_pool.py` 로 따로 띄우고(호스트), 호스트가 spawn 프로세스 풀을 가짐
+#   (호스트의 __main__ 은 이 모듈이라 작업 프로세스가 다시 불러와도 아무것도 실행하지 않음)
+# - 앱 ↔ 호스트: multiprocessing.connection (요청마다 연결 하나, 인증키는 환경변수로 전달)
+# - 앱 프로세스가 끝나면(stdin 이 닫히면) 호스트도 작업 프로세스를 정리하고 종료
+# - 호스트나 작업 프로세스가 죽으면 BrokenProcessPool, 다음 요청 때 새로 띄움
+
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import AuthenticationError, get_context
+from multiprocessing.connection import Client, Listener
+
+AUTHKEY_ENV = "DOG_MATCH_TAGGER_AUTHKEY"
+
+
+# ---------- 호스트 (python tagger_pool.py 작업수 모델 라벨) ----------
+class _Host:
+    def __init__(self, workers, model_path, labels_path):
+        self.workers = workers
+        self.model_path = model_path
+        self.labels_path = labels_path
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def executor(self):
+        import local_tagger
+
+        with self._lock:
+            if self._executor is None:
+                # 호스트도 연결마다 스레드를 쓰므로 fork 대신 spawn
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=get_context("spawn"),
+                    initializer=local_tagger._init_worker,
+                    initargs=(self.model_path, self.labels_path),
+                )
+            return self._executor
+
+    def run(self, method, args):
+        import local_tagger
+
+        executor = self.executor()
+        try:
+            if method == "analyze":
+                return executor.submit(local_tagger._analyze_in_worker, *args).result()
+            if method == "warm":
+                futures = [executor.submit(local_tagger._worker_ready) for _ in range(self.workers)]
+                return [f.result() for f in futures]
+            raise ValueError(f"알 수 없는 요청: {method!r}")
+        except BrokenProcessPool:
+            # 죽은 풀은 버리고 다음 요청 때 새로
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def handle(self, conn):
+        with conn:
+            try:
+                method, args = conn.recv()
+                try:
+                    reply = (True, self.run(method, args))
+                except Exception as e:
+                    reply = (False, e)
+                conn.send(reply)
+            except (EOFError, OSError):
+                pass  # 앱 쪽이 시간 초과로 먼저 끊음
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def serve(workers, model_path, labels_path):
+    host = _Host(workers, model_path, labels_path)
+    listener = Listener(authkey=bytes.fromhex(os.environ.pop(AUTHKEY_ENV)))
+    # 주소 한 줄을 알린 뒤로는 출력(작업 프로세스 포함)을 stderr 로
+    sys.stdout.write(json.dumps(listener.address) + "\n")
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    def exit_with_parent():
+        sys.stdin.buffer.read()
+        host.shutdown()
+        os._exit(0)
+
+    threading.Thread(target=exit_with_parent, name="tagger-host-parent", daemon=True).start()
+    host.executor().submit(int)  # spawn 은 첫 submit 때 작업 프로세스를 모두 띄움
+    while True:
+        try:
+            conn = listener.accept()
+        except (AuthenticationError, OSError):
+            continue
+        threading.Thread(target=host.handle, args=(conn,), name="tagger-host-conn", daemon=True).start()
+
+
+# ---------- 앱 쪽 ----------
+class PoolClient:
+    # 호스트 프로세스를 처음 쓸 때 띄우고, 요청을 보내 결과를 받음
+    def __init__(self, workers, model_path, labels_path):
+        self.workers = workers
+        self.model_path = model_path
+        self.labels_path = labels_path
+        self._lock = threading.Lock()
+        self._proc = None
+        self._address = None
+        self._authkey = None
+
+    def _host(self):
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                authkey = os.urandom(32)
+                proc = subprocess.Popen(
+                    [sys.executable, os.path.abspath(__file__), str(self.workers), self.model_path, self.labels_path],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    env={**os.environ, AUTHKEY_ENV: authkey.hex()},
+                )
+                line = proc.stdout.readline()
+                if not line:
+                    proc.wait()
+                    raise BrokenProcessPool(f"태그 추출 호스트 시작 실패 (종료 코드 {proc.returncode})")
+                address = json.loads(line)
+                self._address = tuple(address) if isinstance(address, list) else address
+                self._proc, self._authkey = proc, authkey
+            return self._proc, self._address, self._authkey
+
+    def _reset(self, proc):
+        with self._lock:
+            if self._proc is proc:
+                self._proc = None
+        if proc.poll() is None:
+            proc.kill()
+
+    def call(self, method, *args, timeout=None):
+        proc, address, authkey = self._host()
+        try:
+            conn = Client(address, authkey=authkey)
+        except OSError as e:
+            self._reset(proc)
+            raise BrokenProcessPool(f"태그 추출 호스트 연결 실패: {e}") from e
+        with conn:
+            try:
+                conn.send((method, args))
+                ready = conn.poll(timeout)
+                ok, value = conn.recv() if ready else (False, None)
+            except (EOFError, OSError) as e:
+                self._reset(proc)
+                raise BrokenProcessPool(f"태그 추출 호스트 연결 끊김: {e}") from e
+        if not ready:
+            raise TimeoutError(f"로컬 태그 추출 시간 초과 ({timeout}초)")
+        if not ok:
+            raise value
+        return value
+
+    def shutdown(self):
+        with self._lock:
+            proc, self._proc = self._proc, None
+        if proc is not None:
+            proc.stdin.close()  # 호스트가 작업 프로세스를 정리하고 종료
+            try:
+                proc.wait(5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+if __name__ == "__main__":
+    serve(int(sys.argv[1]), sys.argv[2], sys.argv[3])
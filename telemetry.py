@@ -0,0 +1,187 @@
+# ==========================================
+# 성능 계측 (구간 시간 / 카운터)
+# ==========================================
+# 운영 중에도 켜 둘 수 있도록 가볍게 만들었습니다.
+# - span(): 구간 시간을 히스토그램으로 누적 (호출당 perf_counter 2번 + 잠금 1번)
+# - incr(): 카운터 (Gemini 토큰/바이트, 캐시 적중/실패 등)
+# - 백그라운드 스레드가 주기적으로 파일로 내보냄
+#     Prometheus 텍스트: DOG_MATCH_METRICS_PROM (기본 .cache/metrics.prom)
+#     JSONL 누적 스냅샷: DOG_MATCH_METRICS_JSONL (지정한 경우만)
+#   느린 구간(DOG_MATCH_SLOW_SPAN_MS 이상)은 JSONL 에 한 건씩 따로 남깁니다.
+# 끄기: DOG_MATCH_TELEMETRY=0
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLED = os.environ.get("DOG_MATCH_TELEMETRY", "1") != "0"
+EXPORT_INTERVAL = float(os.environ.get("DOG_MATCH_METRICS_INTERVAL", "15"))
+SLOW_SPAN_MS = float(os.environ.get("DOG_MATCH_SLOW_SPAN_MS", "2000"))
+PREFIX = "dogmatch"
+
+# 구간 시간 버킷 (초)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class _Histogram:
+    __slots__ = ("count", "total", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+
+
+class Telemetry:
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._spans = {}
+        self._slow = []
+        self._exporter = None
+
+    # ---------- 기록 ----------
+    def incr(self, name, value=1, **labels):
+        if not self.enabled or not value:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            hist = self._spans.get(key)
+            if hist is None:
+                hist = self._spans[key] = _Histogram()
+            hist.observe(seconds)
+            if seconds * 1000 >= SLOW_SPAN_MS:
+                self._slow.append({"ts": time.time(), "span": name, "seconds": round(seconds, 4), **labels})
+
+    @contextmanager
+    def span(self, name, **labels):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # ---------- 내보내기 ----------
+    def snapshot(self):
+        with self._lock:
+            counters = {k: v for k, v in self._counters.items()}
+            spans = {k: (h.count, h.total, list(h.buckets)) for k, h in self._spans.items()}
+            slow, self._slow = self._slow, []
+        return counters, spans, slow
+
+    def prometheus_text(self, counters=None, spans=None):
+        if counters is None:
+            counters, spans, _ = self.snapshot()
+
+        def fmt(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{str(v)}"' for k, v in items) + "}"
+
+        lines = []
+        for name in sorted({k[0] for k in counters}):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{PREFIX}_{name}_total{fmt(labels)} {value}")
+        for name in sorted({k[0] for k in spans}):
+            metric = f"{PREFIX}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for (n, labels), (count, total, buckets) in sorted(spans.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, hits in zip(BUCKETS, buckets):
+                    cumulative += hits
+                    lines.append(f"{metric}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{metric}_bucket{fmt(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{metric}_sum{fmt(labels)} {total:.6f}")
+                lines.append(f"{metric}_count{fmt(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, prom_path=None, jsonl_path=None):
+        counters, spans, slow = self.snapshot()
+        if prom_path:
+            os.makedirs(os.path.dirname(os.path.abspath(prom_path)), exist_ok=True)
+            tmp_path = f"{prom_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text(counters, spans))
+            os.replace(tmp_path, prom_path)
+        if jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+            with open(jsonl_path, "a", encoding="utf-8") as f:
+                for event in slow:
+                    f.write(json.dumps({"type": "slow_span", **event}, ensure_ascii=False) + "\n")
+                f.write(json.dumps({
+                    "type": "snapshot",
+                    "ts": time.time(),
+                    "pid": os.getpid(),
+                    "counters": {_label_name(k): v for k, v in counters.items()},
+                    "spans": {
+                        _label_name(k): {"count": c, "sum": round(t, 6), "avg": round(t / c, 6) if c else 0}
+                        for k, (c, t, _) in spans.items()
+                    },
+                }, ensure_ascii=False) + "\n")
+
+    def start_exporter(self, prom_path=None, jsonl_path=None, interval=EXPORT_INTERVAL):
+        if not self.enabled or self._exporter is not None or not (prom_path or jsonl_path):
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.export(prom_path, jsonl_path)
+                except Exception as e:
+                    print(f"계측 내보내기 오류: {e}")
+
+        self._exporter = threading.Thread(target=run, name="telemetry-export", daemon=True)
+        self._exporter.start()
+
+
+def _label_name(key):
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+
+# 프로세스 전체에서 함께 쓰는 계측기
+metrics = Telemetry()
+span = metrics.span
+incr = metrics.incr
+observe = metrics.observe
+
+
+def default_prom_path(cache_dir):
+    return os.environ.get("DOG_MATCH_METRICS_PROM") or os.path.join(cache_dir, "metrics.prom")
+
+
+def default_jsonl_path():
+    return os.environ.get("DOG_MATCH_METRICS_JSONL") or None
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 테스트에서 저장소 최상위 모듈(matching, catalog ...)을 바로 가져오도록
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
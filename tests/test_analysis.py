@@ -0,0 +1,40 @@
+import io
+
+import pytest
+from PIL import Image
+
+import analysis
+from model_backends import Chunk
+
+VOCAB = ["#순둥이", "#산책잘함", "#겁쟁이"]
+
+
+class CumulativeUsageBackend:
+    # Gemini 스트리밍처럼 조각마다 지금까지의 누적 사용량을 실어 보냄
+    name = "stub"
+    model_name = "stub"
+
+    def generate(self, image, prompt, vocab, structured=True, stream=False, timeout=None):
+        pieces = ['{"matched_tags": ["#순둥이", "#겁쟁이"], ', '"summary": "차분하고 ', '다정해요"}']
+        for i, piece in enumerate(pieces, 1):
+            yield Chunk(piece, {"prompt": 100, "output": 10 * i, "cached": 0})
+
+
+@pytest.fixture
+def photo():
+    out = io.BytesIO()
+    Image.new("RGB", (32, 32), "white").save(out, "JPEG")
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_usage_recorded_once_per_request(monkeypatch, photo, stream):
+    monkeypatch.setattr(analysis, "get_backend", lambda: CumulativeUsageBackend())
+    settled = []
+    result = analysis.analyze_image_with_gemini(
+        photo, "image/jpeg", VOCAB,
+        on_progress=(lambda **_: None) if stream else None,
+        on_usage=settled.append,
+    )
+    assert result["summary"] == "차분하고 다정해요"
+    assert settled == [130]
@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from cache_layer import DiskTier, LocalRedis, RedisTier, StampedeGuard
+
+
+@pytest.fixture(params=["disk", "redis"])
+def shared(request, tmp_path):
+    if request.param == "disk":
+        return DiskTier(str(tmp_path / "shared"))
+    return RedisTier(LocalRedis())
+
+
+def test_lock_is_exclusive_until_released(shared):
+    assert shared.add("lock:a", b"one", 60)
+    assert not shared.add("lock:a", b"two", 60)
+    assert shared.get("lock:a") == b"one"
+    assert shared.release("lock:a", b"one")
+    assert shared.get("lock:a") is None
+    assert shared.add("lock:a", b"two", 60)
+
+
+def test_release_keeps_another_holders_lock(shared):
+    # 내 잠금이 만료된 뒤 다른 서버가 잡은 잠금은 풀지 않음
+    assert shared.add("lock:a", b"mine", 0.05)
+    time.sleep(1.1)
+    assert shared.add("lock:a", b"theirs", 60)
+    assert not shared.release("lock:a", b"mine")
+    assert shared.get("lock:a") == b"theirs"
+
+
+def test_disk_lock_file_is_never_partial(tmp_path):
+    tier = DiskTier(str(tmp_path / "shared"))
+    assert tier.add("lock:a", b"token", 60)
+    assert list((tmp_path / "shared").rglob("*.tmp")) == []
+    with open(tier._path("lock:a"), "rb") as f:
+        assert f.read()[DiskTier._HEADER.size:] == b"token"
+
+
+def test_guard_computes_once_and_releases(shared):
+    guard = StampedeGuard(shared, lock_ttl=5, poll=0.01)
+    calls = []
+    assert guard.run("k", lambda: None, lambda: calls.append(1) or "v") == "v"
+    assert calls == [1]
+    assert shared.get("lock:k") is None
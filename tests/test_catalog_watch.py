@@ -0,0 +1,121 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from cache_layer import LocalRedis, RedisTier
+from catalog import CatalogStore
+from catalog_watch import CatalogWatcher
+from matching import MatchEngine, Profile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def dogs():
+    with open(os.path.join(BASE_DIR, "data", "dogs.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def catalog(tmp_path, dogs):
+    json_path = tmp_path / "dogs.json"
+    store = CatalogStore(str(tmp_path / "dogs.sqlite3"))
+    write_json(json_path, dogs)
+    store.import_json(str(json_path))
+    watcher = CatalogWatcher(store, str(json_path), poll_interval=3600)
+    watcher.sync_json()
+    return store, watcher, json_path
+
+
+def write_json(path, dogs):
+    # 크기가 같아도 변경으로 보이도록 수정 시각을 매번 앞으로
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dogs, f, ensure_ascii=False)
+    stamp = os.stat(path).st_mtime_ns + 1_000_000_000 * (len(dogs) + 1)
+    os.utime(path, ns=(stamp, stamp))
+
+
+def assert_same_as_full_reload(store, engine):
+    full = MatchEngine(store.load_dogs())
+    assert [d["dog_id"] for d in engine.dogs] == [d["dog_id"] for d in full.dogs]
+    for tags in ([], ["#순둥이"], ["#순둥이", "#산책잘함", "#겁쟁이"]):
+        for size_pref in ("small", "medium", "large"):
+            profile = Profile.of(tags, size_pref, care_ok=True)
+            np.testing.assert_array_equal(engine.score(profile), full.score(profile))
+            assert [r["dog"]["dog_id"] for r in engine.rank(profile)] == [r["dog"]["dog_id"] for r in full.rank(profile)]
+
+
+def test_adopted_dog_drops_out_of_matching(catalog, dogs):
+    store, watcher, json_path = catalog
+    profile = Profile.of(dogs[0]["personality_tags"], "medium", care_ok=True)
+    engine = watcher.current.engine
+    assert "dog_001" in [engine.dogs[row]["dog_id"] for row in engine.top_k(engine.score(profile), k=len(engine))]
+
+    dogs[0]["status"] = "adopted"
+    write_json(json_path, dogs)
+    assert watcher.sync_json() == 1
+
+    engine = watcher.current.engine
+    assert len(engine) == len(dogs) - 1 == store.count()
+    assert "dog_001" not in [engine.dogs[row]["dog_id"] for row in engine.top_k(engine.score(profile), k=len(engine))]
+    assert_same_as_full_reload(store, engine)
+
+
+def test_delta_matches_full_reload_after_insert(catalog, dogs):
+    store, watcher, json_path = catalog
+    new_dog = json.loads(json.dumps(dogs[5]))
+    new_dog["dog_id"] = "dog_new"
+    dogs.insert(5, new_dog)
+    del dogs[12]
+    dogs[2]["personality_tags"] = ["#겁쟁이", "#새로운태그"]
+    write_json(json_path, dogs)
+    assert watcher.sync_json() == 3
+
+    positions = store._query("SELECT position FROM dogs ORDER BY position")
+    assert [p for (p,) in positions] == list(range(len(dogs)))
+    assert_same_as_full_reload(store, watcher.current.engine)
+
+
+def test_unchanged_adopted_dog_is_skipped_then_deleted(tmp_path, dogs):
+    json_path = tmp_path / "dogs.json"
+    store = CatalogStore(str(tmp_path / "dogs.sqlite3"))
+    dogs[3]["status"] = "adopted"
+    write_json(json_path, dogs)
+    store.import_json(str(json_path))
+    watcher = CatalogWatcher(store, str(json_path), poll_interval=3600)
+
+    # 전체 다시 읽은 직후: 입양 완료된 강아지도 바뀌지 않았으면 다시 반영하지 않음
+    assert watcher.sync_json() == 0
+    assert store.count("adopted") == 1
+
+    adopted_id = dogs[3]["dog_id"]
+    del dogs[3]
+    write_json(json_path, dogs)
+    assert watcher.sync_json() == 1
+    assert store.count("adopted") == 0
+    assert adopted_id not in store.content_hashes()
+    assert_same_as_full_reload(store, watcher.current.engine)
+
+
+def test_full_load_is_cached_under_the_version_actually_read(tmp_path, dogs):
+    json_path = tmp_path / "dogs.json"
+    write_json(json_path, dogs)
+    store = CatalogStore(str(tmp_path / "dogs.sqlite3"))
+    store.import_json(str(json_path))
+    shared = RedisTier(LocalRedis())
+    watcher = CatalogWatcher(store, str(json_path), poll_interval=3600, shared=shared)
+    store.import_dogs(dogs[:15])
+    seen = store.version()
+
+    # v{seen} 을 확인한 뒤 읽기 전에 다른 곳에서 DB를 또 바꿈
+    store.import_dogs(dogs[:10])
+    watcher._publish_full(seen)
+
+    assert watcher.current.version == store.version() == seen + 1
+    assert len(watcher.current.dogs) == 10
+    prefix = f"catalog:{store.catalog_id()}"
+    assert shared.get(f"{prefix}:v{seen}:snapshot") is None
+    cached = json.loads(shared.get(f"{prefix}:v{seen + 1}:snapshot"))
+    assert cached["version"] == seen + 1 and len(cached["dogs"]) == 10
@@ -0,0 +1,20 @@
+import io
+
+from PIL import Image
+
+from image_prep import prepare_image
+
+
+def test_always_sends_rotated_metadata_free_copy():
+    exif = Image.Exif()
+    exif[0x0112] = 6           # 90도 회전
+    exif[0x010F] = "Camera"
+    out = io.BytesIO()
+    Image.effect_noise((40, 20), 64).convert("RGB").save(out, "JPEG", exif=exif, quality=5)
+
+    prepared = prepare_image(out.getvalue(), crop_face=False)
+
+    sent = Image.open(io.BytesIO(prepared.data))
+    assert prepared.prepared_size > prepared.original_size  # 더 커져도 다시 인코딩한 쪽
+    assert sent.size == (20, 40)
+    assert not sent.getexif()
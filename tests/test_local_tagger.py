@@ -0,0 +1,29 @@
+import io
+
+import pytest
+from PIL import Image
+
+from local_tagger import TaggerPool
+
+VOCAB = ("#순둥이", "#산책잘함", "#겁쟁이", "#활발함", "#노견케어")
+
+
+@pytest.fixture
+def photo():
+    out = io.BytesIO()
+    Image.new("RGB", (64, 64), "orange").save(out, "JPEG")
+    return out.getvalue()
+
+
+def test_pool_matches_in_process(photo):
+    local = TaggerPool(workers=0).analyze(photo, VOCAB)
+    pool = TaggerPool(workers=1)
+    try:
+        assert pool.warm() == ["stats-v1"]
+        assert pool.analyze(photo, VOCAB, timeout=30) == local
+        # 호스트가 죽어도 다음 요청 때 새로 띄움
+        pool._client._proc.kill()
+        pool._client._proc.wait()
+        assert pool.analyze(photo, VOCAB, timeout=30) == local
+    finally:
+        pool.shutdown()
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from repair import parse_json_loose, repair_tags
+
+VOCAB = ["#순둥이", "#산책잘함", "#분리불안_없음"]
+
+
+def test_parse_json_loose_recovers_object():
+    text = '```json\n{"summary": "순해요", "matched_tags": ["#순둥이",],}\n```'
+    assert parse_json_loose(text) == {"summary": "순해요", "matched_tags": ["#순둥이"]}
+
+
+@pytest.mark.parametrize("text", ['["#순둥이"]', '"#순둥이"', "3", "null"])
+def test_parse_json_loose_rejects_non_object(text):
+    with pytest.raises(ValueError):
+        parse_json_loose(text)
+
+
+def test_parse_json_loose_unwraps_object_in_list():
+    assert parse_json_loose('[{"summary": "순해요"}]') == {"summary": "순해요"}
+
+
+def test_parse_json_loose_truncated():
+    assert parse_json_loose('{"summary": "순해요", "matched_tags": ["#순')["summary"] == "순해요"
+
+
+def test_repair_tags():
+    assert repair_tags(["순둥이", "#산책 잘함", "#분리불안없음", "#없는태그", "#순둥이"], VOCAB) == VOCAB
+    assert repair_tags("#순둥이", VOCAB) == []
+
+
+def test_json_decode_error_is_value_error():
+    with pytest.raises(json.JSONDecodeError):
+        parse_json_loose("완전히 깨진 응답")